@@ -5,11 +5,54 @@ Demonstrates context-aware conversations with memory persistence
 """
 
 import os
+import re
+from collections import deque
 from langchain_openai import ChatOpenAI
-from langchain_core.messages import SystemMessage, HumanMessage
+from langchain_core.messages import AIMessage, SystemMessage, HumanMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from mem0 import MemoryClient
 
+# Recent turns kept locally and sent with every prompt
+RECENT_TURNS = 6
+# Share of a query's content words the recent turns must cover to skip the Mem0 search
+COVERAGE = 0.6
+
+STOPWORDS = frozenset("""
+a about after again all also am an and any are as at be because been before being but by can could did do does
+for from had has have he her his how i if in into is it its just me more most my no not now of on only or other
+our out over she should so some than that the their them then there these they this those to too up very was we
+were what when where which while who why will with would you your tell know think please thanks yes sure want like
+""".split())
+# Questions about the past always go to long-term memory
+RECALL_PATTERN = re.compile(r"\b(remember|recall|last (time|week|month|year)|previous(ly)?|earlier|before|used to|"
+                            r"told you|did i (ever )?(say|mention|tell)|what do you know about me)\b")
+
+
+def content_terms(text):
+    """Lower-cased words of the text without stopwords, short words or a plural/tense suffix"""
+    terms = set()
+    for word in re.findall(r"[a-z0-9']+", text.lower()):
+        word = word.strip("'")
+        if len(word) < 3 or word in STOPWORDS:
+            continue
+        for suffix in ("ing", "ed", "es", "s"):
+            if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+                word = word[:-len(suffix)]
+                break
+        terms.add(word)
+    return terms
+
+
+def covered_by_recent_turns(query, recent_turns):
+    """True when the conversation so far already answers the query, so Mem0 need not be searched"""
+    if not recent_turns or RECALL_PATTERN.search(query.lower()):
+        return False
+    terms = content_terms(query)
+    if not terms:
+        return False
+    seen = set().union(*(content_terms(f"{past_query} {past_response}") for past_query, past_response in recent_turns))
+    return len(terms & seen) / len(terms) >= COVERAGE
+
 
 def main():
     # Initialize clients using environment variables
@@ -34,8 +77,23 @@ def main():
         MessagesPlaceholder(variable_name="messages")
     ])
     
+    # Composed once rather than on every turn
+    chain = prompt | llm
+    
+    # Short-term memory: the last few turns of this conversation
+    recent_turns = deque(maxlen=RECENT_TURNS)
+    
+    def history_messages():
+        messages = []
+        for past_query, past_response in recent_turns:
+            messages += [HumanMessage(content=past_query), AIMessage(content=past_response)]
+        return messages
+    
     def retrieve_context(query, user_id):
-        """Retrieve relevant memories for the user"""
+        """Retrieve relevant memories for the user, unless the recent turns already cover the query"""
+        if covered_by_recent_turns(query, recent_turns):
+            print(f"Answering from the recent turns - Query: '{query}'")
+            return []
         print(f"Searching memories - Query: '{query}', User ID: '{user_id}'")
         memories = mem0.search(query=query, user_id=user_id, limit=5)
         
@@ -58,14 +116,12 @@ def main():
 
         #print('Context:', [msg.content for msg in context] if context else "No context found")
         
-        # Format messages for the prompt
-        chain = prompt | llm
-        
         response = chain.invoke({
-            "context": context,
+            "context": history_messages() + context,
             "messages": [HumanMessage(content=query)]
         })
         
+        recent_turns.append((query, response.content))
         return response.content
     
     def save_interaction(query, response, user_id):
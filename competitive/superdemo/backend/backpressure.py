@@ -0,0 +1,494 @@
+#!/usr/bin/env python3
+"""
+Backpressure for the Memory Systems Demo API
+Adaptive per-upstream concurrency limits, jittered retries and circuit
+breakers, so a slow, rate-limiting or failing Mem0, Zep or OpenAI sheds
+excess load and fails fast instead of being buried
+"""
+
+import asyncio
+import os
+import random
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import Awaitable, Callable, Optional
+
+import httpx
+
+# Statuses that mean "back off": the upstream is shedding load
+OVERLOAD_STATUSES = {429, 503}
+# Statuses worth retrying for an idempotent read
+TRANSIENT_STATUSES = {408, 425, 429, 500, 502, 503, 504}
+# Statuses that will not fix themselves: bad or missing credentials
+AUTH_STATUSES = {401, 403}
+
+
+class UpstreamOverloaded(Exception):
+    """Raised when a call could not get a concurrency slot within the bounded wait"""
+
+    def __init__(self, upstream: str, retry_after_s: float):
+        super().__init__(f"{upstream} is overloaded, retry in {retry_after_s:g}s")
+        self.upstream = upstream
+        self.retry_after_s = retry_after_s
+
+
+class CircuitOpen(UpstreamOverloaded):
+    """Raised without calling the upstream while its circuit breaker is open"""
+
+    def __init__(self, upstream: str, retry_after_s: float):
+        Exception.__init__(self, f"{upstream} circuit is open, retry in {retry_after_s:.1f}s")
+        self.upstream = upstream
+        self.retry_after_s = retry_after_s
+
+
+def status_code_of(error: BaseException) -> Optional[int]:
+    """HTTP status carried by an SDK error (Zep ApiError, OpenAI APIStatusError, httpx, Mem0)"""
+    for source in (error, getattr(error, "response", None)):
+        for attr in ("status_code", "status"):
+            value = getattr(source, attr, None)
+            if isinstance(value, int):
+                return value
+    # Mem0 wraps the httpx error and keeps the status in debug_info
+    debug_info = getattr(error, "debug_info", None)
+    if isinstance(debug_info, dict) and isinstance(debug_info.get("status_code"), int):
+        return debug_info["status_code"]
+    return None
+
+
+def retry_after_s(error: BaseException) -> Optional[float]:
+    """Seconds the upstream asked us to wait via Retry-After, if it said"""
+    if isinstance(error, UpstreamOverloaded):
+        return error.retry_after_s
+    debug_info = getattr(error, "debug_info", None)
+    if isinstance(debug_info, dict) and debug_info.get("retry_after") is not None:
+        return float(debug_info["retry_after"])
+    for source in (error, getattr(error, "response", None)):
+        headers = getattr(source, "headers", None)
+        if not headers:
+            continue
+        value = headers.get("retry-after") or headers.get("Retry-After")
+        if value is None:
+            continue
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+    return None
+
+
+def is_timeout(error: BaseException) -> bool:
+    return isinstance(error, (asyncio.TimeoutError, httpx.TimeoutException))
+
+
+def is_overload(error: BaseException) -> bool:
+    """True for errors that signal congestion: rate limits, 503s and timeouts"""
+    return is_timeout(error) or status_code_of(error) in OVERLOAD_STATUSES
+
+
+def is_transient(error: BaseException) -> bool:
+    """True for errors an idempotent read may retry"""
+    if is_timeout(error) or isinstance(error, (httpx.TransportError, ConnectionError)):
+        return True
+    return status_code_of(error) in TRANSIENT_STATUSES
+
+
+class AdaptiveLimiter:
+    """
+    AIMD concurrency limit: grows by one after a full window of successful
+    calls and is multiplied by backoff_ratio on a 429, 503, timeout or a call
+    far slower than the running average. Callers over the limit queue FIFO for
+    at most max_wait_s, then fail with UpstreamOverloaded.
+    """
+
+    def __init__(self, name: str, initial_limit: int = 16, min_limit: int = 1, max_limit: int = 128,
+                 backoff_ratio: float = 0.7, max_wait_s: float = 1.0, max_queue: int = 256,
+                 slow_call_factor: float = 3.0, min_latency_samples: int = 20):
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.backoff_ratio = backoff_ratio
+        self.max_wait_s = max_wait_s
+        self.max_queue = max_queue
+        self.slow_call_factor = slow_call_factor
+        self.min_latency_samples = min_latency_samples
+        self._limit = float(max(min_limit, min(initial_limit, max_limit)))
+        self._in_flight = 0
+        self._waiters: deque = deque()
+        self._window_successes = 0
+        self._last_decrease = 0.0
+        self._latency_ewma_ms: Optional[float] = None
+        self._latency_samples = 0
+        self.stats = {"calls": 0, "queued": 0, "rejected": 0, "overloads": 0, "decreases": 0,
+                      "wait_ms_total": 0.0, "peak_queue": 0}
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @asynccontextmanager
+    async def slot(self):
+        """Hold one unit of upstream concurrency; the body's outcome adjusts the limit"""
+        await self._acquire()
+        start = time.monotonic()
+        try:
+            yield
+        except asyncio.CancelledError:
+            # Our own budget gave up; only a call that ran far too long says anything
+            self._observe_latency((time.monotonic() - start) * 1000, completed=False)
+            raise
+        except Exception as e:
+            if is_overload(e):
+                self._on_overload()
+            raise
+        else:
+            self._observe_latency((time.monotonic() - start) * 1000, completed=True)
+        finally:
+            self._release()
+
+    async def _acquire(self):
+        self.stats["calls"] += 1
+        if self._in_flight < self.limit and not self._waiters:
+            self._in_flight += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.stats["rejected"] += 1
+            raise UpstreamOverloaded(self.name, self.max_wait_s)
+
+        self.stats["queued"] += 1
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self.stats["peak_queue"] = max(self.stats["peak_queue"], len(self._waiters))
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(waiter, self.max_wait_s)
+        except asyncio.TimeoutError:
+            self._abandon(waiter)
+            self.stats["rejected"] += 1
+            raise UpstreamOverloaded(self.name, self.max_wait_s) from None
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+        finally:
+            self.stats["wait_ms_total"] += (time.monotonic() - start) * 1000
+
+    def _abandon(self, waiter: asyncio.Future):
+        if waiter.done() and not waiter.cancelled():
+            # The slot was handed over just as we gave up - pass it on
+            self._release()
+        elif waiter in self._waiters:
+            self._waiters.remove(waiter)
+
+    def _release(self):
+        self._in_flight -= 1
+        self._wake_waiters()
+
+    def _observe_latency(self, latency_ms: float, completed: bool):
+        ewma = self._latency_ewma_ms
+        if (ewma is not None and self._latency_samples >= self.min_latency_samples
+                and latency_ms > ewma * self.slow_call_factor):
+            self._on_overload()
+        elif completed:
+            self._on_success()
+        if completed:
+            self._latency_ewma_ms = latency_ms if ewma is None else ewma * 0.95 + latency_ms * 0.05
+            self._latency_samples += 1
+
+    def _on_success(self):
+        # Additive increase: +1 once per window of `limit` successes
+        self._window_successes += 1
+        if self._window_successes >= self.limit:
+            self._window_successes = 0
+            self._limit = min(float(self.max_limit), self._limit + 1)
+            self._wake_waiters()
+
+    def _on_overload(self):
+        self.stats["overloads"] += 1
+        now = time.monotonic()
+        # Calls already in flight when the upstream pushed back fail together;
+        # treat them as one congestion event
+        cooldown = (self._latency_ewma_ms or 100.0) / 1000
+        if now - self._last_decrease < cooldown:
+            return
+        self._last_decrease = now
+        self._window_successes = 0
+        self._limit = max(float(self.min_limit), self._limit * self.backoff_ratio)
+        self.stats["decreases"] += 1
+
+    def _wake_waiters(self):
+        while self._waiters and self._in_flight < self.limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self._in_flight += 1
+                waiter.set_result(None)
+
+    def metrics(self) -> dict:
+        return {
+            "limit": self.limit,
+            "in_flight": self._in_flight,
+            "waiting": len(self._waiters),
+            "latency_ewma_ms": self._latency_ewma_ms,
+            **self.stats,
+        }
+
+
+def is_connection_failure(error: BaseException) -> bool:
+    """
+    A timeout or a failure to reach the upstream, including one an SDK wraps
+    in its own error type (OpenAI's APIConnectionError raises from httpx's)
+    """
+    seen = set()
+    while error is not None and id(error) not in seen:
+        if is_timeout(error) or isinstance(error, (httpx.TransportError, ConnectionError)):
+            return True
+        seen.add(id(error))
+        error = error.__cause__ or error.__context__
+    return False
+
+
+def is_breaker_failure(error: BaseException) -> bool:
+    """
+    True if the error says the upstream is unhealthy or unusable: a timeout,
+    a connection failure, a 5xx, 408 or 429, or rejected credentials. Other
+    4xx (a missing user, an existing thread) prove it is up, and errors with
+    no status that never reached it (a bug in our own code, a bad argument)
+    say nothing about it, nor does load we shed ourselves.
+    """
+    if isinstance(error, UpstreamOverloaded):
+        return False
+    status = status_code_of(error)
+    if status is None:
+        return is_connection_failure(error)
+    return status in AUTH_STATUSES or status in (408, 429) or status >= 500
+
+
+class CircuitBreaker:
+    """
+    Closed -> open after failure_threshold consecutive failures, a failure
+    rate above failure_rate over the last window calls, or at once on an
+    auth error. Open calls fail fast with CircuitOpen; after open_s one
+    half-open probe is let through. A successful probe closes the circuit, a
+    failed one reopens it for twice as long, up to max_open_s.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, name: str, failure_threshold: int = 5, failure_rate: float = 0.5, window: int = 20,
+                 min_calls: int = 10, open_s: float = 5.0, max_open_s: float = 60.0, half_open_probes: int = 1):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.failure_rate = failure_rate
+        self.min_calls = min_calls
+        self.open_s = open_s
+        self.max_open_s = max_open_s
+        self.half_open_probes = half_open_probes
+        self._outcomes: deque = deque(maxlen=window)
+        self._consecutive_failures = 0
+        self._state = self.CLOSED
+        self._open_for_s = open_s
+        self._opened_until = 0.0
+        self._probes = 0
+        self.last_failure: Optional[str] = None
+        self.stats = {"opens": 0, "short_circuited": 0, "failures": 0, "successes": 0, "probes": 0}
+
+    @property
+    def state(self) -> str:
+        if self._state == self.OPEN and time.monotonic() >= self._opened_until:
+            self._state = self.HALF_OPEN
+            self._probes = 0
+        return self._state
+
+    def retry_after_s(self) -> float:
+        return max(0.0, self._opened_until - time.monotonic())
+
+    def before_call(self) -> bool:
+        """Admit a call or raise CircuitOpen; returns True if the call is a half-open probe"""
+        state = self.state
+        if state == self.CLOSED:
+            return False
+        if state == self.HALF_OPEN and self._probes < self.half_open_probes:
+            self._probes += 1
+            self.stats["probes"] += 1
+            return True
+        self.stats["short_circuited"] += 1
+        raise CircuitOpen(self.name, max(self.retry_after_s(), 1.0))
+
+    def record_success(self, probe: bool = False):
+        self.stats["successes"] += 1
+        self._consecutive_failures = 0
+        self._outcomes.append(True)
+        if probe or self._state == self.HALF_OPEN:
+            self._close()
+
+    def record_failure(self, error: Optional[BaseException] = None, probe: bool = False):
+        """Count a failed or timed-out call; error=None means our own budget ran out waiting on it"""
+        self.stats["failures"] += 1
+        self._consecutive_failures += 1
+        self._outcomes.append(False)
+        self.last_failure = "timeout" if error is None else f"{type(error).__name__}: {error}"[:200]
+        state = self.state
+        if state == self.OPEN:
+            # A call admitted before the circuit opened; already accounted for
+            return
+        if probe or state == self.HALF_OPEN:
+            self._open(backoff=True)
+        elif error is not None and status_code_of(error) in AUTH_STATUSES:
+            # Retrying rejected credentials only burns round trips
+            self._open(backoff=False)
+        elif self._consecutive_failures >= self.failure_threshold:
+            self._open(backoff=False)
+        elif len(self._outcomes) >= self.min_calls:
+            failures = sum(1 for ok in self._outcomes if not ok)
+            if failures / len(self._outcomes) >= self.failure_rate:
+                self._open(backoff=False)
+
+    def release_probe(self):
+        """A probe ended without a verdict, e.g. cancelled by a hedge or a disconnect"""
+        if self._state == self.HALF_OPEN and self._probes > 0:
+            self._probes -= 1
+
+    def _open(self, backoff: bool):
+        if backoff:
+            self._open_for_s = min(self.max_open_s, self._open_for_s * 2)
+        self._state = self.OPEN
+        self._opened_until = time.monotonic() + self._open_for_s
+        self.stats["opens"] += 1
+
+    def _close(self):
+        self._state = self.CLOSED
+        self._open_for_s = self.open_s
+        self._consecutive_failures = 0
+        self._outcomes.clear()
+
+    def metrics(self) -> dict:
+        return {
+            "state": self.state,
+            "open_remaining_s": round(self.retry_after_s(), 3) if self._state == self.OPEN else 0.0,
+            "consecutive_failures": self._consecutive_failures,
+            "last_failure": self.last_failure,
+            **self.stats,
+        }
+
+
+class RetryPolicy:
+    """Jittered exponential backoff for idempotent reads, honoring Retry-After"""
+
+    def __init__(self, max_attempts: int = 3, base_delay_s: float = 0.05, max_delay_s: float = 1.0,
+                 max_retry_after_s: float = 5.0):
+        self.max_attempts = max_attempts
+        self.base_delay_s = base_delay_s
+        self.max_delay_s = max_delay_s
+        self.max_retry_after_s = max_retry_after_s
+
+    def delay(self, attempt: int, error: BaseException) -> Optional[float]:
+        """Seconds to sleep before the next attempt, or None to give up"""
+        if attempt >= self.max_attempts or not is_transient(error):
+            return None
+        # Full jitter keeps retrying callers from arriving in lockstep
+        backoff = random.uniform(0, min(self.max_delay_s, self.base_delay_s * 2 ** (attempt - 1)))
+        requested = retry_after_s(error)
+        if requested is None:
+            return backoff
+        if requested > self.max_retry_after_s:
+            # Not worth holding the request open that long
+            return None
+        return max(backoff, requested)
+
+
+class Upstream:
+    """One upstream's breaker, limiter and retry policy; the call path for every request to it"""
+
+    def __init__(self, limiter: AdaptiveLimiter, retry: RetryPolicy, breaker: Optional[CircuitBreaker] = None):
+        self.limiter = limiter
+        self.retry = retry
+        self.breaker = breaker or CircuitBreaker(limiter.name)
+        self.stats = {"retries": 0, "retry_wait_ms_total": 0.0}
+
+    @classmethod
+    def from_env(cls, name: str) -> "Upstream":
+        prefix = f"UPSTREAM_{name.upper()}_"
+
+        def setting(key: str, default: str) -> str:
+            return os.environ.get(prefix + key, os.environ.get(f"UPSTREAM_{key}", default))
+
+        return cls(
+            AdaptiveLimiter(
+                name,
+                initial_limit=int(setting("INITIAL_LIMIT", "16")),
+                min_limit=int(setting("MIN_LIMIT", "1")),
+                max_limit=int(setting("MAX_LIMIT", "128")),
+                max_wait_s=float(setting("MAX_WAIT_MS", "1000")) / 1000,
+                max_queue=int(setting("MAX_QUEUE", "256")),
+            ),
+            RetryPolicy(
+                max_attempts=int(setting("RETRY_ATTEMPTS", "3")),
+                max_retry_after_s=float(setting("MAX_RETRY_AFTER_MS", "5000")) / 1000,
+            ),
+            CircuitBreaker(
+                name,
+                failure_threshold=int(setting("BREAKER_FAILURES", "5")),
+                failure_rate=float(setting("BREAKER_FAILURE_RATE", "0.5")),
+                open_s=float(setting("BREAKER_OPEN_MS", "5000")) / 1000,
+                max_open_s=float(setting("BREAKER_MAX_OPEN_MS", "60000")) / 1000,
+            ),
+        )
+
+    async def call(self, make_call: Callable[[], Awaitable], idempotent: bool = False):
+        """Run make_call() in a limiter slot; idempotent reads are retried on transient errors"""
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                async with self.slot():
+                    return await make_call()
+            except Exception as e:
+                delay = self.retry.delay(attempt, e) if idempotent else None
+                if delay is None:
+                    raise
+                self.stats["retries"] += 1
+                self.stats["retry_wait_ms_total"] += delay * 1000
+                await asyncio.sleep(delay)
+
+    @asynccontextmanager
+    async def slot(self):
+        """
+        Breaker check and limiter slot around one attempt; used directly for
+        calls that cannot be replayed, such as a token stream
+        """
+        probe = self.breaker.before_call()
+        try:
+            async with self.limiter.slot():
+                yield
+        except asyncio.CancelledError:
+            # Hedge losers and disconnects are not failures; budget timeouts
+            # are reported by the caller through record_timeout()
+            if probe:
+                self.breaker.release_probe()
+            raise
+        except Exception as e:
+            if is_breaker_failure(e):
+                self.breaker.record_failure(e, probe)
+            elif isinstance(e, UpstreamOverloaded) or status_code_of(e) is None:
+                # Load we shed, or an error the upstream never answered with: no verdict on its health
+                if probe:
+                    self.breaker.release_probe()
+            else:
+                # A 404 or 409 still proves the upstream is up
+                self.breaker.record_success(probe)
+            raise
+        else:
+            self.breaker.record_success(probe)
+
+    def record_timeout(self):
+        """The caller's latency budget ran out waiting on this upstream"""
+        self.breaker.record_failure(None)
+
+    def metrics(self) -> dict:
+        return {"circuit": self.breaker.metrics(), **self.limiter.metrics(), **self.stats}
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Batch query execution for offline evaluation workloads
+Runs many (user_id, query) requests with bounded concurrency, searching each
+user's memory once per distinct query and reporting results as they complete,
+followed by an aggregate timing summary
+
+Input is JSONL, one QueryRequest per line:
+  {"user_id": "...", "query": "...", "session_id": "..."}
+
+    python batch.py --backend mem0 --target http://localhost:8000 eval.jsonl > results.jsonl
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import httpx
+
+from caches import normalize_query
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class BatchRunner:
+    """
+    Answers a batch of requests with `concurrency` workers fed from a bounded
+    queue, so a large batch never becomes one task per request. Requests are
+    grouped by user, and requests with the same user and normalized query share
+    one retrieval. `retrieve(request)` returns whatever `answer(request,
+    retrieved, shared)` needs; `answer` returns a result dict with a "status".
+    """
+
+    def __init__(self, retrieve: Callable[[Any], Awaitable[Any]],
+                 answer: Callable[[Any, Any, bool], Awaitable[dict]], concurrency: int = 16):
+        self.retrieve = retrieve
+        self.answer = answer
+        self.concurrency = max(1, concurrency)
+        self._retrievals: Dict[Tuple[str, str], asyncio.Future] = {}
+        self.stats = {"requests": 0, "succeeded": 0, "failed": 0, "users": 0,
+                      "retrievals": 0, "retrievals_shared": 0}
+        self.latencies_ms: List[float] = []
+
+    def retrieval(self, request) -> Tuple[asyncio.Future, bool]:
+        """The retrieval for the request's user and query, started by the first request that needs it"""
+        key = (request.user_id, normalize_query(request.query))
+        future = self._retrievals.get(key)
+        if future is not None:
+            self.stats["retrievals_shared"] += 1
+            return future, True
+        future = asyncio.ensure_future(self.retrieve(request))
+        self._retrievals[key] = future
+        self.stats["retrievals"] += 1
+        return future, False
+
+    async def _run_one(self, index: int, request) -> dict:
+        start = time.perf_counter()
+        future, shared = self.retrieval(request)
+        try:
+            # Shielded, so one cancelled request does not cancel a search others are waiting on
+            retrieved = await asyncio.shield(future)
+        except Exception as e:
+            result = {"status": 500, "error": f"Retrieval failed: {e}"}
+        else:
+            try:
+                result = await self.answer(request, retrieved, shared)
+            except Exception as e:
+                result = {"status": 500, "error": f"Answer failed: {e}"}
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        self.latencies_ms.append(elapsed_ms)
+        self.stats["succeeded" if result.get("status") == 200 else "failed"] += 1
+        return {"index": index, "user_id": request.user_id, "query": request.query,
+                **result, "elapsed_ms": elapsed_ms}
+
+    async def run(self, requests: List[Any]) -> AsyncIterator[dict]:
+        """Yield one result per request as it completes (with its input `index`), then {"summary": ...}"""
+        start = time.perf_counter()
+        self.stats["requests"] = len(requests)
+        self.stats["users"] = len({request.user_id for request in requests})
+        # A stable sort keeps each user's requests together and in order, so
+        # duplicates find their user's retrieval already in flight
+        order = sorted(range(len(requests)), key=lambda i: requests[i].user_id)
+        work: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)
+        results: asyncio.Queue = asyncio.Queue()
+
+        async def feeder():
+            for index in order:
+                # Bounded queue: the batch waits here for a free worker instead of becoming one task per request
+                await work.put(index)
+            for _ in workers:
+                await work.put(None)
+
+        async def worker():
+            while True:
+                index = await work.get()
+                if index is None:
+                    return
+                await results.put(await self._run_one(index, requests[index]))
+
+        workers = [asyncio.create_task(worker()) for _ in range(max(1, min(self.concurrency, len(requests))))]
+        feeder_task = asyncio.create_task(feeder())
+        try:
+            for _ in range(len(requests)):
+                yield await results.get()
+        finally:
+            # Finished, or the client went away: stop the rest of the batch
+            for pending in [feeder_task, *workers, *self._retrievals.values()]:
+                pending.cancel()
+        yield {"summary": self.summary((time.perf_counter() - start) * 1000)}
+
+    def summary(self, wall_time_ms: float) -> dict:
+        sequential_ms = sum(self.latencies_ms)
+        return {
+            **self.stats,
+            "concurrency": self.concurrency,
+            "wall_time_ms": wall_time_ms,
+            "sequential_time_ms": sequential_ms,
+            "time_saved_ms": max(0.0, sequential_ms - wall_time_ms),
+            "throughput_rps": len(self.latencies_ms) / (wall_time_ms / 1000) if wall_time_ms else 0.0,
+            "latency_p50_ms": percentile(self.latencies_ms, 50),
+            "latency_p95_ms": percentile(self.latencies_ms, 95),
+            "latency_max_ms": max(self.latencies_ms, default=0.0),
+        }
+
+
+def read_requests(paths: Iterable[str]) -> Iterator[dict]:
+    """QueryRequest dicts from JSONL files ("-" for stdin)"""
+    for path in paths:
+        f = sys.stdin if path == "-" else open(path, "r", encoding="utf-8")
+        try:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        finally:
+            if f is not sys.stdin:
+                f.close()
+
+
+async def stream_batch(client: httpx.AsyncClient, backend: str, requests: List[dict],
+                       concurrency: Optional[int] = None, persist: bool = True) -> AsyncIterator[dict]:
+    """POST a batch to /{backend}/query:batch and yield each NDJSON result line as it arrives"""
+    body = {"requests": requests, "concurrency": concurrency, "persist": persist}
+    async with client.stream("POST", f"/{backend}/query:batch", json=body) as response:
+        if response.status_code != 200:
+            await response.aread()
+            raise RuntimeError(f"Batch rejected with {response.status_code}: {response.text}")
+        async for line in response.aiter_lines():
+            if line.strip():
+                yield json.loads(line)
+
+
+async def run_batch(args) -> dict:
+    requests = list(read_requests(args.paths))
+    if args.stand_ins:
+        # In-process app with stand-in upstreams; spool kept out of the source tree
+        os.environ.setdefault("WRITE_BEHIND_SPOOL", os.path.join(tempfile.mkdtemp(), "spool.jsonl"))
+        import main as app_module
+        import standins
+        standins.install(app_module, llm_latency=args.stand_in_latency, search_latency=args.stand_in_latency)
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app_module.app), base_url="http://batch",
+                                   timeout=None)
+    else:
+        app_module = None
+        client = httpx.AsyncClient(base_url=args.target, timeout=None)
+
+    summary = {}
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        async with client:
+            async for result in stream_batch(client, args.backend, requests, args.concurrency, not args.no_persist):
+                if "summary" in result:
+                    summary = result["summary"]
+                else:
+                    out.write(json.dumps(result) + "\n")
+                    out.flush()
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    if app_module is not None:
+        await app_module.write_queue.drain()
+    return summary
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Run a batch of queries against the Mem0 or Zep pipeline")
+    parser.add_argument("paths", nargs="+", help="JSONL files of QueryRequests ('-' for stdin)")
+    parser.add_argument("--backend", choices=["mem0", "zep"], required=True)
+    parser.add_argument("--target", default="http://localhost:8000", help="Base URL of a running server")
+    parser.add_argument("--concurrency", type=int, help="Requests in flight at once (default: server's BATCH_CONCURRENCY)")
+    parser.add_argument("--no-persist", action="store_true", help="Do not save the batch's turns to memory")
+    parser.add_argument("--output", help="Where to write NDJSON results (default: stdout)")
+    parser.add_argument("--stand-ins", action="store_true", help="Run in-process against local stand-ins")
+    parser.add_argument("--stand-in-latency", default="lognormal:120:0.4", help="Stand-in LLM and search latency")
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    summary = asyncio.run(run_batch(args))
+    print(json.dumps(summary, indent=2), file=sys.stderr)
+    sys.exit(1 if summary.get("failed") or not summary else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+#!/usr/bin/env python3
+"""
+Load-generation benchmark for the Memory Systems Demo API
+Replays scripted multi-turn conversations against the query endpoints at a
+configurable concurrency and arrival rate, and reports per-stage percentiles
+
+Runs in-process against local stand-in backends by default; pass --target to
+load-test an already running server instead, or --replay to serve upstream
+calls from a cassette recorded with CASSETTE_MODE=record (see cassettes.py).
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import httpx
+
+# Conversations from the Mem0 LangChain session notes (mem0/notes.md)
+DEFAULT_SCRIPTS = [
+    [
+        "Hello, I'm Pete. I'm taking a trip to Seattle and have a flight on Delta later today. We'll also check into a Hyatt. What should I do in Seattle tomorrow?",
+        "I'm also heading to NYC next month. Any hotel suggestions?",
+        "I'm a World of Hyatt member and strongly prefer staying at their properties.",
+    ],
+    [
+        "Can you put together a 5 day Maui itinerary for November?",
+        "Which hotels would you recommend for that trip?",
+        "What should I pack?",
+    ],
+    [
+        "My dog Porter is a golden retriever who loves the beach.",
+        "Porter is 4 years old and my neighbor Tom walks him on weekdays.",
+        "Who walks Porter during the week?",
+    ],
+]
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * (len(ordered) - 1)))))
+    return ordered[index]
+
+
+def summarize(values: List[float]) -> dict:
+    return {
+        "count": len(values),
+        "mean": statistics.fmean(values) if values else 0.0,
+        "p50": percentile(values, 50),
+        "p95": percentile(values, 95),
+        "p99": percentile(values, 99),
+        "max": max(values, default=0.0),
+    }
+
+
+def load_scripts(path: Optional[str]) -> List[List[str]]:
+    """Read conversations from a JSONL file of {"turns": [...]} lines, or use the built-in ones"""
+    if not path:
+        return DEFAULT_SCRIPTS
+    scripts = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                scripts.append(json.loads(line)["turns"])
+    return scripts
+
+
+class BenchmarkRun:
+    """Replays conversations against one or more endpoints and collects per-request results"""
+
+    def __init__(self, client: httpx.AsyncClient, endpoints: List[str], scripts: List[List[str]],
+                 conversations: int, concurrency: int, arrival_rate: float, think_time: float, seed: int,
+                 run_id: Optional[str] = None):
+        self.client = client
+        self.endpoints = endpoints
+        self.scripts = scripts
+        self.conversations = conversations
+        self.concurrency = concurrency
+        self.arrival_rate = arrival_rate
+        self.think_time = think_time
+        self.random = random.Random(seed)
+        # Fresh users per run unless a run id is given, as replaying a cassette needs
+        self.run_id = run_id or uuid.uuid4().hex[:6]
+        self.results: List[dict] = []
+
+    async def run_conversation(self, index: int, turns: List[str]):
+        user_id = f"bench_{index}_{self.run_id}"
+        session_id = f"s{index}_{self.run_id}"
+        for turn in turns:
+            for endpoint in self.endpoints:
+                start = time.perf_counter()
+                record = {"endpoint": endpoint, "user_id": user_id}
+                try:
+                    response = await self.client.post(endpoint, json={
+                        "user_id": user_id, "query": turn, "session_id": session_id
+                    })
+                    record["status"] = response.status_code
+                    if response.status_code == 200:
+                        record["performance_metrics"] = response.json().get("performance_metrics") or {}
+                except Exception as e:
+                    record["status"] = 0
+                    record["error"] = str(e)
+                record["latency_ms"] = (time.perf_counter() - start) * 1000
+                self.results.append(record)
+            if self.think_time:
+                await asyncio.sleep(self.think_time)
+
+    async def run(self) -> float:
+        """Run every conversation, returning the wall-clock duration in seconds"""
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def bounded(index: int):
+            async with semaphore:
+                await self.run_conversation(index, self.scripts[index % len(self.scripts)])
+
+        start = time.perf_counter()
+        tasks = []
+        for index in range(self.conversations):
+            tasks.append(asyncio.create_task(bounded(index)))
+            if self.arrival_rate > 0:
+                # Open-loop Poisson arrivals; closed loop when the rate is 0
+                await asyncio.sleep(self.random.expovariate(self.arrival_rate))
+        await asyncio.gather(*tasks)
+        return time.perf_counter() - start
+
+    def report(self, duration_s: float) -> dict:
+        endpoints = {}
+        for endpoint in self.endpoints:
+            records = [r for r in self.results if r["endpoint"] == endpoint]
+            ok = [r for r in records if r.get("status") == 200]
+            stages: Dict[str, List[float]] = {}
+            for record in ok:
+                for name, value in record.get("performance_metrics", {}).items():
+                    if name.endswith("_ms"):
+                        stages.setdefault(name, []).append(value)
+            endpoints[endpoint] = {
+                "requests": len(records),
+                "errors": len(records) - len(ok),
+                "error_rate": (len(records) - len(ok)) / len(records) if records else 0.0,
+                "throughput_rps": len(ok) / duration_s if duration_s else 0.0,
+                "client_latency_ms": summarize([r["latency_ms"] for r in ok]),
+                "stages_ms": {name: summarize(values) for name, values in sorted(stages.items())},
+            }
+        return {
+            "duration_s": duration_s,
+            "requests": len(self.results),
+            "throughput_rps": len(self.results) / duration_s if duration_s else 0.0,
+            "endpoints": endpoints,
+        }
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=Path(__file__).parent, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except Exception:
+        return None
+
+
+def print_report(report: dict):
+    print(f"\nDuration {report['duration_s']:.2f}s, {report['requests']} requests, "
+          f"{report['throughput_rps']:.1f} req/s overall")
+    for endpoint, data in report["endpoints"].items():
+        print(f"\n{endpoint}: {data['throughput_rps']:.1f} req/s, error rate {data['error_rate']:.1%}")
+        print(f"  {'stage':32} {'p50':>9} {'p95':>9} {'p99':>9}")
+        rows = [("client_latency_ms", data["client_latency_ms"])] + list(data["stages_ms"].items())
+        for name, stats in rows:
+            print(f"  {name:32} {stats['p50']:9.1f} {stats['p95']:9.1f} {stats['p99']:9.1f}")
+
+
+async def run_benchmark(args) -> dict:
+    scripts = load_scripts(args.script)
+    endpoints = [f"/{name}/query" if not name.startswith("/") else name for name in args.endpoints.split(",")]
+
+    if args.target:
+        client = httpx.AsyncClient(base_url=args.target, timeout=args.timeout)
+        app_module = None
+    else:
+        # In-process app with stand-in upstreams (or a recorded cassette); spool kept out of the source tree
+        os.environ.setdefault("WRITE_BEHIND_SPOOL", os.path.join(tempfile.mkdtemp(), "spool.jsonl"))
+        import main as app_module
+        if args.replay:
+            import cassettes
+            cassettes.install(app_module, args.replay, "replay", latency=args.replay_latency,
+                              strict=not args.replay_lenient)
+        else:
+            import standins
+            standins.install(
+                app_module,
+                llm_latency=args.llm_latency,
+                search_latency=args.search_latency,
+                add_latency=args.add_latency,
+                setup_latency=args.setup_latency,
+                seed=args.seed,
+            )
+        transport = httpx.ASGITransport(app=app_module.app)
+        client = httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=args.timeout)
+
+    async with client:
+        run = BenchmarkRun(client, endpoints, scripts, args.conversations, args.concurrency,
+                           args.arrival_rate, args.think_time, args.seed, args.run_id)
+        duration = await run.run()
+
+    report = run.report(duration)
+    if app_module is not None:
+        await app_module.write_queue.drain(timeout=args.timeout)
+        report["write_behind"] = app_module.write_queue.metrics()
+        if app_module.cassette:
+            report["cassette"] = app_module.cassette.metrics()
+
+    report["config"] = {
+        "target": args.target or (f"in-process replay of {args.replay}" if args.replay else "in-process stand-ins"),
+        "replay_latency": args.replay_latency if args.replay else None,
+        "run_id": run.run_id,
+        "endpoints": endpoints,
+        "conversations": args.conversations,
+        "concurrency": args.concurrency,
+        "arrival_rate": args.arrival_rate,
+        "think_time": args.think_time,
+        "llm_latency": args.llm_latency,
+        "search_latency": args.search_latency,
+        "add_latency": args.add_latency,
+        "setup_latency": args.setup_latency,
+        "seed": args.seed,
+    }
+    report["timestamp"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    report["git_commit"] = git_commit()
+    return report
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Load-test the memory demo query endpoints")
+    parser.add_argument("--target", help="Base URL of a running server (default: in-process with stand-ins)")
+    parser.add_argument("--endpoints", default="mem0,zep", help="Comma-separated endpoints, e.g. mem0,zep,local")
+    parser.add_argument("--script", help="JSONL file of {\"turns\": [...]} conversations")
+    parser.add_argument("--conversations", type=int, default=60, help="Conversations to replay")
+    parser.add_argument("--concurrency", type=int, default=10, help="Max concurrent conversations")
+    parser.add_argument("--arrival-rate", type=float, default=0.0,
+                        help="New conversations per second (Poisson); 0 starts them all at once")
+    parser.add_argument("--think-time", type=float, default=0.0, help="Seconds between turns")
+    parser.add_argument("--llm-latency", default="lognormal:250:0.3", help="Stand-in LLM latency distribution")
+    parser.add_argument("--search-latency", default="lognormal:80:0.4", help="Stand-in search latency distribution")
+    parser.add_argument("--add-latency", default="lognormal:120:0.4", help="Stand-in add latency distribution")
+    parser.add_argument("--setup-latency", default="lognormal:40:0.3", help="Stand-in Zep user/thread latency")
+    parser.add_argument("--replay", help="Cassette to replay in process instead of stand-ins (see cassettes.py)")
+    parser.add_argument("--replay-latency", default="recorded",
+                        help="'recorded', 'zero' or a multiplier for the replayed upstream latency")
+    parser.add_argument("--replay-lenient", action="store_true",
+                        help="Answer replayed calls with no exact recording from another recording of the same call")
+    parser.add_argument("--run-id", help="Suffix of user and session ids; reuse a recorded run's id to replay it")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Per-request client timeout in seconds")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="benchmark_results.json", help="Where to write the JSON report")
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    report = asyncio.run(run_benchmark(args))
+    print_report(report)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
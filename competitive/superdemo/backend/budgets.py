@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Latency budgets and hedged requests for the Memory Systems Demo API
+Bounds tail latency when Mem0, Zep or OpenAI hiccup instead of inheriting it
+"""
+
+import asyncio
+import os
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Dict, Optional
+
+
+@dataclass
+class LatencyBudget:
+    """Per-request deadline and per-stage budgets, in milliseconds"""
+    deadline_ms: float = 30000.0
+    retrieval_ms: float = 2000.0
+    generation_ms: float = 25000.0
+    persistence_ms: float = 10000.0
+
+    @classmethod
+    def from_env(cls) -> "LatencyBudget":
+        return cls(
+            deadline_ms=float(os.environ.get("REQUEST_DEADLINE_MS", cls.deadline_ms)),
+            retrieval_ms=float(os.environ.get("RETRIEVAL_BUDGET_MS", cls.retrieval_ms)),
+            generation_ms=float(os.environ.get("GENERATION_BUDGET_MS", cls.generation_ms)),
+            persistence_ms=float(os.environ.get("PERSISTENCE_BUDGET_MS", cls.persistence_ms)),
+        )
+
+
+class RequestDeadline:
+    """Tracks what is left of a request's overall deadline"""
+
+    def __init__(self, deadline_ms: float):
+        self.deadline_ms = deadline_ms
+        self._start = time.monotonic()
+
+    def remaining_ms(self) -> float:
+        return max(0.0, self.deadline_ms - (time.monotonic() - self._start) * 1000)
+
+    def stage_timeout(self, stage_budget_ms: float) -> float:
+        """Seconds a stage may take: its own budget, capped by what is left of the deadline"""
+        return min(stage_budget_ms, self.remaining_ms()) / 1000
+
+
+class LatencyTracker:
+    """Rolling window of recent call latencies, used to pick hedge delays"""
+
+    def __init__(self, window: int = 200):
+        self.window = window
+        self._samples: Dict[str, deque] = {}
+
+    def record(self, name: str, latency_ms: float):
+        self._samples.setdefault(name, deque(maxlen=self.window)).append(latency_ms)
+
+    def percentile(self, name: str, pct: float) -> Optional[float]:
+        samples = self._samples.get(name)
+        if not samples:
+            return None
+        ordered = sorted(samples)
+        index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def count(self, name: str) -> int:
+        return len(self._samples.get(name, ()))
+
+
+class Hedger:
+    """Issues a backup call when the first one runs past the observed p95"""
+
+    def __init__(self, enabled: bool = False, percentile: float = 95.0, min_samples: int = 20,
+                 min_delay_ms: float = 10.0):
+        self.enabled = enabled
+        self.percentile = percentile
+        self.min_samples = min_samples
+        self.min_delay_ms = min_delay_ms
+        self.latencies = LatencyTracker()
+        self.stats = {"calls": 0, "hedged": 0, "hedge_wins": 0}
+
+    @classmethod
+    def from_env(cls) -> "Hedger":
+        return cls(
+            enabled=os.environ.get("HEDGE_ENABLED", "0") == "1",
+            percentile=float(os.environ.get("HEDGE_PERCENTILE", "95")),
+            min_samples=int(os.environ.get("HEDGE_MIN_SAMPLES", "20")),
+        )
+
+    def hedge_delay(self, name: str) -> Optional[float]:
+        """Seconds to wait before hedging, or None while there is too little history"""
+        if not self.enabled or self.latencies.count(name) < self.min_samples:
+            return None
+        return max(self.min_delay_ms, self.latencies.percentile(name, self.percentile)) / 1000
+
+    async def call(self, name: str, make_call: Callable[[], Awaitable]) -> tuple:
+        """Run make_call(), hedging with a second identical call if needed; returns (result, hedged)"""
+        self.stats["calls"] += 1
+        start = time.monotonic()
+        delay = self.hedge_delay(name)
+        if delay is None:
+            result = await make_call()
+            self.latencies.record(name, (time.monotonic() - start) * 1000)
+            return result, False
+
+        primary = asyncio.ensure_future(make_call())
+        backup = None
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done:
+                self.latencies.record(name, (time.monotonic() - start) * 1000)
+                return primary.result(), False
+
+            self.stats["hedged"] += 1
+            backup = asyncio.ensure_future(make_call())
+            pending = {primary, backup}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is backup:
+                            self.stats["hedge_wins"] += 1
+                        self.latencies.record(name, (time.monotonic() - start) * 1000)
+                        return task.result(), True
+            # Both failed - surface the primary's error
+            return primary.result(), True
+        finally:
+            # Also reached when the caller's budget cancels us mid-wait
+            for task in (primary, backup):
+                if task is not None and not task.done():
+                    task.cancel()
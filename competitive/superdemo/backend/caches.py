@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+In-process caches for the Memory Systems Demo API
+Bounded LRU maps with optional per-entry TTL, plus an on-disk SQLite tier
+that several worker processes on one host can share
+"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Hashable, List, Optional, Tuple, Union
+
+
+class TTLCache:
+    """LRU cache with an optional time-to-live, safe for use from a single event loop"""
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple[float, Any]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value and mark it recently used, or default on miss/expiry"""
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return default
+        expires_at, value = item
+        if expires_at and expires_at < time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return default
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None):
+        """Insert or refresh an entry, evicting the least recently used if full"""
+        ttl = self.ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else 0.0
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        item = self._data.pop(key, None)
+        return default if item is None else item[1]
+
+    def clear(self):
+        self._data.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        item = self._data.get(key)
+        return item is not None and not (item[0] and item[0] < time.monotonic())
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> dict:
+        """Size and hit/miss counters"""
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+def normalize_query(query: str) -> str:
+    """Case-fold, collapse whitespace and drop trailing punctuation so near-identical queries share a key"""
+    return " ".join(query.lower().split()).rstrip("?!. ")
+
+
+class RetrievalCache:
+    """
+    Per-user retrieval results, invalidated by moving the user's version on
+    every memory write. Versions come from one increasing counter (the shared
+    tier's sequence number when there is one), so only the `max_versions` most
+    recently used users need theirs kept: a user without one reads at the
+    counter value when the last version was dropped, which no earlier result
+    for that user can be stored under.
+    """
+
+    def __init__(self, maxsize: int = 4096, ttl: Optional[float] = None, max_versions: int = 16384):
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._versions: "OrderedDict[tuple, int]" = OrderedDict()
+        self.max_versions = max_versions
+        # Highest version assigned or adopted, and its value when a user's version was last dropped
+        self._clock = 0
+        self._floor = 0
+        self.invalidations = 0
+        self.versions_dropped = 0
+
+    def _version(self, backend: str, user_id: str) -> int:
+        version = self._versions.get((backend, user_id))
+        if version is None:
+            return self._floor
+        self._versions.move_to_end((backend, user_id))
+        return version
+
+    def _set_version(self, backend: str, user_id: str, version: int):
+        self._clock = max(self._clock, version)
+        self._versions[(backend, user_id)] = version
+        self._versions.move_to_end((backend, user_id))
+        while len(self._versions) > self.max_versions:
+            self._versions.popitem(last=False)
+            self._floor = self._clock
+            self.versions_dropped += 1
+
+    def lookup(self, backend: str, user_id: str, query: str, context: Optional[str] = None) -> tuple:
+        """
+        Return (key, cached value or None); pass the key back to store() after
+        a miss. `context` separates results that also depend on more than the
+        user, such as a session's thread.
+        """
+        key = (backend, user_id, self._version(backend, user_id), normalize_query(query))
+        if context is not None:
+            key += (context,)
+        return key, self._entries.get(key)
+
+    def store(self, key: tuple, value: Any):
+        """Cache a result under the key from lookup(); a write in between leaves it unreachable"""
+        self._entries.set(key, value)
+
+    def invalidate(self, backend: str, user_id: str):
+        """Orphan every cached result for the user; stale entries age out through LRU"""
+        self._set_version(backend, user_id, self._clock + 1)
+        self.invalidations += 1
+
+    def apply_versions(self, versions: List[Tuple[str, int]]):
+        """
+        Adopt user versions published by other workers through a shared tier
+        (see SQLiteCache.bump_version); versions only move forward
+        """
+        for scope, version in versions:
+            backend, user_id = scope.split("|", 1)
+            # A user without a kept version adopts any published one: it is that user's latest
+            current = self._versions.get((backend, user_id))
+            if current is None or version > current:
+                self._set_version(backend, user_id, version)
+                self.invalidations += 1
+
+    def shareable(self, key: tuple) -> bool:
+        """
+        Whether a lookup() key may be read from or written to a shared tier:
+        other workers' dropped-version keys can coincide with this one's, so
+        only a kept version, or 0 before any was dropped, is shared
+        """
+        backend, user_id, version = key[:3]
+        return version == self._versions.get((backend, user_id), 0)
+
+    @staticmethod
+    def version_scope(backend: str, user_id: str) -> str:
+        return f"{backend}|{user_id}"
+
+    @staticmethod
+    def shared_key(key: tuple) -> str:
+        """String form of a lookup() key for a shared tier; the version keeps it in step across workers"""
+        return "retrieval:" + json.dumps(list(key), ensure_ascii=False, separators=(",", ":"))
+
+    def stats(self) -> dict:
+        return {
+            **self._entries.stats(),
+            "invalidations": self.invalidations,
+            "versions": len(self._versions),
+            "versions_dropped": self.versions_dropped,
+        }
+
+
+class SQLiteCache:
+    """
+    String cache in a SQLite file (WAL mode) shared across processes, with TTL
+    and a row limit enforced by evicting the least recently read rows. The
+    limit is checked every `evict_every` writes, so the table can run that
+    many rows over it in between. Calls block on disk I/O, so run them off
+    the event loop.
+    """
+
+    def __init__(self, path: Union[str, Path], maxsize: int = 100000, ttl: Optional[float] = None,
+                 evict_every: int = 100):
+        self.path = Path(path)
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.evict_every = max(1, evict_every)
+        self._writes = 0
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), timeout=5.0, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at)")
+        # Version counters: seq orders every bump so readers can poll for changes
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS versions (scope TEXT PRIMARY KEY, version INTEGER NOT NULL, seq INTEGER NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS versions_seq ON versions (seq)")
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+            if row is None or (row[1] and row[1] < now):
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        ttl = self.ttl if ttl is None else ttl
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, value, now + ttl if ttl else 0.0, now)
+            )
+            self._writes += 1
+            if self._writes % self.evict_every:
+                return
+            excess = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0] - self.maxsize
+            if excess > 0:
+                # Expired rows go first, then the least recently read
+                cursor = self._conn.execute(
+                    "DELETE FROM cache WHERE key IN ("
+                    "SELECT key FROM cache ORDER BY (expires_at > 0 AND expires_at < ?) DESC, accessed_at LIMIT ?)",
+                    (now, excess)
+                )
+                self.evictions += cursor.rowcount
+
+    def bump_version(self, scope: str) -> int:
+        """
+        Move a scope to a new version and return it, atomically across
+        processes; the version is the next sequence number, so versions
+        increase across all scopes, not just within one
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                seq = self._conn.execute("SELECT COALESCE(MAX(seq), 0) + 1 FROM versions").fetchone()[0]
+                self._conn.execute(
+                    "INSERT INTO versions (scope, version, seq) VALUES (?, ?, ?) "
+                    "ON CONFLICT (scope) DO UPDATE SET version = excluded.version, seq = excluded.seq",
+                    (scope, seq, seq)
+                )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+        return seq
+
+    def versions_since(self, seq: int) -> Tuple[List[Tuple[str, int]], int]:
+        """(scope, version) pairs bumped after seq, and the seq to poll from next"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT scope, version, seq FROM versions WHERE seq > ? ORDER BY seq", (seq,)
+            ).fetchall()
+        return [(scope, version) for scope, version, _ in rows], (rows[-1][2] if rows else seq)
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+        return {
+            "path": str(self.path),
+            "size": size,
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class ResponseCache:
+    """LLM responses keyed on a hash of the rendered prompt, in an LRU with an optional shared SQLite tier"""
+
+    def __init__(self, maxsize: int = 1024, ttl: Optional[float] = None, disk: Optional[SQLiteCache] = None):
+        self.memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.disk = disk
+
+    @staticmethod
+    def key(model: str, messages: List[Any]) -> str:
+        """Stable hash of the model and every rendered prompt message (system prompt, context, query)"""
+        rendered = [[getattr(message, "type", ""), getattr(message, "content", str(message))] for message in messages]
+        payload = json.dumps([model, rendered], ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """In-process tier only; callers check the disk tier off the event loop"""
+        return self.memory.get(key)
+
+    def set(self, key: str, value: str):
+        self.memory.set(key, value)
+
+    def stats(self) -> dict:
+        return {
+            "memory": self.memory.stats(),
+            "disk": self.disk.stats() if self.disk else None,
+        }
@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+"""
+Record/replay of Mem0, Zep and LLM calls for deterministic offline benchmarks
+In record mode the SDK clients and the chat model are wrapped, and every call
+is written to a cassette (JSONL, gzipped for a .gz path) with its arguments,
+result or error, and latency. In replay mode the cassette alone answers those
+calls, after the recorded latency or none, so the server's own overhead can
+be measured without a network or API keys.
+"""
+
+import asyncio
+import gzip
+import hashlib
+import inspect
+import json
+import threading
+import time
+from collections import deque
+from datetime import date, datetime
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Deque, Dict, List, Optional, Tuple, Union
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+from backpressure import status_code_of
+
+OBJECT_KEY = "__obj__"
+
+
+class CassetteMiss(LookupError):
+    """A replayed call that the cassette has no recording for"""
+
+
+class ReplayedError(Exception):
+    """An upstream error served from the cassette, keeping its HTTP status for error handling"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, error_type: str = "Exception"):
+        super().__init__(message)
+        self.status_code = status_code
+        self.error_type = error_type
+
+
+def to_jsonable(value: Any) -> Any:
+    """JSON form of an SDK payload; objects (pydantic models, namespaces) are tagged so replay restores attribute access"""
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, (list, tuple, set)):
+        return [to_jsonable(item) for item in value]
+    if isinstance(value, dict):
+        return {str(key): to_jsonable(item) for key, item in value.items()}
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    fields = getattr(type(value), "model_fields", None)
+    if fields is not None:
+        return {OBJECT_KEY: {name: to_jsonable(getattr(value, name, None)) for name in fields}}
+    if hasattr(value, "__dict__"):
+        return {OBJECT_KEY: {key: to_jsonable(item) for key, item in vars(value).items() if not key.startswith("_")}}
+    return str(value)
+
+
+def from_jsonable(value: Any) -> Any:
+    if isinstance(value, list):
+        return [from_jsonable(item) for item in value]
+    if isinstance(value, dict):
+        if set(value) == {OBJECT_KEY}:
+            return SimpleNamespace(**{key: from_jsonable(item) for key, item in value[OBJECT_KEY].items()})
+        return {key: from_jsonable(item) for key, item in value.items()}
+    return value
+
+
+def messages_payload(messages: list) -> list:
+    """Prompt messages as [type, content] pairs - what the call key and the cassette keep"""
+    return [[getattr(message, "type", ""), getattr(message, "content", str(message))] for message in messages]
+
+
+class Cassette:
+    """
+    Recorded calls keyed on call name and a hash of the arguments. Replay
+    serves a key's recordings in order and repeats the last. A call with no
+    exact match raises CassetteMiss; with strict=False it gets the next
+    recording of the same name instead, with a warning the first time.
+    Recorded lines are buffered and written every flush_every calls or
+    flush_interval seconds, and on close.
+    """
+
+    def __init__(self, path: Union[str, Path], mode: str, latency: str = "recorded", strict: bool = True,
+                 flush_every: int = 64, flush_interval: float = 1.0):
+        if mode not in ("record", "replay"):
+            raise ValueError(f"Cassette mode must be 'record' or 'replay', not '{mode}'")
+        self.path = Path(path)
+        self.mode = mode
+        self.latency = latency
+        # "recorded", "zero" or a multiplier such as "0.5"
+        self.latency_scale = {"recorded": 1.0, "zero": 0.0}.get(latency)
+        if self.latency_scale is None:
+            self.latency_scale = float(latency)
+        self.strict = strict
+        self.flush_every = flush_every
+        self.flush_interval = flush_interval
+        self._entries: Dict[Tuple[str, str], Deque[dict]] = {}
+        self._by_name: Dict[str, Deque[dict]] = {}
+        self._lock = threading.Lock()
+        self._file = None
+        self._buffer: List[str] = []
+        self._flushed_at = time.monotonic()
+        self._warned: set = set()
+        self.stats = {"recorded": 0, "replayed": 0, "fallbacks": 0, "misses": 0, "recorded_latency_ms": 0.0}
+        if mode == "replay":
+            self._load()
+
+    @classmethod
+    def from_env(cls, environ) -> Optional["Cassette"]:
+        """Cassette configured by CASSETTE_MODE / CASSETTE_PATH / CASSETTE_LATENCY / CASSETTE_STRICT, or None"""
+        mode = environ.get("CASSETTE_MODE", "").lower()
+        if mode in ("", "off"):
+            return None
+        return cls(
+            environ.get("CASSETTE_PATH", "cassette.jsonl.gz"),
+            mode,
+            latency=environ.get("CASSETTE_LATENCY", "recorded"),
+            strict=environ.get("CASSETTE_STRICT", "1") == "1"
+        )
+
+    @property
+    def recording(self) -> bool:
+        return self.mode == "record"
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode == "replay"
+
+    @staticmethod
+    def key(name: str, payload: Any) -> str:
+        encoded = json.dumps([name, payload], sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+        return hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:20]
+
+    def _open(self, mode: str):
+        if self.path.suffix == ".gz":
+            return gzip.open(self.path, mode + "t", encoding="utf-8")
+        return open(self.path, mode, encoding="utf-8")
+
+    def _load(self):
+        # A recording cut off by a crash has no gzip trailer and may end mid-line;
+        # everything flushed before that still replays
+        with self._open("r") as f:
+            try:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        print(f"WARNING: Cassette {self.path} ends in a partial line, ignored")
+                        break
+                    self._entries.setdefault((entry["call"], entry["key"]), deque()).append(entry)
+                    self._by_name.setdefault(entry["call"], deque()).append(entry)
+            except EOFError:
+                print(f"WARNING: Cassette {self.path} was not closed cleanly; replaying the calls before the cut")
+
+    def record(self, name: str, payload: Any, latency_ms: float, is_async: bool = True, **outcome):
+        """Append one call; outcome is result=..., error=... and, for streams, chunks=[[offset_ms, text], ...]"""
+        entry = {"call": name, "key": self.key(name, payload), "async": is_async,
+                 "latency_ms": round(latency_ms, 2), "args": payload, **outcome}
+        line = json.dumps(entry, ensure_ascii=False, separators=(",", ":"))
+        # Sync SDK calls are recorded from executor threads
+        with self._lock:
+            self._buffer.append(line + "\n")
+            self.stats["recorded"] += 1
+            self.stats["recorded_latency_ms"] += latency_ms
+            # Async calls record on the event loop, so the file (and a gzip
+            # flush, which also resets the compressor) is only touched per batch
+            if len(self._buffer) >= self.flush_every or time.monotonic() - self._flushed_at >= self.flush_interval:
+                self._flush()
+
+    def _flush(self):
+        """Write and flush the buffered lines; a crashed recording keeps every call flushed before it"""
+        if self._file is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self._file = self._open("w")
+        self._file.write("".join(self._buffer))
+        self._file.flush()
+        self._buffer.clear()
+        self._flushed_at = time.monotonic()
+
+    def take(self, name: str, payload: Any) -> dict:
+        """The recording that answers this call"""
+        with self._lock:
+            entries = self._entries.get((name, self.key(name, payload)))
+            if entries:
+                self.stats["replayed"] += 1
+                return entries.popleft() if len(entries) > 1 else entries[0]
+            candidates = self._by_name.get(name)
+            if self.strict or not candidates:
+                self.stats["misses"] += 1
+                raise CassetteMiss(f"No recorded {name} call for {json.dumps(payload)[:200]}")
+            # Same call, different arguments (an id or a batch that differs between runs)
+            self.stats["fallbacks"] += 1
+            if name not in self._warned:
+                self._warned.add(name)
+                print(f"WARNING: Cassette has no exact {name} recording; answering with another {name} call")
+            candidates.rotate(-1)
+            return candidates[-1]
+
+    def delay_s(self, entry: dict) -> float:
+        return entry["latency_ms"] * self.latency_scale / 1000
+
+    @staticmethod
+    def outcome(entry: dict) -> Any:
+        """The recorded result, or the recorded error raised again"""
+        if "error" in entry:
+            error = entry["error"]
+            raise ReplayedError(error["message"], error.get("status_code"), error.get("type", "Exception"))
+        return from_jsonable(entry.get("result"))
+
+    def has_call(self, name: str) -> bool:
+        return name in self._by_name
+
+    def has_namespace(self, name: str) -> bool:
+        return any(call.startswith(name + ".") for call in self._by_name)
+
+    def is_async(self, name: str) -> bool:
+        entries = self._by_name.get(name)
+        return bool(entries[0].get("async", True)) if entries else True
+
+    def close(self):
+        with self._lock:
+            if self._buffer:
+                self._flush()
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def metrics(self) -> dict:
+        return {"mode": self.mode, "path": str(self.path), "latency": self.latency, "strict": self.strict,
+                "calls": sum(len(entries) for entries in self._by_name.values()), **self.stats}
+
+
+def error_record(error: BaseException) -> dict:
+    return {"type": type(error).__name__, "message": str(error), "status_code": status_code_of(error)}
+
+
+class CassetteClient:
+    """
+    Stands in for an SDK client or one of its namespaces (zep.graph, zep.thread,
+    zep.user). Recording wraps `target`; replaying needs only the cassette.
+    """
+
+    def __init__(self, cassette: Cassette, name: str, target: Any = None):
+        self._cassette = cassette
+        self._name = name
+        self._target = target
+
+    def __getattr__(self, attr: str) -> Any:
+        if attr.startswith("_"):
+            raise AttributeError(attr)
+        path = f"{self._name}.{attr}"
+        if self._cassette.recording:
+            value = getattr(self._target, attr)
+            if callable(value):
+                return self._recorder(path, value)
+            if value is None or isinstance(value, (bool, int, float, str, bytes)):
+                return value
+            return CassetteClient(self._cassette, path, value)
+        if self._cassette.has_call(path):
+            return self._replayer(path)
+        if self._cassette.has_namespace(path):
+            return CassetteClient(self._cassette, path)
+        raise AttributeError(f"{path} was not recorded")
+
+    def _recorder(self, path: str, method):
+        cassette = self._cassette
+
+        if inspect.iscoroutinefunction(method):
+            async def record_async(*args, **kwargs):
+                payload = to_jsonable({"args": args, "kwargs": kwargs})
+                start = time.perf_counter()
+                try:
+                    result = await method(*args, **kwargs)
+                except Exception as e:
+                    cassette.record(path, payload, (time.perf_counter() - start) * 1000, error=error_record(e))
+                    raise
+                cassette.record(path, payload, (time.perf_counter() - start) * 1000, result=to_jsonable(result))
+                return result
+            return record_async
+
+        def record_sync(*args, **kwargs):
+            payload = to_jsonable({"args": args, "kwargs": kwargs})
+            start = time.perf_counter()
+            try:
+                result = method(*args, **kwargs)
+            except Exception as e:
+                cassette.record(path, payload, (time.perf_counter() - start) * 1000, False, error=error_record(e))
+                raise
+            cassette.record(path, payload, (time.perf_counter() - start) * 1000, False, result=to_jsonable(result))
+            return result
+        return record_sync
+
+    def _replayer(self, path: str):
+        cassette = self._cassette
+
+        if cassette.is_async(path):
+            async def replay_async(*args, **kwargs):
+                entry = cassette.take(path, to_jsonable({"args": args, "kwargs": kwargs}))
+                await asyncio.sleep(cassette.delay_s(entry))
+                return cassette.outcome(entry)
+            return replay_async
+
+        def replay_sync(*args, **kwargs):
+            entry = cassette.take(path, to_jsonable({"args": args, "kwargs": kwargs}))
+            time.sleep(cassette.delay_s(entry))
+            return cassette.outcome(entry)
+        return replay_sync
+
+
+class CassetteChatModel(BaseChatModel):
+    """Chat model that records the wrapped model's answers (and stream timing), or replays them"""
+
+    cassette: Any
+    inner: Any = None
+    model: Optional[str] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "cassette"
+
+    def _record(self, messages, start: float, **outcome):
+        self.cassette.record("llm", messages_payload(messages), (time.perf_counter() - start) * 1000, **outcome)
+
+    def _result(self, content: str) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=content))])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.cassette.recording:
+            start = time.perf_counter()
+            try:
+                response = self.inner.invoke(messages, stop=stop)
+            except Exception as e:
+                self._record(messages, start, error=error_record(e))
+                raise
+            self._record(messages, start, result=response.content)
+            return self._result(response.content)
+        entry = self.cassette.take("llm", messages_payload(messages))
+        time.sleep(self.cassette.delay_s(entry))
+        return self._result(self.cassette.outcome(entry))
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        if self.cassette.recording:
+            start = time.perf_counter()
+            try:
+                response = await self.inner.ainvoke(messages, stop=stop)
+            except Exception as e:
+                self._record(messages, start, error=error_record(e))
+                raise
+            self._record(messages, start, result=response.content)
+            return self._result(response.content)
+        entry = self.cassette.take("llm", messages_payload(messages))
+        await asyncio.sleep(self.cassette.delay_s(entry))
+        return self._result(self.cassette.outcome(entry))
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        if self.cassette.recording:
+            start = time.perf_counter()
+            chunks: List[list] = []
+            try:
+                async for chunk in self.inner.astream(messages, stop=stop):
+                    text = chunk.content if hasattr(chunk, "content") else str(chunk)
+                    chunks.append([round((time.perf_counter() - start) * 1000, 2), text])
+                    yield ChatGenerationChunk(message=AIMessageChunk(content=text))
+            except Exception as e:
+                self._record(messages, start, error=error_record(e))
+                raise
+            self._record(messages, start, result="".join(text for _, text in chunks), chunks=chunks)
+            return
+
+        entry = self.cassette.take("llm", messages_payload(messages))
+        content = self.cassette.outcome(entry)
+        # Answers recorded without streaming arrive as one chunk at the end
+        chunks = entry.get("chunks") or [[entry["latency_ms"], content]]
+        elapsed_ms = 0.0
+        for offset_ms, text in chunks:
+            await asyncio.sleep(max(0.0, offset_ms - elapsed_ms) * self.cassette.latency_scale / 1000)
+            elapsed_ms = offset_ms
+            yield ChatGenerationChunk(message=AIMessageChunk(content=text))
+
+
+def wrap_clients(cassette: Cassette, llm: Any, mem0_client: Any, zep_client: Any) -> tuple:
+    """(llm, mem0_client, zep_client) that record to the cassette, or that replay it when llm and clients are None"""
+    model = getattr(llm, "model_name", None) or getattr(llm, "model", None)
+    return (
+        # A client that failed to build stays None when recording, so callers still fall back to mocks
+        CassetteChatModel(cassette=cassette, inner=llm, model=model) if llm or cassette.replaying else llm,
+        CassetteClient(cassette, "mem0", mem0_client) if mem0_client or cassette.replaying else None,
+        CassetteClient(cassette, "zep", zep_client) if zep_client or cassette.replaying else None,
+    )
+
+
+def install(app_module, path: Union[str, Path], mode: str = "replay", latency: str = "recorded",
+            strict: bool = True) -> Cassette:
+    """Record the backend module's current clients to a cassette, or replace them with a recorded one"""
+    cassette = Cassette(path, mode, latency=latency, strict=strict)
+    clients = (app_module.llm, app_module.mem0_client, app_module.zep_client) if cassette.recording else (None,) * 3
+    app_module.cassette = cassette
+    app_module.llm, app_module.mem0_client, app_module.zep_client = wrap_clients(cassette, *clients)
+    return cassette
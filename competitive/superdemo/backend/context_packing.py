@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Context packing for retrieved memories
+Sits between retrieval and the LLM call: drops near-duplicate hits, reranks
+them against the query with an MMR diversity pass, enforces a token budget
+and emits one compact context message
+"""
+
+import os
+import re
+from dataclasses import dataclass, field
+from typing import List
+
+import numpy as np
+
+from local_memory import HashingEmbedder
+
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+_encoding = None
+
+
+def load_encoding(name: str = "o200k_base") -> bool:
+    """
+    Load the tiktoken encoding, which may download it on first use - call it
+    off the event loop. Returns whether token counts are exact from now on.
+    """
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding(name)
+        except Exception as e:
+            # Offline, or the download failed: keep estimating
+            print(f"WARNING: tiktoken encoding {name} unavailable, estimating token counts: {e}")
+    return _encoding is not None
+
+
+def count_tokens(text: str) -> int:
+    """Prompt tokens for the text - exact once load_encoding() has succeeded, else ~4 characters per token"""
+    if _encoding is not None:
+        return len(_encoding.encode(text))
+    return max(1, (len(text) + 3) // 4) if text else 0
+
+
+@dataclass
+class PackedContext:
+    """Outcome of packing: the kept memories in prompt order plus token accounting"""
+    memories: List[str] = field(default_factory=list)
+    text: str = ""
+    raw_tokens: int = 0
+    packed_tokens: int = 0
+    duplicates_dropped: int = 0
+    irrelevant_dropped: int = 0
+    budget_dropped: int = 0
+
+    @property
+    def tokens_saved(self) -> int:
+        return max(0, self.raw_tokens - self.packed_tokens)
+
+    def metrics(self) -> dict:
+        return {
+            "context_tokens_raw": float(self.raw_tokens),
+            "context_tokens_packed": float(self.packed_tokens),
+            "prompt_tokens_saved": float(self.tokens_saved),
+            "context_items_kept": float(len(self.memories)),
+            "context_duplicates_dropped": float(self.duplicates_dropped),
+            "context_irrelevant_dropped": float(self.irrelevant_dropped),
+            "context_budget_dropped": float(self.budget_dropped),
+        }
+
+
+class ContextPacker:
+    """
+    Dedupe, MMR-rerank and token-budget retrieved memories using the local
+    hashing embedder. The embedder only sees shared words, so a hit's relevance
+    blends that lexical score with its rank from the backend's semantic search:
+    a top hit phrased differently from the query is not pushed out.
+    """
+
+    def __init__(self, token_budget: int = 400, dedupe_threshold: float = 0.9, mmr_lambda: float = 0.7,
+                 relative_cutoff: float = 0.0, rank_weight: float = 0.5,
+                 header: str = "Relevant context from previous conversations:", embedder=None):
+        self.token_budget = token_budget
+        self.dedupe_threshold = dedupe_threshold
+        self.mmr_lambda = mmr_lambda
+        self.relative_cutoff = relative_cutoff
+        self.rank_weight = rank_weight
+        self.header = header
+        self.embedder = embedder or HashingEmbedder()
+
+    @classmethod
+    def from_env(cls) -> "ContextPacker":
+        return cls(
+            token_budget=int(os.environ.get("CONTEXT_TOKEN_BUDGET", "400")),
+            dedupe_threshold=float(os.environ.get("CONTEXT_DEDUPE_THRESHOLD", "0.9")),
+            mmr_lambda=float(os.environ.get("CONTEXT_MMR_LAMBDA", "0.7")),
+            relative_cutoff=float(os.environ.get("CONTEXT_RELATIVE_CUTOFF", "0")),
+            rank_weight=float(os.environ.get("CONTEXT_RANK_WEIGHT", "0.5")),
+        )
+
+    def pack(self, query: str, memories: List[str]) -> PackedContext:
+        """Pack retrieved memories for the prompt, most useful first, within the token budget"""
+        packed = PackedContext()
+        candidates = []
+        seen = set()
+        for memory in memories:
+            text = WHITESPACE_PATTERN.sub(" ", memory or "").strip()
+            key = text.lower()
+            if not text:
+                continue
+            if key in seen:
+                packed.duplicates_dropped += 1
+                continue
+            seen.add(key)
+            candidates.append(text)
+        packed.raw_tokens = count_tokens("\n".join(memories))
+        if not candidates:
+            return packed
+
+        vectors = self.embedder.embed([query] + candidates)
+        query_vector, vectors = vectors[0], vectors[1:]
+        # Hits arrive best first from the backend: 1 for the top hit down to 1/n
+        rank_prior = 1.0 - np.arange(len(candidates)) / len(candidates)
+        relevance = (1 - self.rank_weight) * (vectors @ query_vector) + self.rank_weight * rank_prior
+        similarity = vectors @ vectors.T
+
+        # Near-duplicates: keep the more relevant of any pair above the threshold
+        keep = []
+        for i in np.argsort(-relevance):
+            if any(similarity[i, j] >= self.dedupe_threshold for j in keep):
+                packed.duplicates_dropped += 1
+            else:
+                keep.append(int(i))
+
+        # Optionally prune hits scoring far below the best one
+        best = float(relevance[keep[0]])
+        if best > 0 and self.relative_cutoff > 0:
+            relevant = [i for i in keep if relevance[i] >= best * self.relative_cutoff]
+            packed.irrelevant_dropped = len(keep) - len(relevant)
+            keep = relevant
+
+        # MMR: trade relevance against similarity to what is already selected
+        selected = []
+        remaining = list(keep)
+        while remaining:
+            def mmr(i):
+                redundancy = max((similarity[i, j] for j in selected), default=0.0)
+                return self.mmr_lambda * relevance[i] - (1 - self.mmr_lambda) * redundancy
+            choice = max(remaining, key=mmr)
+            remaining.remove(choice)
+            selected.append(choice)
+
+        used = count_tokens(self.header)
+        for i in selected:
+            cost = count_tokens(f"- {candidates[i]}")
+            if self.token_budget and used + cost > self.token_budget and packed.memories:
+                packed.budget_dropped += 1
+                continue
+            packed.memories.append(candidates[i])
+            used += cost
+
+        packed.text = "\n".join([self.header] + [f"- {memory}" for memory in packed.memories])
+        packed.packed_tokens = count_tokens(packed.text)
+        return packed
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+"""
+Shared HTTP connection pooling for the OpenAI, Mem0 and Zep clients
+One place to size connection limits, keep-alive and HTTP/2, pre-warm
+connections at startup and report pool statistics
+"""
+
+import asyncio
+import os
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+import httpx
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+@dataclass
+class PoolConfig:
+    """Connection pool limits shared by every upstream client"""
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry: float = 30.0
+    http2: bool = True
+    connect_timeout: float = 5.0
+    read_timeout: float = 60.0
+    prewarm_connections: int = 2
+    prewarm_timeout: float = 3.0
+
+    @classmethod
+    def from_env(cls) -> "PoolConfig":
+        return cls(
+            max_connections=int(os.environ.get("HTTP_POOL_MAX_CONNECTIONS", cls.max_connections)),
+            max_keepalive_connections=int(os.environ.get("HTTP_POOL_MAX_KEEPALIVE", cls.max_keepalive_connections)),
+            keepalive_expiry=float(os.environ.get("HTTP_POOL_KEEPALIVE_EXPIRY", cls.keepalive_expiry)),
+            http2=os.environ.get("HTTP_POOL_HTTP2", "1") == "1",
+            connect_timeout=float(os.environ.get("HTTP_POOL_CONNECT_TIMEOUT", cls.connect_timeout)),
+            read_timeout=float(os.environ.get("HTTP_POOL_READ_TIMEOUT", cls.read_timeout)),
+            prewarm_connections=int(os.environ.get("HTTP_POOL_PREWARM", cls.prewarm_connections)),
+            prewarm_timeout=float(os.environ.get("HTTP_POOL_PREWARM_TIMEOUT", cls.prewarm_timeout)),
+        )
+
+    def limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry,
+        )
+
+    def timeout(self) -> httpx.Timeout:
+        return httpx.Timeout(self.read_timeout, connect=self.connect_timeout)
+
+
+class PoolInstrumentation:
+    """
+    Request counters for an httpx transport, safe to update from executor
+    threads. A request's pool wait is the time from entering the transport to
+    httpcore's first trace event on a connection (a new connection's TCP
+    connect, or the request headers on a reused one), so it excludes the
+    handshakes and covers only queueing for a free connection.
+    """
+
+    # Waits longer than this count in `waits`; below it the connection was free
+    WAIT_THRESHOLD_MS = 1.0
+
+    def __init__(self):
+        self.requests = 0
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.waits = 0
+        self.wait_ms_total = 0.0
+        self.wait_ms_max = 0.0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def _begin(self) -> float:
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        return time.perf_counter()
+
+    def _end(self, start: float, connected_at: Optional[float], failed: bool):
+        # A request that failed before reaching a connection (a pool timeout) waited throughout
+        wait_ms = ((connected_at or time.perf_counter()) - start) * 1000
+        with self._lock:
+            # Counted until response headers arrive; the body may still be streaming
+            self.in_flight -= 1
+            self.wait_ms_total += wait_ms
+            self.wait_ms_max = max(self.wait_ms_max, wait_ms)
+            if wait_ms > self.WAIT_THRESHOLD_MS:
+                self.waits += 1
+            if failed:
+                self.errors += 1
+
+    @staticmethod
+    def _restore_trace(request: httpx.Request, outer):
+        if outer is None:
+            request.extensions.pop("trace", None)
+        else:
+            request.extensions["trace"] = outer
+
+    def _connection_stats(self) -> dict:
+        connections = list(getattr(self._pool, "connections", []))
+        idle = sum(1 for connection in connections if connection.is_idle())
+        return {"connections": len(connections), "active": len(connections) - idle, "idle": idle}
+
+    def stats(self) -> dict:
+        return {
+            **self._connection_stats(),
+            "requests": self.requests,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "waits": self.waits,
+            "wait_ms_total": self.wait_ms_total,
+            "wait_ms_max": self.wait_ms_max,
+            "wait_ms_mean": self.wait_ms_total / self.requests if self.requests else 0.0,
+            "errors": self.errors,
+        }
+
+
+class InstrumentedAsyncTransport(PoolInstrumentation, httpx.AsyncHTTPTransport):
+    """Async transport that counts in-flight requests and measures their wait for a pooled connection"""
+
+    def __init__(self, limits: httpx.Limits, **kwargs):
+        httpx.AsyncHTTPTransport.__init__(self, limits=limits, **kwargs)
+        PoolInstrumentation.__init__(self)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        connected_at = []
+        outer = request.extensions.get("trace")
+
+        async def trace(name: str, info: dict):
+            if not connected_at:
+                connected_at.append(time.perf_counter())
+            if outer is not None:
+                await outer(name, info)
+
+        start = self._begin()
+        request.extensions["trace"] = trace
+        failed = False
+        try:
+            return await super().handle_async_request(request)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self._restore_trace(request, outer)
+            self._end(start, connected_at[0] if connected_at else None, failed)
+
+
+class InstrumentedTransport(PoolInstrumentation, httpx.HTTPTransport):
+    """Sync counterpart of InstrumentedAsyncTransport, for SDKs that only have a blocking client"""
+
+    def __init__(self, limits: httpx.Limits, **kwargs):
+        httpx.HTTPTransport.__init__(self, limits=limits, **kwargs)
+        PoolInstrumentation.__init__(self)
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        connected_at = []
+        outer = request.extensions.get("trace")
+
+        def trace(name: str, info: dict):
+            if not connected_at:
+                connected_at.append(time.perf_counter())
+            if outer is not None:
+                outer(name, info)
+
+        start = self._begin()
+        request.extensions["trace"] = trace
+        failed = False
+        try:
+            return super().handle_request(request)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self._restore_trace(request, outer)
+            self._end(start, connected_at[0] if connected_at else None, failed)
+
+
+class HTTPPool:
+    """Builds httpx clients that share one pooling configuration and exposes their statistics"""
+
+    def __init__(self, config: PoolConfig):
+        self.config = config
+        self.http2 = config.http2 and HTTP2_AVAILABLE
+        self._async_clients: Dict[str, httpx.AsyncClient] = {}
+        self._transports: Dict[str, InstrumentedAsyncTransport] = {}
+        self._sync_clients: Dict[str, httpx.Client] = {}
+        self._sync_transports: Dict[str, InstrumentedTransport] = {}
+        self.prewarm_ms: Dict[str, float] = {}
+        self.prewarm_errors: Dict[str, str] = {}  # Upstreams no pre-warm connection could reach
+
+    def async_client(self, name: str) -> httpx.AsyncClient:
+        """Return the named pooled async client, creating it on first use"""
+        if name not in self._async_clients:
+            transport = InstrumentedAsyncTransport(limits=self.config.limits(), http2=self.http2)
+            self._transports[name] = transport
+            self._async_clients[name] = httpx.AsyncClient(
+                transport=transport,
+                timeout=self.config.timeout(),
+            )
+        return self._async_clients[name]
+
+    def sync_client(self, name: str) -> httpx.Client:
+        """Return the named pooled sync client, for SDKs that only have a blocking client"""
+        if name not in self._sync_clients:
+            transport = InstrumentedTransport(limits=self.config.limits(), http2=self.http2)
+            self._sync_transports[name] = transport
+            self._sync_clients[name] = httpx.Client(
+                transport=transport,
+                timeout=self.config.timeout(),
+            )
+        return self._sync_clients[name]
+
+    async def prewarm(self, targets: Dict[str, List[str]]):
+        """Open connections (TCP + TLS) to each client's upstream hosts before traffic arrives"""
+        reached = set()
+
+        async def warm(name: str, url: str):
+            start = time.monotonic()
+            try:
+                await self.async_client(name).head(url, timeout=self.config.prewarm_timeout)
+                reached.add(url)
+            except Exception as e:
+                self.prewarm_errors[url] = f"{type(e).__name__}: {e}"
+                print(f"WARNING: Failed to pre-warm {url}: {e}")
+            self.prewarm_ms[url] = max(self.prewarm_ms.get(url, 0.0), (time.monotonic() - start) * 1000)
+
+        await asyncio.gather(*(
+            warm(name, url)
+            for name, urls in targets.items()
+            for url in urls
+            for _ in range(self.config.prewarm_connections)
+        ))
+        for url in reached:
+            self.prewarm_errors.pop(url, None)
+
+    def stats(self) -> dict:
+        return {
+            "config": {**vars(self.config), "http2_enabled": self.http2},
+            "clients": {
+                **{name: transport.stats() for name, transport in self._transports.items()},
+                **{name if name not in self._transports else f"{name}_sync": transport.stats()
+                   for name, transport in self._sync_transports.items()},
+            },
+            "prewarm_ms": self.prewarm_ms,
+            "prewarm_errors": self.prewarm_errors,
+        }
+
+    async def aclose(self):
+        for client in self._async_clients.values():
+            await client.aclose()
+        for client in self._sync_clients.values():
+            client.close()
@@ -0,0 +1,554 @@
+#!/usr/bin/env python3
+"""
+Bulk ingestion of conversation histories and documents into Mem0 or Zep
+Streams JSONL transcripts and JSON/text documents, chunks them and pushes the
+chunks with bounded concurrency, per-backend rate limiting and a resumable
+checkpoint, reporting throughput as it goes
+
+Record formats (one per JSONL line, or a JSON list/object per file):
+  {"user_id": "...", "session_id": "...", "messages": [{"role": "user", "content": "..."}, ...]}
+  {"user_id": "...", "text": "..."}              - a text document
+  {"user_id": "...", "data": {...}}              - a JSON document
+Plain .txt/.md files are read as one text document for --user-id.
+
+    python ingest.py --backend zep --checkpoint seed.ckpt.json --concurrency 16 users.jsonl
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import re
+import sys
+import time
+from dataclasses import dataclass, field
+from functools import partial
+from pathlib import Path
+from typing import AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Set
+
+from backpressure import status_code_of
+from singleflight import SingleFlight
+
+PARAGRAPH_PATTERN = re.compile(r"\n\s*\n")
+TEXT_SUFFIXES = {".txt", ".md", ".markdown"}
+
+
+@dataclass
+class Chunk:
+    """One upstream write: a slice of a conversation, or a slice of a document"""
+    user_id: str
+    session_id: Optional[str] = None
+    messages: Optional[List[dict]] = None
+    text: Optional[str] = None
+    doc_type: str = "text"
+    size_bytes: int = 0
+
+
+def read_records(paths: Iterable[str], default_user_id: Optional[str] = None) -> Iterator[dict]:
+    """Yield records from JSONL (streamed line by line), JSON and plain text files"""
+    for path in map(Path, paths):
+        if path.suffix.lower() in TEXT_SUFFIXES:
+            yield {"user_id": default_user_id or path.stem, "text": path.read_text(encoding="utf-8")}
+        elif path.suffix.lower() == ".json":
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            for record in data if isinstance(data, list) else [data]:
+                yield record
+        else:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    if line.strip():
+                        yield json.loads(line)
+
+
+async def iterate(records: Iterable[dict]) -> AsyncIterator[dict]:
+    """Feed a synchronous record iterator to the async pipeline"""
+    for record in records:
+        yield record
+
+
+async def ndjson_records(chunks: AsyncIterator[bytes]) -> AsyncIterator[dict]:
+    """Parse an NDJSON byte stream, such as a request body, into records as it arrives"""
+    buffer = b""
+    async for data in chunks:
+        buffer += data
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
+    if buffer.strip():
+        yield json.loads(buffer)
+
+
+def split_text(text: str, max_chars: int) -> List[str]:
+    """Split on paragraph boundaries into chunks of at most max_chars"""
+    chunks, current = [], ""
+    for paragraph in PARAGRAPH_PATTERN.split(text.strip()):
+        paragraph = paragraph.strip()
+        while len(paragraph) > max_chars:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(paragraph[:max_chars])
+            paragraph = paragraph[max_chars:]
+        if not paragraph:
+            continue
+        if current and len(current) + len(paragraph) + 2 > max_chars:
+            chunks.append(current)
+            current = paragraph
+        else:
+            current = f"{current}\n\n{paragraph}" if current else paragraph
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def chunk_record(record: dict, max_messages: int = 20, max_chars: int = 4000) -> List[Chunk]:
+    """Split a record into upstream-sized chunks, raising ValueError if it is malformed"""
+    user_id = record.get("user_id")
+    if not user_id:
+        raise ValueError("record has no user_id")
+
+    if record.get("messages"):
+        messages = []
+        for message in record["messages"]:
+            if not message.get("content") or message.get("role") not in ("user", "assistant", "system"):
+                continue
+            messages.append({k: message[k] for k in ("role", "content", "name") if message.get(k)})
+        # Stable default session, so a resumed import writes to the same thread; the
+        # whole transcript and its user are hashed, so conversations that merely open
+        # alike ("Hi!") do not share one
+        session_id = record.get("session_id") or hashlib.sha1(
+            json.dumps([user_id, messages], sort_keys=True).encode("utf-8")
+        ).hexdigest()[:12]
+        return [
+            Chunk(user_id=user_id, session_id=session_id, messages=batch,
+                  size_bytes=sum(len(m["content"].encode("utf-8")) for m in batch))
+            for batch in (messages[i:i + max_messages] for i in range(0, len(messages), max_messages))
+        ]
+
+    if record.get("data") is not None:
+        data = json.dumps(record["data"], ensure_ascii=False)
+        if len(data) <= max_chars:
+            return [Chunk(user_id=user_id, text=data, doc_type="json", size_bytes=len(data.encode("utf-8")))]
+        text = data
+    elif record.get("text"):
+        text = record["text"]
+    else:
+        raise ValueError("record has no messages, text or data")
+    return [
+        Chunk(user_id=user_id, text=part, size_bytes=len(part.encode("utf-8")))
+        for part in split_text(text, max_chars)
+    ]
+
+
+class RateLimiter:
+    """Token bucket shared by every call to one backend; rate <= 0 disables it"""
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+        self.waited_s = 0.0
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                wait = (1 - self._tokens) / self.rate
+                self.waited_s += wait
+                await asyncio.sleep(wait)
+
+
+class Checkpoint:
+    """
+    Progress of one import, saved atomically so a crashed import resumes where
+    it stopped. Records are numbered in input order; `watermark` counts the
+    leading records that are fully written, `done` holds completed records
+    past it and `partial` the chunks written for records still in progress.
+    """
+
+    def __init__(self, path: Optional[Path], backend: str, source: str):
+        self.path = Path(path) if path else None
+        self.backend = backend
+        self.source = source
+        self.watermark = 0
+        self.done: Set[int] = set()
+        self.partial: Dict[int, int] = {}
+        self._last_save = 0.0
+        if self.path and self.path.exists():
+            self._load()
+
+    def _load(self):
+        with open(self.path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        if state.get("backend") != self.backend or state.get("source") != self.source:
+            raise ValueError(
+                f"Checkpoint {self.path} belongs to a {state.get('backend')} import of {state.get('source')}"
+            )
+        self.watermark = state.get("watermark", 0)
+        self.done = set(state.get("done", []))
+        self.partial = {int(k): v for k, v in state.get("partial", {}).items()}
+
+    def is_done(self, index: int) -> bool:
+        return index < self.watermark or index in self.done
+
+    def chunks_done(self, index: int) -> int:
+        return self.partial.get(index, 0)
+
+    def mark_chunk(self, index: int, chunks_done: int):
+        self.partial[index] = chunks_done
+
+    def mark_done(self, index: int):
+        self.partial.pop(index, None)
+        self.done.add(index)
+        while self.watermark in self.done:
+            self.done.remove(self.watermark)
+            self.watermark += 1
+
+    def save(self, force: bool = False, interval: float = 1.0):
+        """Write the checkpoint, at most once per interval unless forced"""
+        now = time.monotonic()
+        if not self.path or (not force and now - self._last_save < interval):
+            return
+        self._last_save = now
+        state = {
+            "backend": self.backend,
+            "source": self.source,
+            "watermark": self.watermark,
+            "done": sorted(self.done),
+            "partial": {str(k): v for k, v in self.partial.items()},
+            "updated_at": time.time(),
+        }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.path)
+
+
+class Mem0Sink:
+    """Writes chunks with Mem0 add calls; sync clients run on the given executor"""
+
+    name = "mem0"
+
+    def __init__(self, client, limiter: RateLimiter, executor=None, on_written: Optional[Callable[[str], None]] = None):
+        self.client = client
+        self.limiter = limiter
+        self.executor = executor
+        self.on_written = on_written
+
+    async def _call(self, method: str, *args, **kwargs):
+        await self.limiter.acquire()
+        func = getattr(self.client, method)
+        if asyncio.iscoroutinefunction(func):
+            return await func(*args, **kwargs)
+        return await asyncio.get_running_loop().run_in_executor(self.executor, partial(func, *args, **kwargs))
+
+    async def push(self, chunk: Chunk):
+        if chunk.messages:
+            messages = [{"role": m["role"], "content": m["content"]} for m in chunk.messages]
+        else:
+            messages = [{"role": "user", "content": chunk.text}]
+        await self._call("add", messages, user_id=chunk.user_id)
+        if self.on_written:
+            self.on_written(chunk.user_id)
+
+
+class ZepSink:
+    """Writes transcript chunks to per-session threads and documents to the user's graph"""
+
+    name = "zep"
+
+    def __init__(self, client, limiter: RateLimiter, on_written: Optional[Callable[[str], None]] = None):
+        self.client = client
+        self.limiter = limiter
+        self.on_written = on_written
+        self._known_users: Set[str] = set()
+        self._known_threads: Set[str] = set()
+        self._setup = SingleFlight()
+
+    @staticmethod
+    def _conflict(error: Exception) -> bool:
+        return status_code_of(error) == 409
+
+    async def _ensure_user(self, user_id: str):
+        if user_id in self._known_users:
+            return
+
+        async def add_user():
+            await self.limiter.acquire()
+            try:
+                # Seeding mostly creates users, so try the add first and treat a conflict as success
+                await self.client.user.add(user_id=user_id, email=f"{user_id}@example.com",
+                                           first_name="Demo", last_name="User")
+            except Exception as e:
+                if not self._conflict(e):
+                    raise
+            self._known_users.add(user_id)
+
+        await self._setup.do(("user", user_id), add_user)
+
+    async def _ensure_thread(self, user_id: str, session_id: str) -> str:
+        # Same deterministic id as the query endpoints, so imported sessions are reused
+        thread_id = f"{user_id}_thread_{session_id}"
+        if thread_id in self._known_threads:
+            return thread_id
+
+        async def create_thread():
+            await self.limiter.acquire()
+            try:
+                await self.client.thread.create(thread_id=thread_id, user_id=user_id)
+            except Exception as e:
+                # Zep reports an existing thread as 409 or a 400 saying so
+                if not self._conflict(e) and "already exists" not in str(e).lower():
+                    raise
+            self._known_threads.add(thread_id)
+
+        await self._setup.do(("thread", thread_id), create_thread)
+        return thread_id
+
+    async def push(self, chunk: Chunk):
+        await self._ensure_user(chunk.user_id)
+        if chunk.messages:
+            thread_id = await self._ensure_thread(chunk.user_id, chunk.session_id)
+            # Imported here so loading this module does not pull in the Zep SDK
+            from zep_cloud.types import Message
+            await self.limiter.acquire()
+            await self.client.thread.add_messages(
+                thread_id=thread_id,
+                messages=[
+                    Message(name=m.get("name") or (chunk.user_id if m["role"] == "user" else "Assistant"),
+                            role=m["role"], content=m["content"])
+                    for m in chunk.messages
+                ]
+            )
+        else:
+            await self.limiter.acquire()
+            await self.client.graph.add(user_id=chunk.user_id, type=chunk.doc_type, data=chunk.text)
+        if self.on_written:
+            self.on_written(chunk.user_id)
+
+
+@dataclass
+class IngestStats:
+    records: int = 0
+    chunks: int = 0
+    bytes: int = 0
+    skipped: int = 0
+    invalid: int = 0
+    failed: int = 0
+    retries: int = 0
+    errors: List[str] = field(default_factory=list)
+
+
+class Ingester:
+    """Pushes records to a sink with bounded concurrency, retries and checkpointing"""
+
+    def __init__(self, sink, checkpoint: Checkpoint, concurrency: int = 8, max_messages: int = 20,
+                 max_chars: int = 4000, max_attempts: int = 5, base_backoff: float = 0.5, max_backoff: float = 30.0,
+                 progress: Optional[Callable[[dict], None]] = None, progress_interval: float = 5.0):
+        self.sink = sink
+        self.checkpoint = checkpoint
+        self.concurrency = concurrency
+        self.max_messages = max_messages
+        self.max_chars = max_chars
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.progress = progress
+        self.progress_interval = progress_interval
+        self.stats = IngestStats()
+        self._start = 0.0
+
+    async def _push_with_retry(self, chunk: Chunk):
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                await self.sink.push(chunk)
+                return
+            except Exception:
+                if attempt == self.max_attempts:
+                    raise
+                self.stats.retries += 1
+                backoff = min(self.max_backoff, self.base_backoff * 2 ** (attempt - 1))
+                await asyncio.sleep(random.uniform(backoff / 2, backoff))
+
+    async def _ingest_record(self, index: int, record: dict):
+        try:
+            chunks = chunk_record(record, self.max_messages, self.max_chars)
+        except (ValueError, TypeError, AttributeError) as e:
+            self.stats.invalid += 1
+            self._note_error(f"record {index}: {e}")
+            self.checkpoint.mark_done(index)
+            return
+
+        # Chunks of one record go in order, so thread messages stay chronological
+        for position in range(self.checkpoint.chunks_done(index), len(chunks)):
+            try:
+                await self._push_with_retry(chunks[position])
+            except Exception as e:
+                # Left incomplete in the checkpoint, so a rerun resumes at this chunk
+                self.stats.failed += 1
+                self._note_error(f"record {index} chunk {position}: {e}")
+                return
+            self.stats.chunks += 1
+            self.stats.bytes += chunks[position].size_bytes
+            self.checkpoint.mark_chunk(index, position + 1)
+        self.stats.records += 1
+        self.checkpoint.mark_done(index)
+        self.checkpoint.save()
+
+    def _note_error(self, message: str):
+        if len(self.stats.errors) < 20:
+            self.stats.errors.append(message)
+
+    async def run(self, records: AsyncIterator[dict]) -> dict:
+        """Ingest every record from the stream and return the throughput report"""
+        self._start = time.perf_counter()
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.concurrency * 2)
+
+        async def worker():
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                await self._ingest_record(*item)
+
+        async def reporter():
+            while True:
+                await asyncio.sleep(self.progress_interval)
+                self.progress(self.report())
+
+        workers = [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+        progress_task = asyncio.create_task(reporter()) if self.progress else None
+        try:
+            index = 0
+            async for record in records:
+                if self.checkpoint.is_done(index):
+                    self.stats.skipped += 1
+                else:
+                    # Bounded queue: reading waits for the workers instead of buffering the input
+                    await queue.put((index, record))
+                index += 1
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for task in workers:
+                task.cancel()
+            if progress_task:
+                progress_task.cancel()
+            self.checkpoint.save(force=True)
+        return self.report()
+
+    def report(self) -> dict:
+        duration = time.perf_counter() - self._start if self._start else 0.0
+        stats = self.stats
+        return {
+            "backend": self.sink.name,
+            "records": stats.records,
+            "chunks": stats.chunks,
+            "bytes": stats.bytes,
+            "skipped_from_checkpoint": stats.skipped,
+            "invalid": stats.invalid,
+            "failed": stats.failed,
+            "retries": stats.retries,
+            "duration_s": duration,
+            "records_per_s": stats.records / duration if duration else 0.0,
+            "chunks_per_s": stats.chunks / duration if duration else 0.0,
+            "bytes_per_s": stats.bytes / duration if duration else 0.0,
+            "rate_limit_wait_s": self.sink.limiter.waited_s,
+            "checkpoint": {
+                "path": str(self.checkpoint.path) if self.checkpoint.path else None,
+                "watermark": self.checkpoint.watermark,
+            },
+            "errors": stats.errors,
+        }
+
+
+def build_client(backend: str, args):
+    """Real SDK client from the API key in the environment, or a stand-in with --stand-ins"""
+    if args.stand_ins:
+        import standins
+        if backend == "mem0":
+            return standins.StandInMem0(add_latency=args.stand_in_latency)
+        return standins.StandInZep(add_latency=args.stand_in_latency, setup_latency=args.stand_in_latency)
+
+    from dotenv import load_dotenv
+    load_dotenv(dotenv_path=Path(__file__).parent / ".env")
+    if backend == "mem0":
+        try:
+            from mem0 import AsyncMemoryClient as MemoryClient
+        except ImportError:
+            from mem0 import MemoryClient
+        return MemoryClient(api_key=os.environ["MEM0_API_KEY"])
+    from zep_cloud import AsyncZep
+    return AsyncZep(api_key=os.environ["ZEP_API_KEY"])
+
+
+def print_progress(report: dict):
+    print(f"  {report['records']} records, {report['chunks']} chunks, "
+          f"{report['records_per_s']:.1f} records/s, {report['bytes_per_s'] / 1024:.1f} KiB/s, "
+          f"{report['failed']} failed", flush=True)
+
+
+async def run_import(args) -> dict:
+    client = build_client(args.backend, args)
+    limiter = RateLimiter(args.rate)
+    sink = Mem0Sink(client, limiter) if args.backend == "mem0" else ZepSink(client, limiter)
+    source = ",".join(str(Path(p).resolve()) for p in args.paths)
+    checkpoint = Checkpoint(args.checkpoint, args.backend, source)
+    if checkpoint.watermark or checkpoint.done:
+        print(f"Resuming from {args.checkpoint}: {checkpoint.watermark + len(checkpoint.done)} records already written")
+    ingester = Ingester(
+        sink, checkpoint,
+        concurrency=args.concurrency,
+        max_messages=args.max_messages,
+        max_chars=args.max_chars,
+        max_attempts=args.max_attempts,
+        progress=print_progress,
+    )
+    return await ingester.run(iterate(read_records(args.paths, args.user_id)))
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Bulk-import conversation histories and documents into Mem0 or Zep")
+    parser.add_argument("paths", nargs="+", help="JSONL, JSON or text files")
+    parser.add_argument("--backend", choices=["mem0", "zep"], required=True)
+    parser.add_argument("--checkpoint", help="Checkpoint file; rerunning with it resumes an interrupted import")
+    parser.add_argument("--concurrency", type=int, default=int(os.environ.get("INGEST_CONCURRENCY", "8")),
+                        help="Records written in parallel")
+    parser.add_argument("--rate", type=float, help="Max upstream calls per second (0 for no limit)")
+    parser.add_argument("--max-messages", type=int, default=int(os.environ.get("INGEST_MAX_MESSAGES", "20")),
+                        help="Messages per add call")
+    parser.add_argument("--max-chars", type=int, default=int(os.environ.get("INGEST_MAX_CHARS", "4000")),
+                        help="Characters per document chunk")
+    parser.add_argument("--max-attempts", type=int, default=5, help="Attempts per chunk before it is left for a rerun")
+    parser.add_argument("--user-id", help="User that plain text files belong to (default: file name)")
+    parser.add_argument("--stand-ins", action="store_true", help="Write to local stand-ins instead of the real APIs")
+    parser.add_argument("--stand-in-latency", default="lognormal:120:0.4", help="Stand-in write latency distribution")
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    if args.rate is None:
+        args.rate = float(os.environ.get(f"INGEST_{args.backend.upper()}_RATE", "20"))
+    report = asyncio.run(run_import(args))
+    print(json.dumps(report, indent=2))
+    sys.exit(1 if report["failed"] else 0)
+
+
+if __name__ == "__main__":
+    main()
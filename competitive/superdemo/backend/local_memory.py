@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Embedded local memory engine
+Per-user memories with embeddings in a NumPy array and vectorized top-k
+similarity search, as an in-process baseline next to Mem0 and Zep
+"""
+
+import hashlib
+import os
+import re
+import threading
+import time
+import uuid
+from typing import Dict, List, Optional, Set
+
+import numpy as np
+
+try:
+    import hnswlib
+except ImportError:
+    # ANN index is optional - exact search is used for every user without it
+    hnswlib = None
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9']+")
+
+
+class HashingEmbedder:
+    """Deterministic feature-hashing embedder - no model, no network, stable across runs"""
+
+    is_local = True
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+
+    def _features(self, text: str) -> List[str]:
+        tokens = TOKEN_PATTERN.findall(text.lower())
+        bigrams = [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        return tokens + bigrams
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for feature in self._features(text):
+                digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+                value = int.from_bytes(digest, "little")
+                sign = 1.0 if value & 1 else -1.0
+                vectors[row, (value >> 1) % self.dim] += sign
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+
+class OpenAIEmbedder:
+    """OpenAI embeddings through langchain_openai; blocking, so callers run it off the event loop"""
+
+    is_local = False
+
+    def __init__(self, model: str = "text-embedding-3-small", api_key: Optional[str] = None):
+        from langchain_openai import OpenAIEmbeddings
+        self._client = OpenAIEmbeddings(model=model, api_key=api_key)
+        self.dim = None
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        vectors = np.asarray(self._client.embed_documents(texts), dtype=np.float32)
+        self.dim = vectors.shape[1]
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+
+class UserMemoryStore:
+    """One user's memories: texts plus a row-per-memory float32 matrix that grows by doubling"""
+
+    def __init__(self, dim: int, ann_threshold: int):
+        self.dim = dim
+        self.ann_threshold = ann_threshold
+        self.texts: List[str] = []
+        # Same contents as `texts`, for constant-time repeat checks on add
+        self.known: Set[str] = set()
+        self.ids: List[str] = []
+        self.created_at: List[float] = []
+        self._vectors = np.zeros((16, dim), dtype=np.float32)
+        self._index = None
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self.texts)
+
+    def add(self, texts: List[str], vectors: np.ndarray) -> List[str]:
+        with self._lock:
+            n = len(self.texts)
+            needed = n + len(texts)
+            if needed > self._vectors.shape[0]:
+                capacity = max(needed, self._vectors.shape[0] * 2)
+                grown = np.zeros((capacity, self.dim), dtype=np.float32)
+                grown[:n] = self._vectors[:n]
+                self._vectors = grown
+            self._vectors[n:needed] = vectors
+            new_ids = [uuid.uuid4().hex for _ in texts]
+            self.texts.extend(texts)
+            self.known.update(texts)
+            self.ids.extend(new_ids)
+            self.created_at.extend([time.time()] * len(texts))
+
+            if self._index is not None:
+                self._index.resize_index(max(needed, self._index.get_max_elements()))
+                self._index.add_items(vectors, np.arange(n, needed))
+            elif hnswlib is not None and needed >= self.ann_threshold:
+                self._build_index(needed)
+            return new_ids
+
+    def _build_index(self, n: int):
+        index = hnswlib.Index(space="ip", dim=self.dim)
+        index.init_index(max_elements=max(n * 2, 1024), ef_construction=200, M=16)
+        index.add_items(self._vectors[:n], np.arange(n))
+        index.set_ef(64)
+        self._index = index
+
+    def search(self, query_vector: np.ndarray, limit: int) -> List[tuple]:
+        """Top-k (row, score) by cosine similarity"""
+        with self._lock:
+            n = len(self.texts)
+            if n == 0:
+                return []
+            k = min(limit, n)
+            if self._index is not None:
+                labels, distances = self._index.knn_query(query_vector, k=k)
+                # hnswlib "ip" distance is 1 - inner product
+                return [(int(row), float(1.0 - dist)) for row, dist in zip(labels[0], distances[0])]
+
+            scores = self._vectors[:n] @ query_vector
+            if k < n:
+                top = np.argpartition(-scores, k - 1)[:k]
+            else:
+                top = np.arange(n)
+            top = top[np.argsort(-scores[top])]
+            return [(int(row), float(scores[row])) for row in top]
+
+
+class LocalMemory:
+    """In-process memory engine with a Mem0-shaped add/search interface"""
+
+    def __init__(self, embedder=None, ann_threshold: int = 5000, min_score: float = 0.05):
+        self.embedder = embedder or HashingEmbedder()
+        self.ann_threshold = ann_threshold
+        self.min_score = min_score
+        self._stores: Dict[str, UserMemoryStore] = {}
+        self._stores_lock = threading.Lock()
+
+    def _store(self, user_id: str, dim: int) -> UserMemoryStore:
+        with self._stores_lock:
+            store = self._stores.get(user_id)
+            if store is None:
+                store = self._stores[user_id] = UserMemoryStore(dim, self.ann_threshold)
+            return store
+
+    def add(self, messages: List[dict], user_id: str) -> dict:
+        """Store the user's side of a conversation turn, skipping exact repeats"""
+        store = self._stores.get(user_id)
+        known = store.known if store else set()
+        texts = []
+        for message in messages:
+            content = message.get("content", "").strip()
+            if message.get("role") == "user" and content and content not in known and content not in texts:
+                texts.append(content)
+        if not texts:
+            return {"results": []}
+        vectors = self.embedder.embed(texts)
+        ids = self._store(user_id, vectors.shape[1]).add(texts, vectors)
+        return {"results": [{"id": i, "memory": t, "event": "ADD"} for i, t in zip(ids, texts)]}
+
+    def search(self, query: str, user_id: str, limit: int = 5) -> List[dict]:
+        """Top-k memories for the user, shaped like Mem0 search results"""
+        store = self._stores.get(user_id)
+        if not store or len(store) == 0:
+            return []
+        query_vector = self.embedder.embed([query])[0]
+        return [
+            {"id": store.ids[row], "memory": store.texts[row], "user_id": user_id, "score": score}
+            for row, score in store.search(query_vector, limit)
+            if score >= self.min_score
+        ]
+
+    def stats(self) -> dict:
+        sizes = [len(store) for store in self._stores.values()]
+        return {
+            "users": len(sizes),
+            "memories": sum(sizes),
+            "largest_user": max(sizes, default=0),
+            "ann_indexed_users": sum(1 for store in self._stores.values() if store._index is not None),
+            "ann_available": hnswlib is not None,
+            "embedder": type(self.embedder).__name__,
+        }
+
+
+def build_embedder(name: Optional[str] = None):
+    """Pick the embedder from LOCAL_EMBEDDER ("hashing" or "openai")"""
+    name = (name or os.environ.get("LOCAL_EMBEDDER", "hashing")).lower()
+    if name == "openai":
+        return OpenAIEmbedder(
+            model=os.environ.get("LOCAL_EMBEDDING_MODEL", "text-embedding-3-small"),
+            api_key=os.environ.get("OPENAI_API_KEY")
+        )
+    return HashingEmbedder(dim=int(os.environ.get("LOCAL_EMBEDDING_DIM", "384")))
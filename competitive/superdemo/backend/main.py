@@ -4,14 +4,27 @@ FastAPI Backend for Memory Systems Demo
 Provides REST endpoints for Mem0 and Zep memory integrations
 """
 
+import time
+
+# Import time (of everything below) is reported by /ready
+IMPORT_START = time.perf_counter()
+
+import inspect
+import json
 import os
+import re
+import sqlite3
+import sys
 import uuid
-import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import partial
 from pathlib import Path
 from dotenv import load_dotenv
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
 from typing import Optional, Dict
 import asyncio
 
@@ -19,99 +32,584 @@ import asyncio
 env_path = Path(__file__).parent / '.env'
 load_dotenv(dotenv_path=env_path)
 
-# LangChain imports
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import SystemMessage, HumanMessage
+# LangChain imports - langchain_openai, mem0 and zep_cloud take seconds to
+# import, so they are loaded by the background warm-up (see load_* below)
+from langchain_core.messages import AIMessage, SystemMessage, HumanMessage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 
-# Memory system imports
-from mem0 import MemoryClient
-from zep_cloud import AsyncZep
-from zep_cloud.types import Message
+from backpressure import (
+    CircuitBreaker, CircuitOpen, Upstream, UpstreamOverloaded, is_overload, retry_after_s, status_code_of
+)
+from batch import BatchRunner
+from budgets import Hedger, LatencyBudget, RequestDeadline
+from caches import ResponseCache, RetrievalCache, SQLiteCache, TTLCache
+from cassettes import Cassette, wrap_clients
+from context_packing import ContextPacker, load_encoding
+from http_pool import HTTPPool, PoolConfig
+from ingest import Checkpoint, Ingester, Mem0Sink, RateLimiter, ZepSink, ndjson_records
+from local_memory import LocalMemory, build_embedder
+from sessions import ChatSession, SessionRegistry
+from short_term import ShortTermMemory
+from singleflight import SingleFlight
+from startup import Warmup
+from tracing import (
+    TracingMiddleware, current_trace, observe_stage, registry, request_trace, start_trace, trace_mark, trace_span
+)
+from write_behind import WriteBehindQueue
+from write_filter import WriteFilter
+from zep_retrieval import ZepRetrievalStrategy, ZepScope, extract_texts
 
-app = FastAPI(title="Memory Systems Demo API", version="1.0.0")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Start the background warm-up, then drain and release everything on shutdown"""
+    await startup_event()
+    yield
+    await shutdown_event()
 
-# Add CORS middleware
+app = FastAPI(title="Memory Systems Demo API", version="1.0.0", lifespan=lifespan)
+
+# Add CORS middleware (browsers do not apply CORS to WebSockets; /ws/chat checks the origin itself)
+CORS_ORIGINS = ["http://localhost:4200"]  # Angular dev server
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["http://localhost:4200"],  # Angular dev server
+    allow_origins=CORS_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
 )
 
+# Span tracing - feeds performance_metrics and the /metrics histograms
+app.add_middleware(TracingMiddleware)
+
 # Request/Response models
 class QueryRequest(BaseModel):
     user_id: str
     query: str
+    session_id: Optional[str] = None  # Reuses the session's Zep thread; the user's default session if omitted
+    deadline_ms: Optional[float] = None  # Overall latency budget, defaults to REQUEST_DEADLINE_MS
 
 class QueryResponse(BaseModel):
     response: str
     memory_saved: bool
+    memory_status: Optional[str] = None  # "queued", "persisted", "skipped" (filtered) or None if not saved
     context_found: bool = False
     retrieved_memory: Optional[list[str]] = None
+    session_id: Optional[str] = None
+    degraded: Optional[list[str]] = None  # Stages skipped to stay within budget, e.g. "retrieval_timeout"
+    circuit: Optional[Dict[str, str]] = None  # Breaker state of each upstream the request depends on
     performance_metrics: Optional[Dict[str, float]] = None
 
+class CompareRequest(QueryRequest):
+    timeout_s: Optional[float] = None  # Per-branch timeout, defaults to COMPARE_BRANCH_TIMEOUT
+
+class BatchQueryRequest(BaseModel):
+    requests: list[QueryRequest]
+    concurrency: Optional[int] = None  # Requests in flight at once, defaults to BATCH_CONCURRENCY
+    persist: bool = True  # Queue each turn for persistence; false leaves memory untouched during an evaluation
+
+class CompareResponse(BaseModel):
+    mem0: Optional[QueryResponse] = None
+    zep: Optional[QueryResponse] = None
+    errors: Dict[str, str] = {}
+    performance_metrics: Dict[str, float] = {}
+
+class ChatTurn(BaseModel):
+    query: str
+    backends: list[str] = ["mem0", "zep"]
+    turn_id: Optional[str] = None  # Echoed on every message answering this turn; issued by the server if omitted
+    deadline_ms: Optional[float] = None
+
 # Global clients - initialize once
 llm = None
 mem0_client = None
 zep_client = None
 
-@app.on_event("startup")
+# SDK client classes, imported on first use by the warm-up
+ChatOpenAI = None
+MemoryClient = None
+AsyncZep = None
+
+# Local stand-ins instead of the SDK clients, for load-testing a real server
+# process (see worker_benchmark.py); latencies use standins.py specs
+UPSTREAM_STAND_INS = os.environ.get("UPSTREAM_STAND_INS", "0") == "1"
+
+# Record/replay of every Mem0, Zep and LLM call (cassettes.py): record while
+# serving real traffic, then replay offline with recorded or zero latency
+cassette = Cassette.from_env(os.environ)
+
+def load_chat_openai():
+    from langchain_openai import ChatOpenAI
+    return ChatOpenAI
+
+def load_mem0_client():
+    try:
+        from mem0 import AsyncMemoryClient
+        return AsyncMemoryClient
+    except ImportError:
+        # Older mem0ai releases only ship the sync client; its calls go through
+        # the bounded executor below so they never block the event loop.
+        from mem0 import MemoryClient
+        return MemoryClient
+
+def load_zep_client():
+    from zep_cloud import AsyncZep
+    return AsyncZep
+
+# Startup warm-up - tracks imports, clients and pre-warmed connections for /ready
+warmup = Warmup()
+
+# Shared HTTP connection pooling for the OpenAI, Zep and Mem0 clients
+http_pool = HTTPPool(PoolConfig.from_env())
+
+def mem0_http_client():
+    """Pooled client for Mem0 - its own, since the SDK rebinds base_url and headers on it"""
+    if asyncio.iscoroutinefunction(MemoryClient.search):
+        return http_pool.async_client("mem0")
+    return http_pool.sync_client("mem0")
+
+# Bounded thread pool for any client call that is still synchronous
+BLOCKING_POOL_SIZE = int(os.environ.get("BLOCKING_POOL_SIZE", "32"))
+blocking_executor = ThreadPoolExecutor(
+    max_workers=BLOCKING_POOL_SIZE,
+    thread_name_prefix="blocking-io"
+)
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a synchronous call on the bounded executor without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(blocking_executor, partial(func, *args, **kwargs))
+
+async def call_mem0(method: str, *args, **kwargs):
+    """Call a Mem0 client method, awaiting it directly if the client is async"""
+    func = getattr(mem0_client, method)
+    if asyncio.iscoroutinefunction(func):
+        return await func(*args, **kwargs)
+    return await run_blocking(func, *args, **kwargs)
+
+# Backpressure - an adaptive (AIMD) concurrency limit per upstream with a
+# bounded queue wait, plus jittered retries for idempotent reads
+upstreams = {name: Upstream.from_env(name) for name in ("mem0", "zep", "openai")}
+
+def upstream_error(e: Exception, context: str) -> HTTPException:
+    """503 with Retry-After when an upstream is shedding load, else 500"""
+    if isinstance(e, UpstreamOverloaded) or is_overload(e):
+        retry_after = retry_after_s(e) or 1.0
+        return HTTPException(
+            status_code=503,
+            detail=f"{context}: upstream overloaded: {str(e)}",
+            headers={"Retry-After": str(max(1, round(retry_after)))}
+        )
+    return HTTPException(status_code=500, detail=f"{context}: {str(e)}")
+
+def circuit_states(*names: str) -> Dict[str, str]:
+    """Breaker state of each upstream a response depended on"""
+    return {name: upstreams[name].breaker.state for name in names}
+
+# Single-flight - concurrent identical searches and Zep user/thread setup
+# share one in-flight upstream call
+singleflight = SingleFlight()
+
+# Shared cache tier - a SQLite (WAL) file read and written by every worker
+# process on the host, behind the in-process Zep registries, retrieval cache
+# and LLM response cache; on by default when running several workers
+WEB_CONCURRENCY = int(os.environ.get("WEB_CONCURRENCY", "1"))
+SHARED_CACHE_ENABLED = os.environ.get("SHARED_CACHE_ENABLED", "1" if WEB_CONCURRENCY > 1 else "0") == "1"
+SHARED_CACHE_SYNC_INTERVAL = float(os.environ.get("SHARED_CACHE_SYNC_INTERVAL", "0.1"))
+shared_cache = SQLiteCache(
+    os.environ.get("SHARED_CACHE_PATH", Path(__file__).parent / "shared_cache.sqlite"),
+    maxsize=int(os.environ.get("SHARED_CACHE_SIZE", "200000")),
+    evict_every=int(os.environ.get("SHARED_CACHE_EVICT_EVERY", "100"))
+) if SHARED_CACHE_ENABLED else None
+# Last retrieval-version change seen; None until the first sync, and shared
+# retrieval entries are not read before it
+shared_versions_seq: Optional[int] = None
+shared_cache_stats = {"version_syncs": 0, "versions_synced": 0, "invalidations_published": 0, "errors": 0}
+shared_cache_tasks = set()
+shared_sync_task: Optional[asyncio.Task] = None
+
+async def shared_cache_get(key: str) -> Optional[str]:
+    """Read the shared tier off the event loop; a locked or failing file counts as a miss"""
+    if not shared_cache:
+        return None
+    try:
+        return await run_blocking(shared_cache.get, key)
+    except sqlite3.Error as e:
+        shared_cache_stats["errors"] += 1
+        print(f"WARNING: Shared cache read failed: {e}")
+        return None
+
+async def shared_cache_set(key: str, value: str, ttl: Optional[float]):
+    """Write the shared tier off the event loop; a failure only costs other workers a hit"""
+    if not shared_cache:
+        return
+    try:
+        await run_blocking(shared_cache.set, key, value, ttl)
+    except sqlite3.Error as e:
+        shared_cache_stats["errors"] += 1
+        print(f"WARNING: Shared cache write failed: {e}")
+
+async def sync_shared_versions():
+    """Adopt retrieval invalidations published by other workers since the last sync"""
+    global shared_versions_seq
+    versions, seq = await run_blocking(shared_cache.versions_since, shared_versions_seq or 0)
+    retrieval_cache.apply_versions(versions)
+    shared_versions_seq = seq
+    shared_cache_stats["version_syncs"] += 1
+    shared_cache_stats["versions_synced"] += len(versions)
+
+async def shared_version_sync_loop():
+    """Poll for other workers' invalidations; the interval bounds how stale a cached retrieval can be"""
+    while True:
+        await asyncio.sleep(SHARED_CACHE_SYNC_INTERVAL)
+        try:
+            await sync_shared_versions()
+        except sqlite3.Error as e:
+            shared_cache_stats["errors"] += 1
+            print(f"WARNING: Shared cache version sync failed: {e}")
+
+# Zep registries - known users and session -> thread mapping, so warm
+# requests skip the user.get and thread.create round trips
+zep_known_users = TTLCache(
+    maxsize=int(os.environ.get("ZEP_USER_CACHE_SIZE", "10000")),
+    ttl=float(os.environ.get("ZEP_USER_CACHE_TTL", "3600"))
+)
+zep_session_threads = TTLCache(
+    maxsize=int(os.environ.get("ZEP_THREAD_CACHE_SIZE", "10000")),
+    ttl=float(os.environ.get("ZEP_THREAD_CACHE_TTL", "86400"))
+)
+# Session of requests that send no session_id, so each user has one standing
+# thread rather than a new thread per query
+ZEP_DEFAULT_SESSION = os.environ.get("ZEP_DEFAULT_SESSION", "default")
+
+def zep_session_id(request: QueryRequest) -> str:
+    return request.session_id or ZEP_DEFAULT_SESSION
+
+# Zep retrieval strategy - which of graph edges, nodes, episodes and the
+# thread's user context each turn queries, concurrently, each with its own timeout
+zep_retrieval = ZepRetrievalStrategy.from_env()
+
+# Retrieval cache - per-user search results, invalidated whenever a write for
+# that user is persisted
+RETRIEVAL_CACHE_ENABLED = os.environ.get("RETRIEVAL_CACHE_ENABLED", "1") == "1"
+retrieval_cache_ttl = float(os.environ.get("RETRIEVAL_CACHE_TTL", "300")) or None
+retrieval_cache = RetrievalCache(
+    maxsize=int(os.environ.get("RETRIEVAL_CACHE_SIZE", "4096")),
+    ttl=retrieval_cache_ttl,
+    max_versions=int(os.environ.get("RETRIEVAL_CACHE_VERSIONS", "16384"))
+)
+
+async def retrieval_cache_get(backend: str, user_id: str, query: str, context: Optional[str] = None) -> tuple:
+    """(key, cached result or None) from this worker's cache, then the shared tier; (None, None) when disabled"""
+    if not RETRIEVAL_CACHE_ENABLED:
+        return None, None
+    key, cached = retrieval_cache.lookup(backend, user_id, query, context)
+    if cached is None and shared_versions_seq is not None and retrieval_cache.shareable(key):
+        value = await shared_cache_get(RetrievalCache.shared_key(key))
+        if value is not None:
+            cached = json.loads(value)
+            retrieval_cache.store(key, cached)
+    return key, cached
+
+async def retrieval_cache_set(key: Optional[tuple], value: list):
+    if key is None:
+        return
+    retrieval_cache.store(key, value)
+    if shared_versions_seq is not None and retrieval_cache.shareable(key):
+        await shared_cache_set(RetrievalCache.shared_key(key), json.dumps(value), retrieval_cache_ttl)
+
+async def invalidate_retrieval(backend: str, user_id: str):
+    """Orphan a user's cached results in this worker and, through the shared tier, in every other one"""
+    if not shared_cache:
+        retrieval_cache.invalidate(backend, user_id)
+        return
+    scope = RetrievalCache.version_scope(backend, user_id)
+    try:
+        version = await run_blocking(shared_cache.bump_version, scope)
+    except sqlite3.Error as e:
+        shared_cache_stats["errors"] += 1
+        print(f"WARNING: Shared cache invalidation failed: {e}")
+        retrieval_cache.invalidate(backend, user_id)
+        return
+    retrieval_cache.apply_versions([(scope, version)])
+    shared_cache_stats["invalidations_published"] += 1
+
+# Short-term (L1) memory - the session's last few turns, kept in process and
+# fed to the prompt; the remote search only runs when they do not cover the query
+SHORT_TERM_ENABLED = os.environ.get("SHORT_TERM_ENABLED", "1") == "1"
+short_term = ShortTermMemory(
+    max_turns=int(os.environ.get("SHORT_TERM_TURNS", "6")),
+    max_sessions=int(os.environ.get("SHORT_TERM_SESSIONS", "10000")),
+    ttl=float(os.environ.get("SHORT_TERM_TTL", "1800")) or None,
+    coverage=float(os.environ.get("SHORT_TERM_COVERAGE", "0.6"))
+)
+
+def short_term_key(request: QueryRequest) -> Optional[tuple]:
+    """L1 key for the request's session; None for session-less requests and the in-process local backend"""
+    trace = current_trace()
+    backend = trace.backend if trace else None
+    if not SHORT_TERM_ENABLED or not request.session_id or backend not in ("mem0", "zep"):
+        return None
+    return (backend, request.user_id, request.session_id)
+
+def record_short_term(request: QueryRequest, response_text: str):
+    key = short_term_key(request)
+    if key is not None:
+        short_term.record(key, request.query, response_text)
+
+def record_retrieval_cache(perf_metrics: dict, hit: bool):
+    """Report the per-request hit flag and, while the cache is on, cumulative hit/miss counters"""
+    perf_metrics['retrieval_cache_hit'] = 1.0 if hit else 0.0
+    if not RETRIEVAL_CACHE_ENABLED:
+        return
+    stats = retrieval_cache.stats()
+    perf_metrics['retrieval_cache_hits'] = stats['hits']
+    perf_metrics['retrieval_cache_misses'] = stats['misses']
+
+# LLM response cache (opt-in) - keyed on a hash of the rendered prompt, so a
+# change in retrieved context is a different key; LLM_CACHE_SQLITE (or else
+# the shared cache tier) adds a disk tier shared by every worker on the host
+LLM_CACHE_ENABLED = os.environ.get("LLM_CACHE_ENABLED", "0") == "1"
+LLM_CACHE_TTL = float(os.environ.get("LLM_CACHE_TTL", "3600")) or None
+llm_cache = ResponseCache(
+    maxsize=int(os.environ.get("LLM_CACHE_SIZE", "1024")),
+    ttl=LLM_CACHE_TTL,
+    disk=(SQLiteCache(
+        os.environ["LLM_CACHE_SQLITE"],
+        maxsize=int(os.environ.get("LLM_CACHE_SQLITE_SIZE", "100000")),
+        ttl=LLM_CACHE_TTL
+    ) if os.environ.get("LLM_CACHE_SQLITE") else shared_cache) if LLM_CACHE_ENABLED else None
+)
+
+# Embedded local memory engine - in-process baseline for /local/query
+local_memory = LocalMemory(
+    ann_threshold=int(os.environ.get("LOCAL_ANN_THRESHOLD", "5000"))
+)
+
+async def call_local(method: str, *args, **kwargs):
+    """Call the local engine inline, or on the executor if its embedder makes network calls"""
+    func = getattr(local_memory, method)
+    if local_memory.embedder.is_local:
+        return func(*args, **kwargs)
+    return await run_blocking(func, *args, **kwargs)
+
+# Context packing - retrieved memories are deduped, reranked against the query
+# and trimmed to a token budget before they reach the prompt
+context_packer = ContextPacker.from_env()
+
+# Latency budgets - per-request deadline and per-stage budgets, plus optional
+# hedged searches once enough latency history exists to estimate p95
+latency_budget = LatencyBudget.from_env()
+hedger = Hedger.from_env()
+
+# Bulk ingestion - one rate limiter per backend, shared by every running import
+INGEST_CONCURRENCY = int(os.environ.get("INGEST_CONCURRENCY", "8"))
+INGEST_CHECKPOINT_DIR = Path(os.environ.get("INGEST_CHECKPOINT_DIR", Path(__file__).parent / "ingest_checkpoints"))
+INGEST_JOB_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,100}$")
+ingest_limiters = {
+    "mem0": RateLimiter(float(os.environ.get("INGEST_MEM0_RATE", "20"))),
+    "zep": RateLimiter(float(os.environ.get("INGEST_ZEP_RATE", "20")))
+}
+
+# Write-behind queue - memory writes are persisted after the response is sent
+write_queue = WriteBehindQueue(
+    spool_path=Path(os.environ.get("WRITE_BEHIND_SPOOL", Path(__file__).parent / "write_behind_spool.jsonl")),
+    flush_interval=float(os.environ.get("WRITE_BEHIND_FLUSH_INTERVAL", "0.05")),
+    max_batch_turns=int(os.environ.get("WRITE_BEHIND_MAX_BATCH", "8")),
+    max_attempts=int(os.environ.get("WRITE_BEHIND_MAX_ATTEMPTS", "5")),
+    attempt_timeout=latency_budget.persistence_ms / 1000,
+)
+
+# Write filtering - repeats, retries and small talk never reach the queue
+write_filter = WriteFilter(
+    enabled=os.environ.get("WRITE_FILTER_ENABLED", "1") == "1",
+    low_value=os.environ.get("WRITE_FILTER_LOW_VALUE", "1") == "1",
+    max_fingerprints=int(os.environ.get("WRITE_DEDUPE_SIZE", "100000")),
+    ttl=float(os.environ.get("WRITE_DEDUPE_TTL", "3600")) or None,
+)
+
+async def persist_mem0(user_id: str, messages: list[dict]):
+    """Write-behind writer: one Mem0 add call for a user's coalesced turns"""
+    if not mem0_client:
+        raise RuntimeError("Mem0 client not initialized")
+    start = time.perf_counter()
+    with observe_stage("mem0", "persist"):
+        await upstreams["mem0"].call(lambda: call_mem0("add", messages, user_id=user_id))
+    write_filter.record_write("mem0", (time.perf_counter() - start) * 1000, len(messages) // 2)
+    await invalidate_retrieval("mem0", user_id)
+
+async def persist_zep(thread_id: str, messages: list[dict]):
+    """Write-behind writer: one Zep add_messages call for a thread's coalesced turns"""
+    if not zep_client:
+        raise RuntimeError("Zep client not initialized")
+    from zep_cloud.types import Message
+    start = time.perf_counter()
+    with observe_stage("zep", "persist"):
+        await upstreams["zep"].call(lambda: zep_client.thread.add_messages(
+            thread_id=thread_id,
+            messages=[Message(**message) for message in messages]
+        ))
+    write_filter.record_write("zep", (time.perf_counter() - start) * 1000, len(messages) // 2)
+    # User turns are named after the user id
+    for user_id in {message["name"] for message in messages if message["role"] == "user"}:
+        await invalidate_retrieval("zep", user_id)
+
+write_queue.register("mem0", persist_mem0)
+write_queue.register("zep", persist_zep)
+
+def confirm_written_turns(entries: list[dict]):
+    """Write-behind hook: fingerprints count as written only once their turns persist"""
+    for entry in entries:
+        write_filter.persisted(entry["backend"], entry.get("fingerprint"))
+
+write_queue.on_persisted = confirm_written_turns
+
 async def startup_event():
-    """Initialize clients on startup"""
-    global llm, mem0_client, zep_client
-    
+    """Report configuration and start the background warm-up"""
     print(f"Loading environment from: {env_path}")
     
     # Check environment variables
-    openai_key = os.environ.get("OPENAI_API_KEY")
-    mem0_key = os.environ.get("MEM0_API_KEY")
-    zep_key = os.environ.get("ZEP_API_KEY")
+    keys = {
+        "openai": os.environ.get("OPENAI_API_KEY"),
+        "mem0": os.environ.get("MEM0_API_KEY"),
+        "zep": os.environ.get("ZEP_API_KEY")
+    }
+    for name, variable in (("openai", "OPENAI_API_KEY"), ("mem0", "MEM0_API_KEY"), ("zep", "ZEP_API_KEY")):
+        if keys[name]:
+            print(f"✓ {variable} loaded")
+        else:
+            print(f"WARNING: {variable} not set")
+    
+    # Serving starts now; requests that need a client wait for its step only.
+    # Without an API key a client only serves mock responses, so it cannot
+    # hold readiness back
+    warmup.declare("llm", required=bool(keys["openai"]))
+    warmup.declare("zep", required=bool(keys["zep"]))
+    warmup.declare("mem0", required=bool(keys["mem0"]))
+    for name in ("write_queue", "chain", "tokenizer", "connections"):
+        warmup.declare(name)
+    if shared_cache:
+        warmup.declare("shared_cache")
+    warmup.declare("local_embedder", required=False)
+    warmup.start(warm_up(keys))
+
+async def warm_up(keys: dict):
+    """Import the SDKs and build clients off the event loop, then warm everything a first request touches"""
+    global llm, mem0_client, zep_client, ChatOpenAI, MemoryClient, AsyncZep, shared_sync_task
     
-    if not openai_key:
-        print("WARNING: OPENAI_API_KEY not set")
-        openai_key = "sk-mock-key-for-demo"
+    if cassette and cassette.replaying:
+        llm, mem0_client, zep_client = wrap_clients(cassette, None, None, None)
+        for name in ("llm", "zep", "mem0"):
+            warmup.skip(name, "cassette replay")
+    elif UPSTREAM_STAND_INS:
+        import standins
+        standins.install(
+            sys.modules[__name__],
+            llm_latency=os.environ.get("STAND_IN_LLM_LATENCY", "lognormal:250:0.3"),
+            search_latency=os.environ.get("STAND_IN_SEARCH_LATENCY", "lognormal:80:0.4"),
+            add_latency=os.environ.get("STAND_IN_ADD_LATENCY", "lognormal:120:0.4"),
+            setup_latency=os.environ.get("STAND_IN_SETUP_LATENCY", "lognormal:40:0.3")
+        )
+        for name in ("llm", "zep", "mem0"):
+            warmup.skip(name, "stand-ins")
     else:
-        print("✓ OPENAI_API_KEY loaded")
+        # Initialize clients (will fail on actual API calls if keys are invalid)
+        # OpenAI and Zep share one pooled client; httpx keeps a pool per host within it
+        with warmup.step("llm"):
+            ChatOpenAI = await run_blocking(load_chat_openai)
+            llm = ChatOpenAI(
+                model="gpt-4o-mini",
+                api_key=keys["openai"] or "sk-mock-key-for-demo",
+                http_async_client=http_pool.async_client("shared")
+            )
         
-    if not mem0_key:
-        print("WARNING: MEM0_API_KEY not set")
-        mem0_key = "mock-mem0-key"
-    else:
-        print("✓ MEM0_API_KEY loaded")
+        with warmup.step("zep"):
+            AsyncZep = await run_blocking(load_zep_client)
+            zep_client = AsyncZep(
+                api_key=keys["zep"] or "mock-zep-key",
+                httpx_client=http_pool.async_client("shared")
+            )
         
-    if not zep_key:
-        print("WARNING: ZEP_API_KEY not set")
-        zep_key = "mock-zep-key"
-    else:
-        print("✓ ZEP_API_KEY loaded")
+        with warmup.step("mem0"):
+            MemoryClient = await run_blocking(load_mem0_client)
+            mem0_kwargs = {}
+            if "client" in inspect.signature(MemoryClient).parameters:
+                mem0_kwargs["client"] = mem0_http_client()
+            # The constructor validates the key with a blocking request
+            mem0_client = await run_blocking(
+                MemoryClient,
+                api_key=keys["mem0"] or "mock-mem0-key",
+                **mem0_kwargs
+            )
     
-    # Initialize clients (will fail on actual API calls if keys are invalid)
-    try:
-        llm = ChatOpenAI(
-            model="gpt-4o-mini",
-            api_key=openai_key
-        )
-    except Exception as e:
-        print(f"WARNING: Failed to initialize OpenAI client: {e}")
-        llm = None
+    if cassette and cassette.recording:
+        llm, mem0_client, zep_client = wrap_clients(cassette, llm, mem0_client, zep_client)
     
-    try:
-        mem0_client = MemoryClient(
-            api_key=mem0_key
-        )
-    except Exception as e:
-        print(f"WARNING: Failed to initialize Mem0 client: {e}")
-        mem0_client = None
+    # Start persisting queued turns, including any left in the spool by a crash
+    with warmup.step("write_queue"):
+        write_queue.start()
     
-    try:
-        zep_client = AsyncZep(
-            api_key=zep_key
-        )
-    except Exception as e:
-        print(f"WARNING: Failed to initialize Zep client: {e}")
-        zep_client = None
+    # Catch up on invalidations from other workers before reading shared retrievals
+    if shared_cache:
+        with warmup.step("shared_cache"):
+            await sync_shared_versions()
+            shared_sync_task = asyncio.ensure_future(shared_version_sync_loop())
+    
+    await asyncio.gather(
+        warm_chain(),
+        warm_tokenizer(),
+        warm_local_embedder(),
+        warm_connections(keys)
+    )
+
+async def warm_chain():
+    with warmup.step("chain"):
+        # Compose prompt | llm once and render a prompt to build its validators
+        llm_chain()
+        prompt.format_messages(context=[], messages=[HumanMessage(content="warm up")])
+
+async def warm_tokenizer():
+    # Load the tokenizer for context packing off the event loop (may download its encoding)
+    with warmup.step("tokenizer"):
+        await run_blocking(load_encoding)
+
+async def warm_local_embedder():
+    with warmup.step("local_embedder"):
+        # Falls back to the hashing embedder if the configured one cannot load
+        local_memory.embedder = await run_blocking(build_embedder)
+
+async def warm_connections(keys: dict):
+    """Open upstream connections before the first request pays for TCP + TLS"""
+    if UPSTREAM_STAND_INS or (cassette and cassette.replaying):
+        warmup.skip("connections", "stand-ins" if UPSTREAM_STAND_INS else "cassette replay")
+        return
+    prewarm_targets = {}
+    if llm:
+        prewarm_targets.setdefault("shared", []).append("https://api.openai.com/v1")
+    if zep_client:
+        prewarm_targets.setdefault("shared", []).append("https://api.getzep.com/api/v2")
+    if mem0_client and asyncio.iscoroutinefunction(MemoryClient.search):
+        prewarm_targets["mem0"] = [getattr(mem0_client, "host", "https://api.mem0.ai")]
+    if not http_pool.config.prewarm_connections or not prewarm_targets:
+        warmup.skip("connections", "pre-warm disabled")
+        return
+    
+    with warmup.step("connections"):
+        await http_pool.prewarm(prewarm_targets)
+        # Only upstreams with a real API key have to be reachable to be ready
+        configured = {
+            "https://api.openai.com/v1": keys["openai"],
+            "https://api.getzep.com/api/v2": keys["zep"],
+        }
+        if "mem0" in prewarm_targets:
+            configured[prewarm_targets["mem0"][0]] = keys["mem0"]
+        unreachable = [url for url, key in configured.items() if key and url in http_pool.prewarm_errors]
+        if unreachable:
+            raise ConnectionError(f"unreachable: {', '.join(unreachable)}")
+
+async def wait_for_clients(*steps: str):
+    """Hold a request that arrives during warm-up until the clients (and tokenizer) it uses exist"""
+    for step in steps:
+        await warmup.wait(step)
 
 # Common prompt template
 prompt = ChatPromptTemplate.from_messages([
@@ -127,280 +625,1114 @@ async def mem0_query(request: QueryRequest):
     """
     Process query using Mem0 for memory management
     """
+    await wait_for_clients("llm", "mem0", "tokenizer")
     if not mem0_client or not llm:
         # Return mock response if clients not initialized
         return QueryResponse(
             response="Mock response: Memory system not connected. Please configure API keys.",
             memory_saved=False,
             context_found=False,
-            retrieved_memory=None,
-            performance_metrics={
-                "search_time_ms": 10.5,
-                "chain_invoke_time_ms": 250.3,
-                "add_time_ms": 15.2,
-                "total_time_ms": 276.0
-            }
+            retrieved_memory=None
         )
     
     try:
         # Initialize performance metrics
+        trace = start_trace("mem0")
         perf_metrics = {}
+        deadline = RequestDeadline(request.deadline_ms or latency_budget.deadline_ms)
+        degraded = []
         
         # Retrieve context from Mem0
-        context_messages = []
-        context_found = False
-        retrieved_memory_parts = []
+        retrieved_memory_parts = await retrieve_within_budget(
+            retrieve_mem0_context, request, perf_metrics, deadline, degraded
+        )
+        context_messages = pack_context(request, retrieved_memory_parts, perf_metrics)
         
-        # Performance counter for mem0_client.search
-        search_start = time.time()
-        memories = mem0_client.search(query=request.query, user_id=request.user_id, limit=5)
-        search_end = time.time()
-        perf_metrics['search_time_ms'] = (search_end - search_start) * 1000
+        # Performance counter for chain.ainvoke
+        with trace.span("chain_invoke"):
+            response = await generate_within_budget(context_messages, request.query, deadline, perf_metrics)
         
-        if memories:
-            context_found = True
-            for memory in memories:
-                memory_content = memory.get('memory', '')
-                retrieved_memory_parts.append(memory_content)
-                context_messages.append(
-                    SystemMessage(content=f"Previous context: {memory_content}")
+        # Queue interaction for Mem0 - persisted in the background
+        memory_status = queue_mem0_turn(request, response.content)
+        
+        # Stage timings and real elapsed total from the trace spans
+        perf_metrics.update(trace.performance_metrics())
+        perf_metrics['write_queue_depth'] = write_queue.depth()
+        
+        return QueryResponse(
+            response=response.content,
+            memory_saved=False,
+            memory_status=memory_status,
+            context_found=bool(retrieved_memory_parts),
+            retrieved_memory=retrieved_memory_parts if retrieved_memory_parts else None,
+            degraded=degraded or None,
+            circuit=circuit_states("mem0", "openai"),
+            performance_metrics=perf_metrics
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise upstream_error(e, "Error processing Mem0 query")
+
+@app.post("/mem0/query/stream")
+async def mem0_query_stream(request: QueryRequest):
+    """
+    Stream a Mem0-backed response over Server-Sent Events
+    """
+    await wait_for_clients("llm", "mem0", "tokenizer")
+    if not mem0_client or not llm:
+        return sse_response(single_event_stream("done", (await mem0_query(request)).model_dump()))
+    
+    async def events():
+        trace = start_trace("mem0")
+        perf_metrics = {}
+        deadline = RequestDeadline(request.deadline_ms or latency_budget.deadline_ms)
+        degraded = []
+        try:
+            retrieved_memory_parts = await retrieve_within_budget(
+                retrieve_mem0_context, request, perf_metrics, deadline, degraded
+            )
+            context_messages = pack_context(request, retrieved_memory_parts, perf_metrics)
+            yield sse_event("memories", {
+                "context_found": bool(retrieved_memory_parts),
+                "retrieved_memory": retrieved_memory_parts or None,
+                "degraded": degraded or None
+            })
+            
+            response_parts = []
+            async for token in stream_chain(context_messages, request.query, perf_metrics):
+                response_parts.append(token)
+                yield sse_event("token", {"token": token})
+            response_text = "".join(response_parts)
+            
+            # Only queued once the stream has completed
+            memory_status = queue_mem0_turn(request, response_text)
+            perf_metrics.update(trace.performance_metrics())
+            perf_metrics['write_queue_depth'] = write_queue.depth()
+            
+            yield sse_event("done", QueryResponse(
+                response=response_text,
+                memory_saved=False,
+                memory_status=memory_status,
+                context_found=bool(retrieved_memory_parts),
+                retrieved_memory=retrieved_memory_parts or None,
+                degraded=degraded or None,
+                circuit=circuit_states("mem0", "openai"),
+                performance_metrics=perf_metrics
+            ).model_dump())
+        except Exception as e:
+            yield sse_event("error", {"detail": f"Error processing Mem0 query: {str(e)}"})
+    
+    return sse_response(events())
+
+async def retrieve_mem0_context(request: QueryRequest, perf_metrics: dict) -> list[str]:
+    """Search Mem0 for memories relevant to the query"""
+    # Performance counter for mem0_client.search
+    with trace_span("search"):
+        cache_key, cached = await retrieval_cache_get("mem0", request.user_id, request.query)
+        if cached is not None:
+            retrieved_memory_parts = list(cached)
+        else:
+            (memories, hedged), coalesced = await singleflight.do(
+                ("mem0_search", request.user_id, request.query),
+                lambda: hedger.call(
+                    "mem0_search",
+                    lambda: upstreams["mem0"].call(
+                        lambda: call_mem0("search", query=request.query, user_id=request.user_id, limit=5),
+                        idempotent=True
+                    )
                 )
+            )
+            perf_metrics['search_hedged'] = 1.0 if hedged else 0.0
+            perf_metrics['search_coalesced'] = 1.0 if coalesced else 0.0
+            retrieved_memory_parts = [memory.get('memory', '') for memory in memories or []]
+            await retrieval_cache_set(cache_key, list(retrieved_memory_parts))
+    record_retrieval_cache(perf_metrics, cached is not None)
+    return retrieved_memory_parts
+
+def queue_mem0_turn(request: QueryRequest, response_text: str) -> str:
+    """Queue the user/assistant turn for background persistence to Mem0, returning its memory_status"""
+    messages = [
+        {"role": "user", "content": request.query},
+        {"role": "assistant", "content": response_text}
+    ]
+    
+    # Short-term memory keeps every turn, even one not worth persisting
+    record_short_term(request, response_text)
+    turn, _ = write_filter.should_write("mem0", request.user_id, request.query, request.session_id)
+    if not turn:
+        return "skipped"
+    
+    # Performance counter for enqueueing the mem0_client.add
+    with trace_span("add"):
+        write_queue.enqueue("mem0", request.user_id, messages, fingerprint=turn)
+    return "queued"
+
+@app.post("/local/query", response_model=QueryResponse)
+async def local_query(request: QueryRequest):
+    """
+    Process query using the embedded local memory engine
+    """
+    await wait_for_clients("llm", "local_embedder", "tokenizer")
+    if not llm:
+        # Return mock response if the LLM is not initialized
+        return QueryResponse(
+            response="Mock response: LLM not connected. Please configure API keys.",
+            memory_saved=False,
+            context_found=False,
+            retrieved_memory=None
+        )
+    
+    try:
+        # Initialize performance metrics
+        trace = start_trace("local")
+        perf_metrics = {}
+        deadline = RequestDeadline(request.deadline_ms or latency_budget.deadline_ms)
+        degraded = []
         
-        # Generate response
-        chain = prompt | llm
+        # Retrieve context from the local engine
+        retrieved_memory_parts = await retrieve_within_budget(
+            retrieve_local_context, request, perf_metrics, deadline, degraded
+        )
+        context_messages = pack_context(request, retrieved_memory_parts, perf_metrics)
         
-        # Performance counter for chain.invoke
-        invoke_start = time.time()
-        response = chain.invoke({
-            "context": context_messages,
-            "messages": [HumanMessage(content=request.query)]
-        })
-        invoke_end = time.time()
-        perf_metrics['chain_invoke_time_ms'] = (invoke_end - invoke_start) * 1000
+        # Performance counter for chain.ainvoke
+        with trace.span("chain_invoke"):
+            response = await generate_within_budget(context_messages, request.query, deadline, perf_metrics)
         
-        # Save interaction to Mem0
+        # Save interaction - in-process, so written inline rather than queued
         messages = [
             {"role": "user", "content": request.query},
             {"role": "assistant", "content": response.content}
         ]
+        turn, _ = write_filter.should_write("local", request.user_id, request.query, request.session_id)
+        if turn:
+            with trace.span("add"):
+                start = time.perf_counter()
+                try:
+                    await call_local("add", messages, user_id=request.user_id)
+                except Exception:
+                    write_filter.abandoned(turn)
+                    raise
+                write_filter.record_write("local", (time.perf_counter() - start) * 1000, 1)
+            write_filter.persisted("local", turn)
         
-        # Performance counter for mem0_client.add
-        add_start = time.time()
-        mem0_client.add(messages, user_id=request.user_id)
-        add_end = time.time()
-        perf_metrics['add_time_ms'] = (add_end - add_start) * 1000
-        
-        # Calculate total time
-        perf_metrics['total_time_ms'] = perf_metrics['search_time_ms'] + perf_metrics['chain_invoke_time_ms'] + perf_metrics['add_time_ms']
+        # Stage timings and real elapsed total from the trace spans
+        perf_metrics.update(trace.performance_metrics())
         
         return QueryResponse(
             response=response.content,
-            memory_saved=True,
-            context_found=context_found,
+            memory_saved=turn is not None,
+            memory_status="persisted" if turn else "skipped",
+            context_found=bool(retrieved_memory_parts),
             retrieved_memory=retrieved_memory_parts if retrieved_memory_parts else None,
+            degraded=degraded or None,
+            circuit=circuit_states("openai"),
             performance_metrics=perf_metrics
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error processing Mem0 query: {str(e)}")
+        raise upstream_error(e, "Error processing local query")
+
+async def retrieve_local_context(request: QueryRequest, perf_metrics: dict) -> list[str]:
+    """Search the local engine for memories relevant to the query"""
+    with trace_span("search"):
+        memories = await call_local("search", request.query, user_id=request.user_id, limit=5)
+    return [memory['memory'] for memory in memories]
 
 @app.post("/zep/query", response_model=QueryResponse)
 async def zep_query(request: QueryRequest):
     """
     Process query using Zep for memory management
     """
+    await wait_for_clients("llm", "zep", "tokenizer")
     if not zep_client or not llm:
         # Return mock response if clients not initialized
         return QueryResponse(
             response="Mock response: Memory system not connected. Please configure API keys.",
             memory_saved=False,
             context_found=False,
-            retrieved_memory=None,
-            performance_metrics={
-                "user_setup_time_ms": 5.2,
-                "thread_create_time_ms": 8.7,
-                "search_time_ms": 12.3,
-                "chain_invoke_time_ms": 245.7,
-                "add_time_ms": 18.9,
-                "total_time_ms": 290.8
-            }
+            retrieved_memory=None
         )
     
     try:
         # Initialize performance metrics
+        trace = start_trace("zep")
         perf_metrics = {}
+        deadline = RequestDeadline(request.deadline_ms or latency_budget.deadline_ms)
+        degraded = []
         
-        # Performance counter for user setup
-        user_setup_start = time.time()
-        # Ensure user exists in Zep
-        try:
-            await ensure_zep_user(request.user_id)
-        except Exception as e:
-            # If user creation fails (e.g., due to auth), return mock response
-            if "unauthorized" in str(e).lower() or "401" in str(e):
-                return QueryResponse(
-                    response="Mock response: Zep authentication failed. Please configure valid API keys.",
-                    memory_saved=False,
-                    context_found=False,
-                    retrieved_memory=None,
-                    performance_metrics={
-                        "user_setup_time_ms": 0,
-                        "search_time_ms": 0,
-                        "chain_invoke_time_ms": 0,
-                        "add_time_ms": 0,
-                        "total_time_ms": 0
-                    }
-                )
-        user_setup_end = time.time()
-        perf_metrics['user_setup_time_ms'] = (user_setup_end - user_setup_start) * 1000
-        
-        # Performance counter for thread creation
-        thread_create_start = time.time()
-        # Create a new thread for this session
-        thread_id = f"{request.user_id}_thread_{uuid.uuid4().hex[:8]}"
-        try:
-            await zep_client.thread.create(
-                thread_id=thread_id,
-                user_id=request.user_id
-            )
-        except Exception as e:
-            # If thread creation fails due to auth, return mock response
-            if "unauthorized" in str(e).lower() or "401" in str(e):
-                return QueryResponse(
-                    response="Mock response: Zep authentication failed. Please configure valid API keys.",
-                    memory_saved=False,
-                    context_found=False,
-                    retrieved_memory=None,
-                    performance_metrics={
-                        "user_setup_time_ms": perf_metrics.get('user_setup_time_ms', 0),
-                        "thread_create_time_ms": 0,
-                        "search_time_ms": 0,
-                        "chain_invoke_time_ms": 0,
-                        "add_time_ms": 0,
-                        "total_time_ms": perf_metrics.get('user_setup_time_ms', 0)
-                    }
-                )
-        thread_create_end = time.time()
-        perf_metrics['thread_create_time_ms'] = (thread_create_end - thread_create_start) * 1000
-        
-        # Retrieve context from Zep graph
-        context_messages = []
-        context_found = False
-        retrieved_memory_parts = []
+        session_id = zep_session_id(request)
         
-        # Performance counter for search
-        search_start = time.time()
+        # User setup and thread lookup only hit Zep on a cold miss, and run
+        # concurrently with the graph search
+        setup_task = asyncio.create_task(
+            setup_zep_session(request.user_id, session_id)
+        )
         try:
-            search_results = await zep_client.graph.search(
-                user_id=request.user_id,
-                query=request.query,
-                limit=5,
-                scope="edges"
+            # Retrieve context from Zep graph
+            retrieved_memory_parts = await retrieve_within_budget(
+                retrieve_zep_context, request, perf_metrics, deadline, degraded
             )
+            context_messages = pack_context(request, retrieved_memory_parts, perf_metrics)
             
-            if search_results and search_results.edges:
-                context_found = True
-                context_parts = []
-                for edge in search_results.edges:
-                    fact = edge.fact if hasattr(edge, 'fact') else str(edge)
-                    context_parts.append(fact)
-                    retrieved_memory_parts.append(fact)
-                
-                if context_parts:
-                    combined_context = "\n".join(context_parts)
-                    context_messages.append(
-                        SystemMessage(content=f"Previous context from knowledge graph:\n{combined_context}")
-                    )
-        except Exception as search_error:
-            # Continue without context if search fails
-            pass
-        search_end = time.time()
-        perf_metrics['search_time_ms'] = (search_end - search_start) * 1000
+            thread_id = await await_zep_session(setup_task, degraded)
+        finally:
+            release_zep_setup(setup_task)
         
-        # Generate response
-        chain = prompt | llm
+        # Performance counter for chain.ainvoke
+        with trace.span("chain_invoke"):
+            response = await generate_within_budget(context_messages, request.query, deadline, perf_metrics)
         
-        # Performance counter for chain.invoke
-        invoke_start = time.time()
-        response = chain.invoke({
-            "context": context_messages,
-            "messages": [HumanMessage(content=request.query)]
-        })
-        invoke_end = time.time()
-        perf_metrics['chain_invoke_time_ms'] = (invoke_end - invoke_start) * 1000
+        # Queue interaction for Zep - persisted in the background
+        record_short_term(request, response.content)
+        memory_status = queue_zep_turn(request, thread_id, response.content) if thread_id else None
         
-        # Save interaction to Zep
-        messages = [
-            Message(
-                name=request.user_id,
-                role="user",
-                content=request.query
-            ),
-            Message(
-                name="Assistant",
-                role="assistant",
-                content=response.content
-            )
-        ]
-        
-        # Performance counter for message saving
-        add_start = time.time()
-        await zep_client.thread.add_messages(
-            thread_id=thread_id,
-            messages=messages
-        )
-        add_end = time.time()
-        perf_metrics['add_time_ms'] = (add_end - add_start) * 1000
-        
-        # Calculate total time
-        perf_metrics['total_time_ms'] = (
-            perf_metrics.get('user_setup_time_ms', 0) +
-            perf_metrics.get('thread_create_time_ms', 0) +
-            perf_metrics.get('search_time_ms', 0) +
-            perf_metrics.get('chain_invoke_time_ms', 0) +
-            perf_metrics.get('add_time_ms', 0)
-        )
+        # Stage timings from the trace spans - total is elapsed, since setup overlaps search
+        perf_metrics.update(trace.performance_metrics())
+        perf_metrics['write_queue_depth'] = write_queue.depth()
         
         return QueryResponse(
             response=response.content,
-            memory_saved=True,
-            context_found=context_found,
+            memory_saved=False,
+            memory_status=memory_status,
+            context_found=bool(retrieved_memory_parts),
             retrieved_memory=retrieved_memory_parts if retrieved_memory_parts else None,
+            session_id=session_id,
+            degraded=degraded or None,
+            circuit=circuit_states("zep", "openai"),
             performance_metrics=perf_metrics
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error processing Zep query: {str(e)}")
+        raise upstream_error(e, "Error processing Zep query")
+
+@app.post("/zep/query/stream")
+async def zep_query_stream(request: QueryRequest):
+    """
+    Stream a Zep-backed response over Server-Sent Events
+    """
+    await wait_for_clients("llm", "zep", "tokenizer")
+    if not zep_client or not llm:
+        return sse_response(single_event_stream("done", (await zep_query(request)).model_dump()))
+    
+    async def events():
+        trace = start_trace("zep")
+        perf_metrics = {}
+        deadline = RequestDeadline(request.deadline_ms or latency_budget.deadline_ms)
+        degraded = []
+        session_id = zep_session_id(request)
+        try:
+            setup_task = asyncio.create_task(
+                setup_zep_session(request.user_id, session_id)
+            )
+            try:
+                retrieved_memory_parts = await retrieve_within_budget(
+                    retrieve_zep_context, request, perf_metrics, deadline, degraded
+                )
+                context_messages = pack_context(request, retrieved_memory_parts, perf_metrics)
+                
+                thread_id = await await_zep_session(setup_task, degraded)
+            finally:
+                release_zep_setup(setup_task)
+            
+            yield sse_event("memories", {
+                "context_found": bool(retrieved_memory_parts),
+                "retrieved_memory": retrieved_memory_parts or None,
+                "session_id": session_id,
+                "degraded": degraded or None
+            })
+            
+            response_parts = []
+            async for token in stream_chain(context_messages, request.query, perf_metrics):
+                response_parts.append(token)
+                yield sse_event("token", {"token": token})
+            response_text = "".join(response_parts)
+            
+            # Only queued once the stream has completed
+            record_short_term(request, response_text)
+            memory_status = queue_zep_turn(request, thread_id, response_text) if thread_id else None
+            perf_metrics.update(trace.performance_metrics())
+            perf_metrics['write_queue_depth'] = write_queue.depth()
+            
+            yield sse_event("done", QueryResponse(
+                response=response_text,
+                memory_saved=False,
+                memory_status=memory_status,
+                context_found=bool(retrieved_memory_parts),
+                retrieved_memory=retrieved_memory_parts or None,
+                session_id=session_id,
+                degraded=degraded or None,
+                circuit=circuit_states("zep", "openai"),
+                performance_metrics=perf_metrics
+            ).model_dump())
+        except Exception as e:
+            yield sse_event("error", {"detail": f"Error processing Zep query: {str(e)}"})
+    
+    return sse_response(events())
+
+async def retrieve_zep_context(request: QueryRequest, perf_metrics: dict) -> list[str]:
+    """Query the configured Zep scopes concurrently and merge them into one ranked list of facts"""
+    retrieved_memory_parts = []
+    # The user_context scope reads the session's thread, so its results are cached per thread
+    thread_id = None
+    if any(scope.name == "user_context" for scope in zep_retrieval.scopes):
+        thread_id = zep_session_threads.get((request.user_id, zep_session_id(request)))
+    
+    # Performance counter for search - spans every scope, which overlap
+    with trace_span("search"):
+        cache_key, cached = await retrieval_cache_get("zep", request.user_id, request.query, thread_id)
+        if cached is not None:
+            retrieved_memory_parts = list(cached)
+        else:
+            results = await asyncio.gather(*(
+                search_zep_scope(scope, request, perf_metrics, thread_id) for scope in zep_retrieval.scopes
+            ))
+            ranked = {
+                scope.name: texts
+                for scope, (texts, outcome) in zip(zep_retrieval.scopes, results)
+                if outcome == "ok"
+            }
+            retrieved_memory_parts, contributed = zep_retrieval.merge(ranked)
+            for name, count in contributed.items():
+                perf_metrics[f"zep_{name}_contributed"] = float(count)
+            # Failed or timed-out scopes are not cached
+            if all(outcome in ("ok", "skipped") for _, outcome in results):
+                await retrieval_cache_set(cache_key, list(retrieved_memory_parts))
+    record_retrieval_cache(perf_metrics, cached is not None)
+    return retrieved_memory_parts
+
+async def search_zep_scope(scope: ZepScope, request: QueryRequest, perf_metrics: dict,
+                           thread_id: Optional[str] = None) -> tuple:
+    """(ranked texts, outcome) for one scope under its own timeout; failures leave the other scopes' results"""
+    if scope.name == "user_context":
+        # Only once the session's thread exists - on a first turn it is still being created
+        if not thread_id:
+            zep_retrieval.record_call(scope.name, 0.0, "skipped")
+            return [], "skipped"
+        flight = ("zep_user_context", thread_id)
+        call = lambda: zep_client.thread.get_user_context(thread_id=thread_id)
+    else:
+        flight = (f"zep_search_{scope.name}", request.user_id, request.query)
+        call = lambda: zep_client.graph.search(
+            user_id=request.user_id,
+            query=request.query,
+            limit=scope.limit,
+            scope=scope.name
+        )
+    # Edges keep the original name, so their hedging history and p95 carry over
+    name = "zep_search" if scope.name == "edges" else f"zep_{scope.name}"
+    
+    start = time.perf_counter()
+    texts, outcome = [], "ok"
+    try:
+        (result, hedged), coalesced = await asyncio.wait_for(
+            singleflight.do(
+                flight,
+                lambda: hedger.call(name, lambda: upstreams["zep"].call(call, idempotent=True))
+            ),
+            scope.timeout_ms / 1000 if scope.timeout_ms else None
+        )
+        if scope.name == "edges":
+            perf_metrics['search_hedged'] = 1.0 if hedged else 0.0
+            perf_metrics['search_coalesced'] = 1.0 if coalesced else 0.0
+        texts = extract_texts(scope.name, result)
+    except asyncio.TimeoutError:
+        outcome = "timeout"
+    except CircuitOpen:
+        raise
+    except Exception:
+        # Continue with the other scopes if this one fails
+        outcome = "error"
+    latency_ms = (time.perf_counter() - start) * 1000
+    zep_retrieval.record_call(scope.name, latency_ms, outcome)
+    perf_metrics[f"zep_{scope.name}_time_ms"] = latency_ms
+    perf_metrics[f"zep_{scope.name}_hits"] = float(len(texts))
+    if outcome != "ok":
+        perf_metrics[f"zep_{scope.name}_{outcome}"] = 1.0
+    return texts, outcome
+
+def queue_zep_turn(request: QueryRequest, thread_id: str, response_text: str) -> str:
+    """Queue the user/assistant turn for background persistence to the Zep thread, returning its memory_status"""
+    messages = [
+        {"name": request.user_id, "role": "user", "content": request.query},
+        {"name": "Assistant", "role": "assistant", "content": response_text}
+    ]
+    turn, _ = write_filter.should_write("zep", thread_id, request.query, request.session_id)
+    if not turn:
+        return "skipped"
+    
+    # Performance counter for enqueueing the message save
+    with trace_span("add"):
+        write_queue.enqueue("zep", thread_id, messages, fingerprint=turn)
+    return "queued"
+
+async def await_zep_session(setup_task: asyncio.Task, degraded: list) -> Optional[str]:
+    """Thread id for the session, or None when Zep's circuit is open and the turn goes unsaved"""
+    try:
+        return await setup_task
+    except Exception:
+        # Failures that tripped the breaker (an auth error does at once)
+        # degrade to an LLM-only answer; anything else is a real error
+        if upstreams["zep"].breaker.state == CircuitBreaker.CLOSED:
+            raise
+        note_circuit_open("zep", degraded)
+        return None
+
+def release_zep_setup(setup_task: asyncio.Task):
+    """Cancel session setup a failed request no longer waits for, and retrieve its outcome so no error goes unreported"""
+    if not setup_task.done():
+        setup_task.cancel()
+    setup_task.add_done_callback(lambda task: task.cancelled() or task.exception())
+
+def note_circuit_open(backend: str, degraded: list):
+    if f"{backend}_circuit_open" not in degraded:
+        degraded.append(f"{backend}_circuit_open")
+
+async def retrieve_within_budget(retrieve, request: QueryRequest, perf_metrics: dict,
+                                 deadline: RequestDeadline, degraded: list) -> list[str]:
+    """Run a retrieval stage under its budget, continuing without context if it runs over"""
+    trace = current_trace()
+    backend = trace.backend if trace else None
+    upstream = upstreams.get(backend)
+    key = short_term_key(request)
+    if key is not None:
+        search, _ = short_term.needs_search(key, request.query)
+        perf_metrics['remote_search_skipped'] = 0.0 if search else 1.0
+        if not search:
+            return []
+    try:
+        return await asyncio.wait_for(
+            retrieve(request, perf_metrics),
+            deadline.stage_timeout(latency_budget.retrieval_ms)
+        )
+    except asyncio.TimeoutError:
+        # The cancelled search span still records the time spent
+        perf_metrics['retrieval_budget_exceeded'] = 1.0
+        degraded.append("retrieval_timeout")
+        if upstream:
+            upstream.record_timeout()
+        return []
+    except Exception:
+        # Retrieval-less mode once the backend's circuit is open: answer from
+        # the LLM alone instead of failing or waiting on the backend
+        if not upstream or upstream.breaker.state == CircuitBreaker.CLOSED:
+            raise
+        note_circuit_open(backend, degraded)
+        return []
+
+def pack_context(request: QueryRequest, retrieved_memory_parts: list[str], perf_metrics: dict) -> list:
+    """The session's recent turns, then retrieved memories deduped, reranked and token-budgeted into one message"""
+    key = short_term_key(request)
+    history = []
+    for turn in short_term.turns(key) if key is not None else []:
+        history += [HumanMessage(content=turn.query), AIMessage(content=turn.response)]
+    if key is not None:
+        perf_metrics['short_term_turns'] = float(len(history) // 2)
+    with trace_span("context_pack"):
+        packed = context_packer.pack(request.query, retrieved_memory_parts)
+    perf_metrics.update(packed.metrics())
+    if not packed.memories:
+        return history
+    return history + [SystemMessage(content=packed.text)]
+
+_chain = None
+_chain_llm = None
+
+def llm_chain():
+    """prompt | llm, composed once per LLM client instead of on every request"""
+    global _chain, _chain_llm
+    if _chain is None or _chain_llm is not llm:
+        _chain, _chain_llm = prompt | llm, llm
+    return _chain
+
+def llm_cache_key(context_messages: list, query: str) -> Optional[str]:
+    """Response cache key for the rendered prompt, or None when the cache is off"""
+    if not LLM_CACHE_ENABLED:
+        return None
+    model = getattr(llm, "model_name", None) or getattr(llm, "model", None) or type(llm).__name__
+    return ResponseCache.key(str(model), prompt.format_messages(
+        context=context_messages,
+        messages=[HumanMessage(content=query)]
+    ))
+
+async def llm_cache_get(key: Optional[str], perf_metrics: dict) -> Optional[str]:
+    """Look a prompt up in the in-process tier, then the shared SQLite tier"""
+    if key is None:
+        return None
+    cached = llm_cache.get(key)
+    if cached is None and llm_cache.disk:
+        cached = await run_blocking(llm_cache.disk.get, key)
+        if cached is not None:
+            llm_cache.set(key, cached)
+    perf_metrics['llm_cache_hit'] = 1.0 if cached is not None else 0.0
+    return cached
+
+async def llm_cache_set(key: Optional[str], response_text: str):
+    if key is None or not response_text:
+        return
+    llm_cache.set(key, response_text)
+    if llm_cache.disk:
+        await run_blocking(llm_cache.disk.set, key, response_text, LLM_CACHE_TTL)
+
+async def generate_within_budget(context_messages: list, query: str, deadline: RequestDeadline, perf_metrics: dict):
+    """Invoke the LLM chain under the generation budget, failing with 504 if it runs over"""
+    cache_key = llm_cache_key(context_messages, query)
+    cached = await llm_cache_get(cache_key, perf_metrics)
+    if cached is not None:
+        return AIMessage(content=cached)
+    
+    chain = llm_chain()
+    try:
+        response = await asyncio.wait_for(
+            upstreams["openai"].call(lambda: chain.ainvoke({
+                "context": context_messages,
+                "messages": [HumanMessage(content=query)]
+            })),
+            deadline.stage_timeout(latency_budget.generation_ms)
+        )
+    except asyncio.TimeoutError:
+        upstreams["openai"].record_timeout()
+        raise HTTPException(status_code=504, detail="LLM generation exceeded its latency budget")
+    await llm_cache_set(cache_key, response.content)
+    return response
+
+async def stream_chain(context_messages: list, query: str, perf_metrics: dict):
+    """Yield LLM tokens as they arrive, recording time to first token and total generation time"""
+    chain = llm_chain()
+    
+    with trace_span("chain_invoke") as span:
+        cache_key = llm_cache_key(context_messages, query)
+        cached = await llm_cache_get(cache_key, perf_metrics)
+        if cached is not None:
+            # A cached answer is sent as one token
+            trace_mark("time_to_first_token", span.duration_ms)
+            yield cached
+            return
+        
+        response_parts = []
+        # The slot is held for the whole stream - tokens cannot be replayed, so no retry
+        async with upstreams["openai"].slot():
+            async for chunk in chain.astream({
+                "context": context_messages,
+                "messages": [HumanMessage(content=query)]
+            }):
+                token = chunk.content if hasattr(chunk, 'content') else str(chunk)
+                if not token:
+                    continue
+                trace_mark("time_to_first_token", span.duration_ms)
+                response_parts.append(token)
+                yield token
+        await llm_cache_set(cache_key, "".join(response_parts))
+    trace_mark("time_to_first_token", span.duration_ms)
+
+def sse_event(event: str, data: dict) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+async def single_event_stream(event: str, data: dict):
+    yield sse_event(event, data)
+
+def sse_response(events) -> StreamingResponse:
+    """Wrap an event generator in an unbuffered text/event-stream response"""
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 async def ensure_zep_user(user_id: str):
     """Ensure user exists in Zep, create if not"""
-    if not zep_client:
+    if not zep_client or zep_known_users.get(user_id):
+        return
+    
+    # Concurrent first requests for a user share one lookup
+    await singleflight.do(("zep_ensure_user", user_id), lambda: register_zep_user(user_id))
+
+async def register_zep_user(user_id: str):
+    """Check the shared tier for a user another worker registered, else look them up in Zep and add them if missing"""
+    if await shared_cache_get(f"zep_user:{user_id}"):
+        zep_known_users.set(user_id, True)
         return
     
     try:
-        await zep_client.user.get(user_id)
+        await upstreams["zep"].call(lambda: zep_client.user.get(user_id), idempotent=True)
     except Exception as e:
-        error_str = str(e).lower()
-        if "unauthorized" in error_str or "401" in error_str:
-            # API key is invalid, skip user creation
-            return
-        if "not found" in error_str:
+        # Auth and availability errors propagate - the breaker has counted them
+        if status_code_of(e) != 404:
+            raise
+        try:
+            await upstreams["zep"].call(lambda: zep_client.user.add(
+                user_id=user_id,
+                email=f"{user_id}@example.com",
+                first_name="Demo",
+                last_name="User"
+            ))
+        except Exception as e:
+            # Created concurrently by another worker
+            if status_code_of(e) != 409:
+                raise
+    zep_known_users.set(user_id, True)
+    await shared_cache_set(f"zep_user:{user_id}", "1", zep_known_users.ttl)
+
+async def ensure_zep_thread(user_id: str, session_id: str) -> str:
+    """Return the Zep thread for a session, creating it on first use"""
+    thread_id = zep_session_threads.get((user_id, session_id))
+    if thread_id:
+        return thread_id
+    
+    thread_id, _ = await singleflight.do(
+        ("zep_ensure_thread", user_id, session_id),
+        lambda: create_zep_thread(user_id, session_id)
+    )
+    return thread_id
+
+async def create_zep_thread(user_id: str, session_id: str) -> str:
+    """Create the session's Zep thread unless another worker has, treating an existing one as success"""
+    shared_key = "zep_thread:" + json.dumps([user_id, session_id])
+    thread_id = await shared_cache_get(shared_key)
+    if thread_id:
+        zep_session_threads.set((user_id, session_id), thread_id)
+        return thread_id
+    
+    # Deterministic id so a restarted server reuses the session's existing thread
+    thread_id = f"{user_id}_thread_{session_id}"
+    try:
+        await upstreams["zep"].call(lambda: zep_client.thread.create(
+            thread_id=thread_id,
+            user_id=user_id
+        ))
+    except Exception as e:
+        # Zep reports an existing thread as 409 or a 400 saying so
+        if status_code_of(e) != 409 and "already exists" not in str(e).lower():
+            raise
+    zep_session_threads.set((user_id, session_id), thread_id)
+    await shared_cache_set(shared_key, thread_id, zep_session_threads.ttl)
+    return thread_id
+
+async def setup_zep_session(user_id: str, session_id: str) -> str:
+    """Ensure the user and session thread exist, recording setup spans"""
+    with trace_span("user_setup"):
+        await ensure_zep_user(user_id)
+    
+    with trace_span("thread_create"):
+        thread_id = await ensure_zep_thread(user_id, session_id)
+    return thread_id
+
+@app.post("/ingest/{backend}")
+async def ingest(backend: str, request: Request, job: Optional[str] = None, concurrency: Optional[int] = None):
+    """
+    Bulk-import an NDJSON stream of transcripts and documents into Mem0 or Zep;
+    re-posting the same stream with the same ?job= name resumes after a failure
+    """
+    if backend not in ingest_limiters:
+        raise HTTPException(status_code=404, detail=f"Unknown backend '{backend}'")
+    await wait_for_clients(backend)
+    client = mem0_client if backend == "mem0" else zep_client
+    if not client:
+        raise HTTPException(status_code=503, detail=f"{backend} client not initialized")
+    if job and not INGEST_JOB_PATTERN.match(job):
+        raise HTTPException(status_code=400, detail="job may only contain letters, digits, '-' and '_'")
+    
+    # Imported memories make cached retrievals for those users stale
+    def invalidate(user_id: str):
+        task = asyncio.ensure_future(invalidate_retrieval(backend, user_id))
+        shared_cache_tasks.add(task)
+        task.add_done_callback(shared_cache_tasks.discard)
+    
+    if backend == "mem0":
+        sink = Mem0Sink(client, ingest_limiters["mem0"], executor=blocking_executor, on_written=invalidate)
+    else:
+        sink = ZepSink(client, ingest_limiters["zep"], on_written=invalidate)
+    try:
+        checkpoint = Checkpoint(INGEST_CHECKPOINT_DIR / f"{job}.json" if job else None, backend, f"job:{job}")
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    
+    ingester = Ingester(
+        sink, checkpoint,
+        concurrency=max(1, min(concurrency or INGEST_CONCURRENCY, 64)),
+        max_messages=int(os.environ.get("INGEST_MAX_MESSAGES", "20")),
+        max_chars=int(os.environ.get("INGEST_MAX_CHARS", "4000"))
+    )
+    try:
+        return await ingester.run(ndjson_records(request.stream()))
+    except json.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid NDJSON: {e}")
+
+COMPARE_BRANCH_TIMEOUT = float(os.environ.get("COMPARE_BRANCH_TIMEOUT", "30"))
+
+async def run_compare_branch(name: str, handler, request: QueryRequest, timeout: float):
+    """Run one backend pipeline under its own timeout, returning (response, error, elapsed_ms)"""
+    start = time.perf_counter()
+    try:
+        response = await asyncio.wait_for(handler(request), timeout)
+        return response, None, (time.perf_counter() - start) * 1000
+    except asyncio.TimeoutError:
+        return None, f"{name} timed out after {timeout:.1f}s", (time.perf_counter() - start) * 1000
+    except HTTPException as e:
+        return None, str(e.detail), (time.perf_counter() - start) * 1000
+    except Exception as e:
+        return None, f"Error processing {name} query: {str(e)}", (time.perf_counter() - start) * 1000
+
+@app.post("/compare", response_model=CompareResponse)
+async def compare_query(request: CompareRequest):
+    """
+    Run the Mem0 and Zep pipelines concurrently and return both responses
+    """
+    timeout = request.timeout_s or COMPARE_BRANCH_TIMEOUT
+    query_request = QueryRequest(
+        user_id=request.user_id,
+        query=request.query,
+        session_id=request.session_id,
+        deadline_ms=request.deadline_ms
+    )
+    
+    compare_start = time.perf_counter()
+    (mem0_response, mem0_error, mem0_ms), (zep_response, zep_error, zep_ms) = await asyncio.gather(
+        run_compare_branch("Mem0", mem0_query, query_request, timeout),
+        run_compare_branch("Zep", zep_query, query_request, timeout)
+    )
+    wall_time_ms = (time.perf_counter() - compare_start) * 1000
+    
+    errors = {}
+    if mem0_error:
+        errors["mem0"] = mem0_error
+    if zep_error:
+        errors["zep"] = zep_error
+    
+    return CompareResponse(
+        mem0=mem0_response,
+        zep=zep_response,
+        errors=errors,
+        performance_metrics={
+            "mem0_time_ms": mem0_ms,
+            "zep_time_ms": zep_ms,
+            "sequential_time_ms": mem0_ms + zep_ms,
+            "total_time_ms": wall_time_ms,
+            "time_saved_ms": max(0.0, mem0_ms + zep_ms - wall_time_ms)
+        }
+    )
+
+# Batch queries - offline evaluation workloads; each user's memory is searched
+# once per distinct query and results stream back as NDJSON as they complete
+BATCH_CONCURRENCY = int(os.environ.get("BATCH_CONCURRENCY", "16"))
+BATCH_MAX_REQUESTS = int(os.environ.get("BATCH_MAX_REQUESTS", "10000"))
+
+@app.post("/mem0/query:batch")
+async def mem0_query_batch(batch: BatchQueryRequest):
+    """
+    Answer a batch of Mem0 queries, streaming one NDJSON result per query and a summary
+    """
+    return await query_batch("mem0", batch)
+
+@app.post("/zep/query:batch")
+async def zep_query_batch(batch: BatchQueryRequest):
+    """
+    Answer a batch of Zep queries, streaming one NDJSON result per query and a summary
+    """
+    return await query_batch("zep", batch)
+
+async def query_batch(backend: str, batch: BatchQueryRequest) -> StreamingResponse:
+    if len(batch.requests) > BATCH_MAX_REQUESTS:
+        raise HTTPException(status_code=413, detail=f"A batch may hold at most {BATCH_MAX_REQUESTS} requests")
+    await wait_for_clients("llm", backend, "tokenizer")
+    if not llm or not (mem0_client if backend == "mem0" else zep_client):
+        raise HTTPException(status_code=503, detail=f"{backend} client not initialized")
+    
+    # Zep items without a session_id share one thread per user for the whole
+    # batch, rather than each creating a thread of its own
+    batch_session = f"batch_{uuid.uuid4().hex[:8]}"
+    runner = BatchRunner(
+        partial(batch_retrieve, backend),
+        partial(batch_answer, backend, batch.persist, batch_session),
+        concurrency=max(1, min(batch.concurrency or BATCH_CONCURRENCY, 64))
+    )
+    
+    async def lines():
+        async for result in runner.run(batch.requests):
+            yield json.dumps(result) + "\n"
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+async def batch_retrieve(backend: str, request: QueryRequest) -> tuple:
+    """(memories, search metrics, degraded) for one user and query, shared by the batch's duplicates"""
+    trace = start_trace(backend)
+    perf_metrics = {}
+    degraded = []
+    deadline = RequestDeadline(request.deadline_ms or latency_budget.deadline_ms)
+    retrieve = retrieve_mem0_context if backend == "mem0" else retrieve_zep_context
+    # Batched requests run concurrently and out of order, so they read long-term
+    # memory only - no session's short-term turns
+    request = request.model_copy(update={"session_id": None})
+    retrieved_memory_parts = await retrieve_within_budget(retrieve, request, perf_metrics, deadline, degraded)
+    search_time_ms = trace.performance_metrics().get('search_time_ms')
+    if search_time_ms is not None:
+        perf_metrics['search_time_ms'] = search_time_ms
+    return retrieved_memory_parts, perf_metrics, degraded
+
+async def batch_answer(backend: str, persist: bool, batch_session: str, request: QueryRequest,
+                       retrieved: tuple, shared: bool) -> dict:
+    """Generate the answer for one batched request from its (possibly shared) retrieval"""
+    retrieved_memory_parts, search_metrics, search_degraded = retrieved
+    trace = start_trace(backend)
+    perf_metrics = {**search_metrics, 'retrieval_shared': 1.0 if shared else 0.0}
+    deadline = RequestDeadline(request.deadline_ms or latency_budget.deadline_ms)
+    degraded = list(search_degraded)
+    session_id = request.session_id or (batch_session if backend == "zep" else None)
+    request = request.model_copy(update={"session_id": None})
+    try:
+        setup_task = None
+        if backend == "zep" and persist:
+            setup_task = asyncio.create_task(setup_zep_session(request.user_id, session_id))
+        try:
+            context_messages = pack_context(request, retrieved_memory_parts, perf_metrics)
+            thread_id = await await_zep_session(setup_task, degraded) if setup_task else None
+        finally:
+            if setup_task:
+                release_zep_setup(setup_task)
+        
+        with trace.span("chain_invoke"):
+            response = await generate_within_budget(context_messages, request.query, deadline, perf_metrics)
+        
+        memory_status = None
+        if persist and backend == "mem0":
+            memory_status = queue_mem0_turn(request, response.content)
+        elif thread_id:
+            memory_status = queue_zep_turn(request, thread_id, response.content)
+        perf_metrics.update(trace.performance_metrics())
+        
+        return {"status": 200, "response": QueryResponse(
+            response=response.content,
+            memory_saved=False,
+            memory_status=memory_status,
+            context_found=bool(retrieved_memory_parts),
+            retrieved_memory=retrieved_memory_parts or None,
+            session_id=session_id,
+            degraded=degraded or None,
+            circuit=circuit_states(backend, "openai"),
+            performance_metrics=perf_metrics
+        ).model_dump()}
+    except HTTPException as e:
+        return {"status": e.status_code, "error": e.detail}
+    except Exception as e:
+        error = upstream_error(e, f"Error processing {backend} query")
+        return {"status": error.status_code, "error": error.detail}
+
+# Chat sessions - one per WebSocket connection; identity and the Zep thread
+# are set up once, so each turn pays only for retrieval and generation
+chat_sessions = SessionRegistry(max_turns=int(os.environ.get("CHAT_SESSION_TURNS", "20")))
+chat_backends = {"mem0": mem0_query, "zep": zep_query, "local": local_query}
+
+@app.websocket("/ws/chat")
+async def chat_socket(websocket: WebSocket, user_id: str, session_id: Optional[str] = None):
+    """
+    Chat session over a WebSocket: send {"query", "backends"} messages and get one
+    "response" (or "error") message per backend as it completes, then a "turn" summary
+    """
+    # Any page can open a socket to localhost, so hold browsers to the CORS origins
+    origin = websocket.headers.get("origin")
+    if origin and origin not in CORS_ORIGINS:
+        await websocket.close(code=1008)
+        return
+    
+    await websocket.accept()
+    session = chat_sessions.open(user_id, session_id or uuid.uuid4().hex[:8])
+    try:
+        session.zep_setup = asyncio.create_task(open_zep_session(session))
+        await send_chat_message(session, websocket, {"type": "session", **session.summary()})
+        while True:
             try:
-                await zep_client.user.add(
-                    user_id=user_id,
-                    email=f"{user_id}@example.com",
-                    first_name="Demo",
-                    last_name="User"
-                )
-            except Exception:
-                # Ignore errors in user creation
-                pass
+                message = await websocket.receive_json()
+                if isinstance(message, dict) and message.get("type") == "history":
+                    await send_chat_message(session, websocket, {"type": "history", "turns": list(session.turns)})
+                    continue
+                turn = ChatTurn.model_validate(message)
+            except (json.JSONDecodeError, ValidationError) as e:
+                await send_chat_message(session, websocket, {"type": "error", "status": 422, "detail": str(e)})
+                continue
+            await run_chat_turn(session, websocket, turn)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        chat_sessions.close(session)
+
+async def open_zep_session(session: ChatSession):
+    """Register the user and create the session's Zep thread as soon as the socket opens"""
+    await wait_for_clients("zep")
+    if not zep_client:
+        return
+    try:
+        await ensure_zep_user(session.user_id)
+        await ensure_zep_thread(session.user_id, session.session_id)
+    except Exception as e:
+        # The first Zep turn retries setup and reports the failure
+        print(f"WARNING: Zep setup for chat session {session.session_id} failed: {e}")
+
+async def send_chat_message(session: ChatSession, websocket: WebSocket, message: dict):
+    async with session.send_lock:
+        await websocket.send_json(message)
+
+async def run_chat_turn(session: ChatSession, websocket: WebSocket, turn: ChatTurn):
+    """Run the turn on every requested backend concurrently, pushing each answer as soon as it is ready"""
+    turn_id = turn.turn_id or uuid.uuid4().hex[:8]
+    request = QueryRequest(
+        user_id=session.user_id,
+        query=turn.query,
+        session_id=session.session_id,
+        deadline_ms=turn.deadline_ms
+    )
+    responses = {}
+    errors = 0
+    
+    async def answer(backend: str):
+        nonlocal errors
+        try:
+            if backend not in chat_backends:
+                raise HTTPException(status_code=404, detail=f"Unknown backend '{backend}'")
+            # Setup started at connect is shared through single-flight, and
+            # warm registries make later turns skip it entirely
+            response = await chat_backends[backend](request)
+        except HTTPException as e:
+            errors += 1
+            await send_chat_message(session, websocket, {
+                "type": "error", "turn_id": turn_id, "backend": backend, "status": e.status_code, "detail": e.detail
+            })
+            return
+        except Exception as e:
+            errors += 1
+            await send_chat_message(session, websocket, {
+                "type": "error", "turn_id": turn_id, "backend": backend, "status": 500,
+                "detail": f"Error processing {backend} query: {str(e)}"
+            })
+            return
+        responses[backend] = response.response
+        await send_chat_message(session, websocket, {
+            "type": "response", "turn_id": turn_id, "backend": backend, **response.model_dump()
+        })
+    
+    start = time.perf_counter()
+    with request_trace("chat_turn"):
+        await asyncio.gather(*(answer(backend) for backend in dict.fromkeys(turn.backends)))
+    turn_time_ms = (time.perf_counter() - start) * 1000
+    
+    session.record_turn(turn.query, responses)
+    chat_sessions.record_turn(turn_time_ms, len(responses), errors)
+    await send_chat_message(session, websocket, {
+        "type": "turn", "turn_id": turn_id, "backends": list(responses), "errors": errors,
+        "turn_time_ms": turn_time_ms
+    })
+
+async def shutdown_event():
+    """Drain queued memory writes, then release the blocking executor"""
+    drained = await write_queue.drain(timeout=float(os.environ.get("WRITE_BEHIND_DRAIN_TIMEOUT", "10")))
+    if not drained:
+        print(f"WARNING: {write_queue.depth()} turns left in {write_queue.spool_path} for replay")
+    await http_pool.aclose()
+    if shared_sync_task:
+        shared_sync_task.cancel()
+    if llm_cache.disk:
+        llm_cache.disk.close()
+    if shared_cache and shared_cache is not llm_cache.disk:
+        shared_cache.close()
+    if cassette:
+        cassette.close()
+    blocking_executor.shutdown(wait=False, cancel_futures=True)
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "service": "memory-systems-demo"}
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness: 200 once warm-up has finished, 503 with per-step state until then"""
+    status = {**warmup.status(), "circuit": circuit_states("mem0", "zep", "openai")}
+    return JSONResponse(status, status_code=200 if status["ready"] else 503)
+
+@app.get("/write-behind/metrics")
+async def write_behind_metrics():
+    """Write-behind queue depth, lag and persistence counters"""
+    return {**write_queue.metrics(), "filter": write_filter.metrics()}
+
+@app.get("/cache/metrics")
+async def cache_metrics():
+    """Hit/miss counters and sizes for this worker's caches and the shared tier"""
+    return {
+        "worker_pid": os.getpid(),
+        "retrieval": retrieval_cache.stats(),
+        "zep_users": zep_known_users.stats(),
+        "zep_threads": zep_session_threads.stats(),
+        "llm_responses": {"enabled": LLM_CACHE_ENABLED, **llm_cache.stats()},
+        "short_term": {"enabled": SHORT_TERM_ENABLED, **short_term.metrics()},
+        "shared": {
+            "enabled": shared_cache is not None,
+            "versions_seq": shared_versions_seq,
+            **shared_cache_stats,
+            **(shared_cache.stats() if shared_cache else {})
+        }
+    }
+
+@app.get("/latency/metrics")
+async def latency_metrics():
+    """Configured budgets, hedging counters and observed search percentiles"""
+    return {
+        "budgets_ms": vars(latency_budget),
+        "hedging": {
+            "enabled": hedger.enabled,
+            **hedger.stats,
+            "search_p95_ms": {
+                name: hedger.latencies.percentile(name, hedger.percentile)
+                for name in ("mem0_search", "zep_search")
+            }
+        }
+    }
+
+@app.get("/zep/retrieval/metrics")
+async def zep_retrieval_metrics():
+    """Configured Zep scopes with per-scope latency, hits and contribution to the merged context"""
+    return zep_retrieval.metrics()
+
+@app.get("/singleflight/metrics")
+async def singleflight_metrics():
+    """Per-operation calls, upstream requests and coalesced callers"""
+    return singleflight.metrics()
+
+@app.get("/sessions/metrics")
+async def sessions_metrics():
+    """Open chat sockets and per-turn counters"""
+    return chat_sessions.metrics()
+
+@app.get("/cassette/metrics")
+async def cassette_metrics():
+    """Record/replay mode and recorded, replayed and missed upstream calls"""
+    return cassette.metrics() if cassette else {"mode": "off"}
+
+@app.get("/upstream/metrics")
+async def upstream_metrics():
+    """Adaptive concurrency limit, queue and retry counters per upstream"""
+    return {name: upstream.metrics() for name, upstream in upstreams.items()}
+
+@app.get("/local/metrics")
+async def local_metrics():
+    """Size and index state of the embedded local memory engine"""
+    return local_memory.stats()
+
+@app.get("/http-pool/metrics")
+async def http_pool_metrics():
+    """Connection pool configuration and per-client active/idle/wait statistics"""
+    return http_pool.stats()
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Per-backend stage latency histograms in the Prometheus text format"""
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
 @app.get("/")
 async def root():
     """Root endpoint with API information"""
@@ -410,10 +1742,38 @@ async def root():
         "endpoints": {
             "/mem0/query": "Query using Mem0 memory system",
             "/zep/query": "Query using Zep memory system",
-            "/health": "Health check"
+            "/local/query": "Query using the embedded local memory engine",
+            "/mem0/query/stream": "Stream a Mem0 response over Server-Sent Events",
+            "/zep/query/stream": "Stream a Zep response over Server-Sent Events",
+            "/compare": "Query Mem0 and Zep concurrently in one request",
+            "/mem0/query:batch": "Answer a batch of Mem0 queries, streaming NDJSON results",
+            "/zep/query:batch": "Answer a batch of Zep queries, streaming NDJSON results",
+            "/ws/chat": "WebSocket chat session querying one or more backends per turn",
+            "/ingest/{backend}": "Bulk-import NDJSON transcripts and documents into Mem0 or Zep",
+            "/write-behind/metrics": "Write-behind queue depth and lag",
+            "/cache/metrics": "Per-worker and shared cache hit/miss counters, remote searches avoided by short-term memory",
+            "/latency/metrics": "Latency budgets and hedged search counters",
+            "/zep/retrieval/metrics": "Per-scope Zep retrieval latency and hit contribution",
+            "/local/metrics": "Local memory engine size and index state",
+            "/singleflight/metrics": "Coalesced duplicate backend calls",
+            "/sessions/metrics": "Open chat sockets and turn counters",
+            "/upstream/metrics": "Adaptive concurrency limits and retries per upstream",
+            "/cassette/metrics": "Recorded and replayed upstream calls",
+            "/http-pool/metrics": "Shared HTTP connection pool statistics",
+            "/metrics": "Prometheus latency histograms per backend and stage",
+            "/health": "Liveness check",
+            "/ready": "Readiness: warm-up finished and upstreams reachable"
         }
     }
 
+warmup.import_ms = (time.perf_counter() - IMPORT_START) * 1000
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    host = os.environ.get("HOST", "0.0.0.0")
+    port = int(os.environ.get("PORT", "8000"))
+    if WEB_CONCURRENCY > 1:
+        # Workers import the app themselves and share caches through SHARED_CACHE_PATH
+        uvicorn.run("main:app", host=host, port=port, workers=WEB_CONCURRENCY, app_dir=str(Path(__file__).parent))
+    else:
+        uvicorn.run(app, host=host, port=port)
\ No newline at end of file
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Server-held chat sessions for the Memory Systems Demo API
+A WebSocket connection owns one session: identity, the Zep thread and the
+recent turns are established once and reused by every turn on the socket
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Deque, Dict, Optional
+
+
+class ChatSession:
+    """State kept for the life of one chat connection"""
+
+    def __init__(self, user_id: str, session_id: str, max_turns: int = 20):
+        self.user_id = user_id
+        self.session_id = session_id
+        self.opened_at = time.time()
+        # Zep user and thread setup, started once when the socket opens
+        self.zep_setup: Optional[asyncio.Task] = None
+        self.turns: Deque[dict] = deque(maxlen=max_turns)
+        self.turn_count = 0
+        # Backends answer concurrently; their messages go out one at a time
+        self.send_lock = asyncio.Lock()
+
+    def record_turn(self, query: str, responses: Dict[str, str]):
+        """Keep the query and each backend's answer, dropping the oldest turn when full"""
+        self.turn_count += 1
+        self.turns.append({"query": query, "responses": responses, "ts": time.time()})
+
+    def summary(self) -> dict:
+        return {
+            "user_id": self.user_id,
+            "session_id": self.session_id,
+            "turns": self.turn_count,
+            "age_s": time.time() - self.opened_at,
+        }
+
+
+class SessionRegistry:
+    """Open chat sessions plus connection and per-turn counters for /sessions/metrics"""
+
+    def __init__(self, max_turns: int = 20):
+        self.max_turns = max_turns
+        self.sessions: Dict[int, ChatSession] = {}
+        self.stats = {
+            "opened": 0,
+            "closed": 0,
+            "turns": 0,
+            "responses": 0,
+            "errors": 0,
+            "turn_time_ms_total": 0.0,
+        }
+
+    def open(self, user_id: str, session_id: str) -> ChatSession:
+        session = ChatSession(user_id, session_id, self.max_turns)
+        self.sessions[id(session)] = session
+        self.stats["opened"] += 1
+        return session
+
+    def close(self, session: ChatSession):
+        if self.sessions.pop(id(session), None) is not None:
+            self.stats["closed"] += 1
+        if session.zep_setup and not session.zep_setup.done():
+            session.zep_setup.cancel()
+
+    def record_turn(self, turn_time_ms: float, responses: int, errors: int):
+        self.stats["turns"] += 1
+        self.stats["responses"] += responses
+        self.stats["errors"] += errors
+        self.stats["turn_time_ms_total"] += turn_time_ms
+
+    def metrics(self) -> dict:
+        turns = self.stats["turns"]
+        return {
+            "active": len(self.sessions),
+            **self.stats,
+            "mean_turn_time_ms": self.stats["turn_time_ms_total"] / turns if turns else 0.0,
+        }
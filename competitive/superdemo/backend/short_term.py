@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Short-term (L1) conversation memory for the Memory Systems Demo API
+The last few turns of each session are kept in process and go straight into
+the prompt; a cheap lexical check decides whether a turn also needs the
+remote (L2) memory search or is answered by the conversation so far
+"""
+
+import re
+from collections import deque
+from typing import Deque, Dict, FrozenSet, List, Optional, Tuple
+
+from caches import TTLCache
+from local_memory import TOKEN_PATTERN
+
+STOPWORDS = frozenset("""
+a about above after again all also am an and any are as at be because been before being below between both but
+by can could did do does doing down during each few for from further had has have having he her here hers herself
+him himself his how i if in into is it its itself just let me more most my myself no nor not now of off on once
+only or other our ours ourselves out over own same she should so some such than that the their theirs them
+themselves then there these they this those through to too under until up very was we were what when where which
+while who whom why will with would you your yours yourself yourselves tell know think please thanks thank okay ok
+yes yeah sure any anything something really much many get got make want like need go going
+""".split())
+
+# Phrases that point past the current conversation to long-term memory
+RECALL_PATTERN = re.compile(
+    r"\b(remember|recall|last (time|week|month|year)|previous(ly)?|earlier|before|used to|"
+    r"told you|did i (ever )?(say|mention|tell)|what do you know about me)\b"
+)
+
+SUFFIXES = ("ing", "ed", "es", "s")
+
+
+def content_terms(text: str) -> FrozenSet[str]:
+    """Lower-cased, lightly stemmed terms of the text without stopwords or very short words"""
+    terms = set()
+    for token in TOKEN_PATTERN.findall(text.lower()):
+        token = token.strip("'")
+        if len(token) < 3 or token in STOPWORDS:
+            continue
+        for suffix in SUFFIXES:
+            if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+                token = token[:-len(suffix)]
+                break
+        terms.add(token)
+    return frozenset(terms)
+
+
+class Turn:
+    """One exchange, truncated to keep the buffer compact, with its terms precomputed"""
+
+    __slots__ = ("query", "response", "terms")
+
+    def __init__(self, query: str, response: str, max_chars: int):
+        self.query = query[:max_chars]
+        self.response = response[:max_chars]
+        self.terms = content_terms(f"{query} {response}")
+
+
+class ShortTermMemory:
+    """
+    Last N turns per session in a bounded LRU. needs_search() skips the remote
+    search only when the query's content terms are mostly covered by the recent
+    turns, unless it explicitly asks about the past.
+    """
+
+    def __init__(self, max_turns: int = 6, max_sessions: int = 10000, ttl: Optional[float] = 1800,
+                 coverage: float = 0.6, max_turn_chars: int = 600):
+        self.max_turns = max_turns
+        self.coverage = coverage
+        self.max_turn_chars = max_turn_chars
+        self._sessions = TTLCache(maxsize=max_sessions, ttl=ttl)
+        self.stats = {"searches_needed": 0, "searches_avoided": 0}
+        self.reasons: Dict[str, int] = {}
+
+    def turns(self, key: tuple) -> List[Turn]:
+        buffer = self._sessions.get(key)
+        return list(buffer) if buffer else []
+
+    def record(self, key: tuple, query: str, response: str):
+        """Append a finished turn, dropping the oldest past max_turns"""
+        buffer: Optional[Deque[Turn]] = self._sessions.get(key)
+        if buffer is None:
+            buffer = deque(maxlen=self.max_turns)
+        buffer.append(Turn(query, response, self.max_turn_chars))
+        # Re-set so the session's TTL restarts with every turn
+        self._sessions.set(key, buffer)
+
+    def needs_search(self, key: tuple, query: str) -> Tuple[bool, str]:
+        """(search remote memory?, reason) for the query given the session's recent turns"""
+        search, reason = self._decide(self.turns(key), query)
+        self.stats["searches_needed" if search else "searches_avoided"] += 1
+        self.reasons[reason] = self.reasons.get(reason, 0) + 1
+        return search, reason
+
+    def _decide(self, turns: List[Turn], query: str) -> Tuple[bool, str]:
+        if not turns:
+            return True, "no_history"
+        if RECALL_PATTERN.search(query.lower()):
+            return True, "recall"
+        terms = content_terms(query)
+        if not terms:
+            # "What do I like?", "Who am I?" - nothing to check coverage with,
+            # and often exactly the long-term recall the remote search is for
+            return True, "no_terms"
+        seen = frozenset().union(*(turn.terms for turn in turns))
+        if len(terms & seen) / len(terms) >= self.coverage:
+            return False, "covered"
+        return True, "new_terms"
+
+    def metrics(self) -> dict:
+        decided = self.stats["searches_needed"] + self.stats["searches_avoided"]
+        return {
+            "sessions": len(self._sessions),
+            **self.stats,
+            "avoided_rate": self.stats["searches_avoided"] / decided if decided else 0.0,
+            "reasons": self.reasons,
+        }
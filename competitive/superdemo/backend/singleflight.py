@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Single-flight coalescing for the Memory Systems Demo API
+Concurrent identical backend calls share one in-flight upstream request
+"""
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Tuple
+
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time; callers arriving while it is in
+    flight await the same result (or exception) instead of calling upstream.
+    Keys are tuples whose first element names the operation, for the counters.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Task] = {}
+        self.stats: Dict[str, Dict[str, int]] = {}
+
+    def _counters(self, key: Hashable) -> Dict[str, int]:
+        name = key[0] if isinstance(key, tuple) else str(key)
+        return self.stats.setdefault(name, {"calls": 0, "upstream": 0, "coalesced": 0})
+
+    async def do(self, key: Hashable, make_call: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Return (result, shared) where shared is True if the result came from another caller's flight"""
+        counters = self._counters(key)
+        counters["calls"] += 1
+        task = self._inflight.get(key)
+        shared = task is not None
+        if shared:
+            counters["coalesced"] += 1
+        else:
+            counters["upstream"] += 1
+            # Owned by the group rather than the first caller, so one caller
+            # timing out or disconnecting does not cancel it for the others
+            task = asyncio.ensure_future(make_call())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._finish(key, done))
+        return await asyncio.shield(task), shared
+
+    def _finish(self, key: Hashable, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # Mark the exception retrieved even if every caller gave up waiting
+            task.exception()
+
+    def in_flight(self) -> int:
+        return len(self._inflight)
+
+    def metrics(self) -> dict:
+        return {"in_flight": self.in_flight(), "operations": self.stats}
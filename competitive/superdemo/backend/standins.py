@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Local stand-ins for Mem0, Zep and OpenAI
+Drop-in replacements for the SDK clients with configurable latency
+distributions, for benchmarks and tests that must not touch the network
+"""
+
+import asyncio
+import random
+import time
+from types import SimpleNamespace
+from typing import Any, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+
+class LatencyDistribution:
+    """
+    Latency in milliseconds, parsed from a spec string:
+    "fixed:50", "uniform:20:80", "normal:50:10" or "lognormal:50:0.5" (median, sigma)
+    """
+
+    def __init__(self, spec: str = "fixed:0", seed: Optional[int] = None):
+        self.spec = spec
+        kind, *params = spec.split(":")
+        self.kind = kind
+        self.params = [float(p) for p in params]
+        self._random = random.Random(seed)
+
+    def sample_ms(self) -> float:
+        if self.kind == "fixed":
+            return self.params[0]
+        if self.kind == "uniform":
+            return self._random.uniform(self.params[0], self.params[1])
+        if self.kind == "normal":
+            return max(0.0, self._random.gauss(self.params[0], self.params[1]))
+        if self.kind == "lognormal":
+            median, sigma = self.params
+            return median * self._random.lognormvariate(0.0, sigma)
+        raise ValueError(f"Unknown latency distribution '{self.spec}'")
+
+    def sample(self) -> float:
+        """Latency in seconds"""
+        return self.sample_ms() / 1000
+
+    def __repr__(self):
+        return f"LatencyDistribution('{self.spec}')"
+
+
+class StandInMem0:
+    """Async stand-in for AsyncMemoryClient that remembers user turns and returns the latest as hits"""
+
+    def __init__(self, search_latency: str = "fixed:0", add_latency: str = "fixed:0", seed: Optional[int] = None):
+        self.search_latency = LatencyDistribution(search_latency, seed)
+        self.add_latency = LatencyDistribution(add_latency, seed)
+        self.memories = {}
+        self.calls = {"search": 0, "add": 0}
+
+    async def search(self, query, user_id, limit=5, **kwargs):
+        self.calls["search"] += 1
+        await asyncio.sleep(self.search_latency.sample())
+        return [{"memory": memory, "score": 0.5} for memory in self.memories.get(user_id, [])[-limit:]]
+
+    async def add(self, messages, user_id, **kwargs):
+        self.calls["add"] += 1
+        await asyncio.sleep(self.add_latency.sample())
+        self.memories.setdefault(user_id, []).extend(
+            message["content"] for message in messages if message["role"] == "user"
+        )
+        return {"results": []}
+
+
+class StandInZep:
+    """Async stand-in for AsyncZep covering the user, thread and graph calls the backend makes"""
+
+    def __init__(self, search_latency: str = "fixed:0", add_latency: str = "fixed:0",
+                 setup_latency: str = "fixed:0", seed: Optional[int] = None):
+        self.search_latency = LatencyDistribution(search_latency, seed)
+        self.add_latency = LatencyDistribution(add_latency, seed)
+        self.setup_latency = LatencyDistribution(setup_latency, seed)
+        self.facts = {}
+        self.thread_users = {}
+        self.calls = {"user.get": 0, "user.add": 0, "thread.create": 0, "thread.add_messages": 0,
+                      "thread.get_user_context": 0, "graph.search": 0, "graph.add": 0}
+        self.user = SimpleNamespace(get=self._user_get, add=self._user_add)
+        self.thread = SimpleNamespace(create=self._thread_create, add_messages=self._add_messages,
+                                      get_user_context=self._get_user_context)
+        self.graph = SimpleNamespace(search=self._graph_search, add=self._graph_add)
+
+    async def _user_get(self, user_id, **kwargs):
+        self.calls["user.get"] += 1
+        await asyncio.sleep(self.setup_latency.sample())
+        return SimpleNamespace(user_id=user_id)
+
+    async def _user_add(self, user_id, **kwargs):
+        self.calls["user.add"] += 1
+        await asyncio.sleep(self.setup_latency.sample())
+        return SimpleNamespace(user_id=user_id)
+
+    async def _thread_create(self, thread_id, user_id, **kwargs):
+        self.calls["thread.create"] += 1
+        await asyncio.sleep(self.setup_latency.sample())
+        self.thread_users[thread_id] = user_id
+        return SimpleNamespace(thread_id=thread_id)
+
+    async def _add_messages(self, thread_id, messages, **kwargs):
+        self.calls["thread.add_messages"] += 1
+        await asyncio.sleep(self.add_latency.sample())
+        user_id = self.thread_users.get(thread_id, thread_id.split("_thread_")[0])
+        self.facts.setdefault(user_id, []).extend(
+            f"User said: {message.content}" for message in messages if message.role == "user"
+        )
+
+    async def _get_user_context(self, thread_id, **kwargs):
+        self.calls["thread.get_user_context"] += 1
+        await asyncio.sleep(self.search_latency.sample())
+        user_id = self.thread_users.get(thread_id, thread_id.split("_thread_")[0])
+        return SimpleNamespace(context="\n".join(self.facts.get(user_id, [])[-5:]))
+
+    async def _graph_add(self, user_id, data, type="text", **kwargs):
+        self.calls["graph.add"] += 1
+        await asyncio.sleep(self.add_latency.sample())
+        self.facts.setdefault(user_id, []).append(data)
+
+    async def _graph_search(self, user_id, query, limit=5, scope="edges", **kwargs):
+        self.calls["graph.search"] += 1
+        await asyncio.sleep(self.search_latency.sample())
+        facts = self.facts.get(user_id, [])[-limit:]
+        items = [SimpleNamespace(fact=fact, name=fact, summary=fact, content=fact, uuid_=str(i), score=0.5)
+                 for i, fact in enumerate(facts)]
+        return SimpleNamespace(edges=items if scope == "edges" else None,
+                               nodes=items if scope == "nodes" else None,
+                               episodes=items if scope == "episodes" else None)
+
+
+class StandInChatModel(BaseChatModel):
+    """Chat model that answers after a sampled latency, streaming the answer as evenly spaced tokens"""
+
+    latency: str = "fixed:0"
+    first_token_fraction: float = 0.3
+    tokens: int = 40
+    seed: Optional[int] = None
+    _distribution: Any = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "stand-in"
+
+    def _latency(self) -> LatencyDistribution:
+        if self._distribution is None:
+            self._distribution = LatencyDistribution(self.latency, self.seed)
+        return self._distribution
+
+    def _answer(self, messages) -> str:
+        question = next((m.content for m in reversed(messages) if isinstance(m, HumanMessage)), "")
+        words = f"Stand-in answer to: {question}".split()
+        filler = ["lorem", "ipsum", "dolor", "sit", "amet"]
+        while len(words) < self.tokens:
+            words.append(filler[len(words) % len(filler)])
+        return " ".join(words[:max(self.tokens, 1)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self._latency().sample())
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._answer(messages)))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self._latency().sample())
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=self._answer(messages)))])
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs):
+        total = self._latency().sample()
+        words = self._answer(messages).split(" ")
+        await asyncio.sleep(total * self.first_token_fraction)
+        per_token = total * (1 - self.first_token_fraction) / max(len(words), 1)
+        for i, word in enumerate(words):
+            if i:
+                await asyncio.sleep(per_token)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=word if i == 0 else " " + word))
+
+
+def install(app_module, llm_latency: str = "fixed:0", search_latency: str = "fixed:0",
+            add_latency: str = "fixed:0", setup_latency: str = "fixed:0", seed: Optional[int] = None):
+    """Swap the backend module's LLM, Mem0 and Zep clients for stand-ins"""
+    app_module.llm = StandInChatModel(latency=llm_latency, seed=seed)
+    app_module.mem0_client = StandInMem0(search_latency, add_latency, seed)
+    app_module.zep_client = StandInZep(search_latency, add_latency, setup_latency, seed)
+    return app_module.llm, app_module.mem0_client, app_module.zep_client
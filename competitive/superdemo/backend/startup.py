@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Startup warm-up and readiness for the Memory Systems Demo API
+The server accepts connections straight away while heavy SDK imports, client
+construction and connection pre-warming run in the background; /ready
+reports when that work has actually finished
+"""
+
+import asyncio
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Dict, Optional
+
+PENDING = "pending"
+READY = "ready"
+SKIPPED = "skipped"
+FAILED = "failed"
+
+
+class Warmup:
+    """
+    Tracks named warm-up steps. A failed step is recorded and warm-up moves
+    on; the service is ready once every required step has ended ready or
+    skipped, while optional steps only report their state.
+    """
+
+    def __init__(self):
+        self.components: Dict[str, dict] = {}
+        self.import_ms: Optional[float] = None
+        self.ready_ms: Optional[float] = None
+        self._events: Dict[str, asyncio.Event] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._started = 0.0
+
+    def declare(self, name: str, required: bool = True):
+        self.components[name] = {"state": PENDING, "required": required, "ms": None, "error": None}
+
+    def _event(self, name: str) -> asyncio.Event:
+        return self._events.setdefault(name, asyncio.Event())
+
+    def start(self, warm_up: Awaitable):
+        """Run the warm-up coroutine in the background"""
+        self._started = time.perf_counter()
+        self._task = asyncio.ensure_future(self._run(warm_up))
+
+    async def _run(self, warm_up: Awaitable):
+        try:
+            await warm_up
+        finally:
+            # Anything never reached counts as failed, and nobody waits on it forever
+            for name, component in self.components.items():
+                if component["state"] == PENDING:
+                    component["state"] = FAILED
+                    component["error"] = component["error"] or "not reached"
+                self._event(name).set()
+            for event in self._events.values():
+                event.set()
+            self.ready_ms = (time.perf_counter() - self._started) * 1000
+
+    @contextmanager
+    def step(self, name: str):
+        """Time one warm-up step, recording rather than raising a failure"""
+        component = self.components.setdefault(
+            name, {"state": PENDING, "required": False, "ms": None, "error": None}
+        )
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            component["state"] = FAILED
+            component["error"] = f"{type(e).__name__}: {e}"[:200]
+            print(f"WARNING: Warm-up step {name} failed: {e}")
+        else:
+            component["state"] = READY
+        finally:
+            component["ms"] = (time.perf_counter() - start) * 1000
+            self._event(name).set()
+
+    def skip(self, name: str, reason: str):
+        component = self.components.setdefault(
+            name, {"state": PENDING, "required": False, "ms": None, "error": None}
+        )
+        component["state"] = SKIPPED
+        component["error"] = reason
+        self._event(name).set()
+
+    async def wait(self, name: str):
+        """Wait for one step if warm-up is running; a no-op when it was never started"""
+        if self._task is None or self._task.done():
+            return
+        await self._event(name).wait()
+
+    def ready(self) -> bool:
+        if self._task is None or not self._task.done():
+            return False
+        return all(
+            component["state"] in (READY, SKIPPED)
+            for component in self.components.values()
+            if component["required"]
+        )
+
+    def status(self) -> dict:
+        return {
+            "ready": self.ready(),
+            "import_ms": self.import_ms,
+            "warm_up_ms": self.ready_ms,
+            "components": self.components,
+        }
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Cold-start benchmark for the Memory Systems Demo API
+Measures, in fresh processes, how long `import main` takes, how long a
+uvicorn server takes to answer /health (live) and /ready (warm), and which
+top-level imports dominate, so startup regressions show up next to the
+load-test results
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Optional
+
+import httpx
+
+from benchmark import git_commit, summarize
+
+BACKEND_DIR = Path(__file__).parent
+
+
+def child_env() -> dict:
+    # Fresh spool per run so replaying old turns does not skew warm-up
+    return {**os.environ, "WRITE_BEHIND_SPOOL": os.path.join(tempfile.mkdtemp(), "spool.jsonl")}
+
+
+def measure_import_ms() -> float:
+    """Wall time of `import main` in a fresh interpreter"""
+    code = "import time; t = time.perf_counter(); import main; print((time.perf_counter() - t) * 1000)"
+    output = subprocess.check_output([sys.executable, "-c", code], cwd=BACKEND_DIR, env=child_env(),
+                                     stderr=subprocess.DEVNULL)
+    return float(output.decode().strip().splitlines()[-1])
+
+
+def slowest_imports(limit: int = 10) -> List[dict]:
+    """Top-level modules imported by main, by cumulative import time (python -X importtime)"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", "import main"], cwd=BACKEND_DIR,
+                            env=child_env(), capture_output=True, text=True)
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # After the separator's space, direct imports of main are indented by exactly two
+        name = name[1:]
+        if name.startswith("  ") and not name.startswith("   ") and cumulative.strip().isdigit():
+            modules.append({"module": name.strip(), "cumulative_ms": int(cumulative) / 1000})
+    return sorted(modules, key=lambda m: m["cumulative_ms"], reverse=True)[:limit]
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_server(ready_timeout: float) -> dict:
+    """Spawn uvicorn and time it to a live /health and a ready /ready"""
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    start = time.perf_counter()
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(port)],
+                              cwd=BACKEND_DIR, env=child_env(),
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    live_ms: Optional[float] = None
+    ready_ms: Optional[float] = None
+    status = None
+    try:
+        with httpx.Client(base_url=base_url, timeout=2.0) as client:
+            while time.perf_counter() - start < ready_timeout and server.poll() is None:
+                try:
+                    if live_ms is None and client.get("/health").status_code == 200:
+                        live_ms = (time.perf_counter() - start) * 1000
+                    response = client.get("/ready")
+                    status = response.json()
+                    if response.status_code == 200:
+                        ready_ms = (time.perf_counter() - start) * 1000
+                        break
+                except httpx.HTTPError:
+                    pass
+                time.sleep(0.02)
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            server.kill()
+    return {"live_ms": live_ms, "ready_ms": ready_ms, "status": status}
+
+
+def run_benchmark(args) -> dict:
+    import_ms, live_ms, ready_ms, warm_up_ms = [], [], [], []
+    component_ms = {}
+    not_ready = 0
+    for run in range(args.runs):
+        import_ms.append(measure_import_ms())
+        server = measure_server(args.ready_timeout)
+        if server["live_ms"] is not None:
+            live_ms.append(server["live_ms"])
+        if server["ready_ms"] is None:
+            not_ready += 1
+        else:
+            ready_ms.append(server["ready_ms"])
+        status = server["status"] or {}
+        if status.get("warm_up_ms") is not None:
+            warm_up_ms.append(status["warm_up_ms"])
+        for name, component in (status.get("components") or {}).items():
+            if component.get("ms") is not None:
+                component_ms.setdefault(name, []).append(component["ms"])
+        print(f"run {run + 1}/{args.runs}: import {import_ms[-1]:.0f}ms, "
+              f"live {server['live_ms'] or float('nan'):.0f}ms, ready {server['ready_ms'] or float('nan'):.0f}ms")
+
+    return {
+        "import_ms": summarize(import_ms),
+        "time_to_live_ms": summarize(live_ms),
+        "time_to_ready_ms": summarize(ready_ms),
+        "warm_up_ms": summarize(warm_up_ms),
+        "warm_up_steps_ms": {name: summarize(values) for name, values in component_ms.items()},
+        "not_ready_runs": not_ready,
+        "slowest_imports": slowest_imports(),
+        "config": {"runs": args.runs, "ready_timeout": args.ready_timeout, "python": sys.version.split()[0]},
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "git_commit": git_commit(),
+    }
+
+
+def print_report(report: dict):
+    print(f"\n  {'phase':24} {'p50':>9} {'p95':>9} {'max':>9}")
+    rows = [(name, report[name]) for name in ("import_ms", "time_to_live_ms", "time_to_ready_ms", "warm_up_ms")]
+    rows += [(f"  {name}", stats) for name, stats in report["warm_up_steps_ms"].items()]
+    for name, stats in rows:
+        print(f"  {name:24} {stats['p50']:9.1f} {stats['p95']:9.1f} {stats['max']:9.1f}")
+    if report["not_ready_runs"]:
+        print(f"\n{report['not_ready_runs']} run(s) never became ready")
+    print("\nSlowest imports of main:")
+    for module in report["slowest_imports"]:
+        print(f"  {module['module']:40} {module['cumulative_ms']:9.1f}ms")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Measure import, liveness and readiness time of the demo API")
+    parser.add_argument("--runs", type=int, default=5, help="Cold starts to measure")
+    parser.add_argument("--ready-timeout", type=float, default=60.0, help="Seconds to wait for /ready per run")
+    parser.add_argument("--output", default="startup_benchmark.json", help="Where to write the JSON report")
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    report = run_benchmark(args)
+    print_report(report)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
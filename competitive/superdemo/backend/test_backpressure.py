@@ -0,0 +1,247 @@
+#!/usr/bin/env python3
+"""Backpressure tests: adaptive limits, bounded waits, retries and circuit breakers"""
+
+import asyncio
+import os
+import tempfile
+
+import httpx
+
+# Keep the write-behind spool out of the source tree
+os.environ.setdefault("WRITE_BEHIND_SPOOL", os.path.join(tempfile.mkdtemp(), "spool.jsonl"))
+
+import main
+import standins
+from backpressure import AdaptiveLimiter, CircuitBreaker, CircuitOpen, RetryPolicy, Upstream, UpstreamOverloaded
+
+
+class Unauthorized(Exception):
+    def __init__(self):
+        super().__init__("401 Unauthorized")
+        self.status_code = 401
+
+
+class RateLimited(Exception):
+    """Shaped like an SDK status error carrying Retry-After"""
+
+    def __init__(self, retry_after: str = "0"):
+        super().__init__("429 Too Many Requests")
+        self.status_code = 429
+        self.headers = {"retry-after": retry_after}
+
+
+def test_limit_grows_on_success_and_shrinks_on_overload():
+    async def run():
+        limiter = AdaptiveLimiter("test", initial_limit=4, max_limit=8)
+        for _ in range(4):
+            async with limiter.slot():
+                pass
+        assert limiter.limit == 5
+
+        try:
+            async with limiter.slot():
+                raise RateLimited()
+        except RateLimited:
+            pass
+        assert limiter.limit == 3
+        assert limiter.metrics()["overloads"] == 1
+
+    asyncio.run(run())
+
+
+def test_excess_calls_queue_then_fail_fast():
+    async def run():
+        limiter = AdaptiveLimiter("test", initial_limit=2, max_wait_s=0.05)
+        release = asyncio.Event()
+
+        async def hold():
+            async with limiter.slot():
+                await release.wait()
+
+        holders = [asyncio.ensure_future(hold()) for _ in range(2)]
+        await asyncio.sleep(0)
+        try:
+            async with limiter.slot():
+                raise AssertionError("a third call must not get a slot")
+        except UpstreamOverloaded as e:
+            assert e.retry_after_s == 0.05
+
+        # A queued call gets the slot as soon as one frees up
+        waiter = asyncio.ensure_future(hold())
+        await asyncio.sleep(0)
+        assert limiter.metrics()["waiting"] == 1
+        release.set()
+        await asyncio.gather(waiter, *holders)
+        assert limiter.metrics()["in_flight"] == 0
+        assert limiter.stats["rejected"] == 1
+
+    asyncio.run(run())
+
+
+def test_idempotent_reads_retry_honoring_retry_after():
+    async def run():
+        upstream = Upstream(AdaptiveLimiter("test"), RetryPolicy(max_attempts=3, max_retry_after_s=1.0))
+        attempts = 0
+
+        async def flaky():
+            nonlocal attempts
+            attempts += 1
+            if attempts < 3:
+                raise RateLimited("0.02")
+            return "ok"
+
+        loop = asyncio.get_running_loop()
+        start = loop.time()
+        assert await upstream.call(flaky, idempotent=True) == "ok"
+        assert attempts == 3
+        assert loop.time() - start >= 0.04
+        assert upstream.stats["retries"] == 2
+
+        # Writes are not retried
+        attempts = 0
+        try:
+            await upstream.call(flaky)
+        except RateLimited:
+            pass
+        assert attempts == 1
+
+    asyncio.run(run())
+
+
+def test_rate_limited_search_returns_503_with_retry_after():
+    _, mem0_client, _ = standins.install(main)
+
+    async def rate_limited(*args, **kwargs):
+        raise RateLimited("7")
+
+    mem0_client.search = rate_limited
+    original = main.upstreams["mem0"]
+    # Retry-After above the cap, so the read is not retried
+    main.upstreams["mem0"] = Upstream(AdaptiveLimiter("mem0"), RetryPolicy(max_retry_after_s=1.0))
+    try:
+        async def post():
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await client.post("/mem0/query", json={"user_id": "bp_user", "query": "hello"})
+
+        response = asyncio.run(post())
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "7"
+    finally:
+        main.upstreams["mem0"] = original
+
+
+def test_breaker_opens_fails_fast_and_recovers_through_a_probe():
+    async def run():
+        upstream = Upstream(AdaptiveLimiter("test"), RetryPolicy(max_attempts=1),
+                            CircuitBreaker("test", failure_threshold=3, open_s=0.05))
+        calls = 0
+
+        async def failing():
+            nonlocal calls
+            calls += 1
+            raise ConnectionError("connection refused")
+
+        for _ in range(3):
+            try:
+                await upstream.call(failing)
+            except ConnectionError:
+                pass
+        assert upstream.breaker.state == CircuitBreaker.OPEN
+
+        # Open: the upstream is not called at all
+        try:
+            await upstream.call(failing)
+        except CircuitOpen:
+            pass
+        assert calls == 3
+
+        await asyncio.sleep(0.06)
+        assert upstream.breaker.state == CircuitBreaker.HALF_OPEN
+
+        async def healthy():
+            return "ok"
+
+        assert await upstream.call(healthy) == "ok"
+        assert upstream.breaker.state == CircuitBreaker.CLOSED
+
+    asyncio.run(run())
+
+
+def test_only_upstream_failures_trip_the_breaker():
+    async def run():
+        upstream = Upstream(AdaptiveLimiter("test"), RetryPolicy(max_attempts=1),
+                            CircuitBreaker("test", failure_threshold=2, open_s=30))
+
+        async def raising(error):
+            raise error
+
+        class NotFound(Exception):
+            status_code = 404
+
+        class ServerError(Exception):
+            status_code = 502
+
+        # Our own bugs and a 404 say nothing bad about the upstream
+        for error in (ValueError("bad argument"), KeyError("memory"), NotFound(), ValueError("again")):
+            try:
+                await upstream.call(lambda: raising(error))
+            except Exception:
+                pass
+        assert upstream.breaker.state == CircuitBreaker.CLOSED
+
+        # A connection failure wrapped by an SDK still counts, as does a 5xx
+        wrapped = RuntimeError("Connection error.")
+        wrapped.__cause__ = httpx.ConnectError("connection refused")
+        try:
+            await upstream.call(lambda: raising(wrapped))
+        except RuntimeError:
+            pass
+        try:
+            await upstream.call(lambda: raising(ServerError()))
+        except ServerError:
+            pass
+        assert upstream.breaker.state == CircuitBreaker.OPEN
+
+    asyncio.run(run())
+
+
+def test_zep_auth_failure_degrades_to_llm_only():
+    _, _, zep_client = standins.install(main)
+
+    async def unauthorized(*args, **kwargs):
+        zep_client.calls["user.get"] += 1
+        raise Unauthorized()
+
+    zep_client.user.get = unauthorized
+    original = main.upstreams["zep"]
+    main.upstreams["zep"] = Upstream(AdaptiveLimiter("zep"), RetryPolicy(), CircuitBreaker("zep", open_s=30))
+    try:
+        async def post_twice():
+            transport = httpx.ASGITransport(app=main.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                payload = {"user_id": "bp_zep_user", "query": "hello", "session_id": "tab"}
+                return [await client.post("/zep/query", json=payload) for _ in range(2)]
+
+        for response in asyncio.run(post_twice()):
+            assert response.status_code == 200
+            body = response.json()
+            assert body["circuit"]["zep"] == "open"
+            assert "zep_circuit_open" in body["degraded"]
+            assert body["memory_status"] is None
+            assert body["response"]
+        # The second request never reached Zep
+        assert zep_client.calls["user.get"] == 1
+    finally:
+        main.upstreams["zep"] = original
+
+
+if __name__ == "__main__":
+    test_limit_grows_on_success_and_shrinks_on_overload()
+    test_excess_calls_queue_then_fail_fast()
+    test_idempotent_reads_retry_honoring_retry_after()
+    test_rate_limited_search_returns_503_with_retry_after()
+    test_breaker_opens_fails_fast_and_recovers_through_a_probe()
+    test_only_upstream_failures_trip_the_breaker()
+    test_zep_auth_failure_degrades_to_llm_only()
+    print("backpressure tests passed")
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""Batch query tests: one retrieval per user and query, results streamed as NDJSON"""
+
+import asyncio
+import os
+import tempfile
+import uuid
+
+import httpx
+
+# Keep the write-behind spool out of the source tree
+os.environ.setdefault("WRITE_BEHIND_SPOOL", os.path.join(tempfile.mkdtemp(), "spool.jsonl"))
+
+import main
+import standins
+from batch import BatchRunner, stream_batch
+
+
+async def _run_batch(backend: str, requests: list, **options) -> list:
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return [line async for line in stream_batch(client, backend, requests, **options)]
+
+
+def test_mem0_batch_searches_once_per_user_and_query():
+    _, mem0_client, _ = standins.install(main, llm_latency="fixed:10", search_latency="fixed:20")
+    alice, bob = f"alice_{uuid.uuid4().hex[:6]}", f"bob_{uuid.uuid4().hex[:6]}"
+    requests = [
+        {"user_id": alice, "query": "Where do I live?"},
+        {"user_id": bob, "query": "Where do I live?"},
+        {"user_id": alice, "query": "where do I live"},
+        {"user_id": alice, "query": "What is my dog called?"},
+        {"user_id": bob, "query": "Where do I live?", "session_id": "eval"},
+    ]
+    depth = main.write_queue.depth()
+    lines = asyncio.run(_run_batch("mem0", requests, concurrency=4, persist=False))
+
+    results, summary = lines[:-1], lines[-1]["summary"]
+    assert sorted(result["index"] for result in results) == list(range(len(requests)))
+    assert all(result["status"] == 200 for result in results)
+    assert {result["response"]["memory_status"] for result in results} == {None}
+    # alice asks two distinct questions, bob one
+    assert mem0_client.calls["search"] == 3
+    assert summary["retrievals"] == 3 and summary["retrievals_shared"] == 2
+    assert summary["requests"] == 5 and summary["succeeded"] == 5 and summary["users"] == 2
+    assert summary["wall_time_ms"] < summary["sequential_time_ms"]
+    # An evaluation batch leaves memory alone
+    assert main.write_queue.depth() == depth
+
+
+def test_zep_batch_shares_a_failed_search():
+    _, _, zep_client = standins.install(main)
+    user_id = f"zb_{uuid.uuid4().hex[:6]}"
+
+    async def failing_search(**kwargs):
+        raise RuntimeError("graph unavailable")
+
+    zep_client.graph.search = failing_search
+    lines = asyncio.run(_run_batch("zep", [{"user_id": user_id, "query": "Who walks Porter?"}] * 3))
+    results, summary = lines[:-1], lines[-1]["summary"]
+    # A failed search degrades to an answer without context, for every request sharing it
+    assert [result["response"]["context_found"] for result in results] == [False] * 3
+    assert summary["retrievals"] == 1
+    # Persisted batches set up the Zep user and thread like single queries
+    assert zep_client.calls["user.get"] == 1
+
+
+def test_zep_batch_items_without_a_session_share_one_thread_per_user():
+    _, _, zep_client = standins.install(main)
+    alice, bob = f"za_{uuid.uuid4().hex[:6]}", f"zb_{uuid.uuid4().hex[:6]}"
+    requests = [{"user_id": user_id, "query": f"What is fact {i}?"} for i in range(4) for user_id in (alice, bob)]
+    lines = asyncio.run(_run_batch("zep", requests, concurrency=4))
+    sessions = {result["response"]["session_id"] for result in lines[:-1]}
+    assert len(sessions) == 1 and sessions.pop().startswith("batch_")
+    assert zep_client.calls["thread.create"] == 2
+
+
+def test_batch_runs_through_a_bounded_pool_of_workers():
+    live, peak_tasks = 0, []
+
+    async def retrieve(request):
+        return None
+
+    async def answer(request, retrieved, shared):
+        nonlocal live
+        live += 1
+        peak_tasks.append((live, len(asyncio.all_tasks())))
+        await asyncio.sleep(0.001)
+        live -= 1
+        return {"status": 200}
+
+    async def run():
+        requests = [main.QueryRequest(user_id=f"u{i % 50}", query=f"q{i}") for i in range(2000)]
+        return [line async for line in BatchRunner(retrieve, answer, concurrency=8).run(requests)]
+
+    lines = asyncio.run(run())
+    assert lines[-1]["summary"]["succeeded"] == 2000
+    assert max(concurrent for concurrent, _ in peak_tasks) <= 8
+    # Workers, the feeder and the retrievals in flight - not one task per request
+    assert max(tasks for _, tasks in peak_tasks) < 40
+
+
+if __name__ == "__main__":
+    test_mem0_batch_searches_once_per_user_and_query()
+    test_zep_batch_shares_a_failed_search()
+    test_zep_batch_items_without_a_session_share_one_thread_per_user()
+    test_batch_runs_through_a_bounded_pool_of_workers()
+    print("batch tests passed")
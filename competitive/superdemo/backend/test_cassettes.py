@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""Record/replay tests: a replayed run answers like the recorded one without touching the upstreams"""
+
+import asyncio
+import os
+import tempfile
+import uuid
+
+import httpx
+
+# Keep the write-behind spool out of the source tree
+os.environ.setdefault("WRITE_BEHIND_SPOOL", os.path.join(tempfile.mkdtemp(), "spool.jsonl"))
+
+import cassettes
+import main
+import standins
+from caches import RetrievalCache
+from short_term import ShortTermMemory
+from write_behind import WriteBehindQueue
+
+
+async def _conversation(user_id: str) -> list:
+    # A queue per run, so each run's turns are persisted within it
+    main.write_queue = WriteBehindQueue(os.path.join(tempfile.mkdtemp(), "spool.jsonl"))
+    main.write_queue.register("mem0", main.persist_mem0)
+    main.write_queue.register("zep", main.persist_zep)
+    main.write_queue.start()
+    transport = httpx.ASGITransport(app=main.app)
+    answers = []
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        for path, query in (("/zep/query", "My dog Porter loves the beach"), ("/mem0/query", "Where should I go?")):
+            response = await client.post(path, json={"user_id": user_id, "query": query, "session_id": "tab"})
+            assert response.status_code == 200
+            answers.append(response.json())
+        # Streams replay chunk by chunk
+        async with client.stream("POST", "/mem0/query/stream", json={"user_id": user_id, "query": "And in May?"}) as response:
+            answers.append(len([line async for line in response.aiter_lines() if line.startswith("event: token")]))
+    await main.write_queue.drain()
+    return answers
+
+
+def _reset_caches():
+    for cache in (main.zep_known_users, main.zep_session_threads):
+        cache.clear()
+    main.retrieval_cache = RetrievalCache()
+    main.short_term = ShortTermMemory()
+
+
+def test_replay_matches_recording_with_zero_latency():
+    path = os.path.join(tempfile.mkdtemp(), "cassette.jsonl.gz")
+    user_id = f"cas_{uuid.uuid4().hex[:6]}"
+    saved = main.write_queue, main.retrieval_cache, main.short_term
+    standins.install(main, llm_latency="fixed:30", search_latency="fixed:30", setup_latency="fixed:30")
+    recorder = cassettes.install(main, path, "record")
+    recorded = asyncio.run(_conversation(user_id))
+    recorder.close()
+    assert recorder.stats["recorded"] >= 6
+
+    _reset_caches()
+    # Not strict: with zero latency the write-behind queue can coalesce turns
+    # differently, so an add may be answered by another recorded add
+    player = cassettes.install(main, path, "replay", latency="zero", strict=False)
+    replayed = asyncio.run(_conversation(user_id))
+    main.cassette = None
+    main.write_queue, main.retrieval_cache, main.short_term = saved
+
+    assert [answer["response"] if isinstance(answer, dict) else answer for answer in replayed] == \
+        [answer["response"] if isinstance(answer, dict) else answer for answer in recorded]
+    assert player.stats["misses"] == 0 and player.stats["replayed"] >= 6
+    # Zero latency: the replayed turn takes nowhere near the recorded upstream time
+    assert replayed[0]["performance_metrics"]["total_time_ms"] < recorded[0]["performance_metrics"]["total_time_ms"]
+
+
+def test_replayed_errors_keep_their_status():
+    path = os.path.join(tempfile.mkdtemp(), "cassette.jsonl")
+    cassette = cassettes.Cassette(path, "record")
+
+    class NotFound(Exception):
+        status_code = 404
+
+    cassette.record("zep.user.get", cassettes.to_jsonable({"args": ("u1",), "kwargs": {}}), 12.0,
+                    error=cassettes.error_record(NotFound("user not found")))
+    cassette.close()
+
+    zep = cassettes.CassetteClient(cassettes.Cassette(path, "replay", latency="zero"), "zep")
+    try:
+        asyncio.run(zep.user.get("u1"))
+    except cassettes.ReplayedError as e:
+        assert main.status_code_of(e) == 404
+    else:
+        raise AssertionError("the recorded error must be raised again")
+
+
+def test_unmatched_calls_fail_unless_lenient():
+    path = os.path.join(tempfile.mkdtemp(), "cassette.jsonl")
+    cassette = cassettes.Cassette(path, "record")
+    cassette.record("mem0.search", cassettes.to_jsonable({"args": (), "kwargs": {"query": "Where?"}}), 5.0,
+                    result=[{"memory": "Seattle"}])
+    cassette.close()
+
+    strict = cassettes.CassetteClient(cassettes.Cassette(path, "replay", latency="zero"), "mem0")
+    assert asyncio.run(strict.search(query="Where?")) == [{"memory": "Seattle"}]
+    try:
+        asyncio.run(strict.search(query="When?"))
+    except cassettes.CassetteMiss:
+        pass
+    else:
+        raise AssertionError("an unrecorded call must not be answered by default")
+
+    lenient = cassettes.Cassette(path, "replay", latency="zero", strict=False)
+    assert asyncio.run(cassettes.CassetteClient(lenient, "mem0").search(query="When?")) == [{"memory": "Seattle"}]
+    assert lenient.stats["fallbacks"] == 1
+
+
+def test_recording_leaves_missing_clients_missing():
+    cassette = cassettes.Cassette(os.path.join(tempfile.mkdtemp(), "cassette.jsonl"), "record")
+    assert cassettes.wrap_clients(cassette, None, None, None) == (None, None, None)
+    llm, mem0_client, zep_client = cassettes.wrap_clients(cassette, standins.StandInChatModel(), None, None)
+    assert isinstance(llm, cassettes.CassetteChatModel) and mem0_client is None and zep_client is None
+
+
+def test_a_crashed_recording_keeps_the_calls_made_before_it():
+    path = os.path.join(tempfile.mkdtemp(), "cassette.jsonl.gz")
+    cassette = cassettes.Cassette(path, "record", flush_every=2, flush_interval=60)
+    for i in range(5):
+        cassette.record("llm", [["human", f"question {i}"]], 5.0, result=f"answer {i}")
+    # The process dies here: what is on disk has no gzip trailer, and the last call was never flushed
+    crashed = os.path.join(os.path.dirname(path), "crashed.jsonl.gz")
+    with open(path, "rb") as src, open(crashed, "wb") as dst:
+        dst.write(src.read())
+    cassette.close()
+
+    replay = cassettes.Cassette(crashed, "replay", latency="zero")
+    assert [replay.outcome(replay.take("llm", [["human", f"question {i}"]])) for i in range(4)] == \
+        ["answer 0", "answer 1", "answer 2", "answer 3"]
+    assert replay.metrics()["calls"] == 4
+    # Closing writes what was still buffered
+    assert cassettes.Cassette(path, "replay").metrics()["calls"] == 5
+
+
+if __name__ == "__main__":
+    test_replay_matches_recording_with_zero_latency()
+    test_replayed_errors_keep_their_status()
+    test_unmatched_calls_fail_unless_lenient()
+    test_recording_leaves_missing_clients_missing()
+    test_a_crashed_recording_keeps_the_calls_made_before_it()
+    print("cassette tests passed")
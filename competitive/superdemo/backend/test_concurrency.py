@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""Concurrency test for the superdemo backend against local stand-in backends"""
+
+import asyncio
+import os
+import tempfile
+import time
+from types import SimpleNamespace
+
+import httpx
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+# Keep the write-behind spool out of the source tree
+os.environ.setdefault("WRITE_BEHIND_SPOOL", os.path.join(tempfile.mkdtemp(), "spool.jsonl"))
+
+import main
+
+# Simulated upstream latencies (seconds)
+SEARCH_LATENCY = 0.05
+LLM_LATENCY = 0.10
+ADD_LATENCY = 0.05
+
+
+class StandInMem0:
+    """Synchronous stand-in for MemoryClient that blocks like a real HTTP call"""
+
+    def search(self, query, user_id, limit=5):
+        time.sleep(SEARCH_LATENCY)
+        return [{"memory": f"{user_id} likes Hyatt hotels"}]
+
+    def add(self, messages, user_id):
+        time.sleep(ADD_LATENCY)
+        return {"results": []}
+
+
+class StandInZep:
+    """Async stand-in for AsyncZep"""
+
+    def __init__(self):
+        self.user = SimpleNamespace(get=self._sleep_ok, add=self._sleep_ok)
+        self.thread = SimpleNamespace(create=self._sleep_ok, add_messages=self._add_messages)
+        self.graph = SimpleNamespace(search=self._graph_search)
+
+    async def _sleep_ok(self, *args, **kwargs):
+        await asyncio.sleep(0.01)
+
+    async def _add_messages(self, *args, **kwargs):
+        await asyncio.sleep(ADD_LATENCY)
+
+    async def _graph_search(self, *args, **kwargs):
+        await asyncio.sleep(SEARCH_LATENCY)
+        return SimpleNamespace(edges=[SimpleNamespace(fact="User is a World of Hyatt member")])
+
+
+async def _fake_llm(prompt_value):
+    await asyncio.sleep(LLM_LATENCY)
+    return AIMessage(content="Stand-in response")
+
+
+def install_stand_ins():
+    main.mem0_client = StandInMem0()
+    main.zep_client = StandInZep()
+    main.llm = RunnableLambda(lambda prompt_value: AIMessage(content="Stand-in response"), afunc=_fake_llm)
+
+
+async def measure_throughput(path: str, concurrency: int, requests_per_worker: int = 3) -> float:
+    """Return requests/second for `concurrency` clients each issuing sequential requests"""
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        async def worker(worker_id: int):
+            for i in range(requests_per_worker):
+                resp = await client.post(path, json={"user_id": f"user_{worker_id}", "query": f"Question {i}"})
+                assert resp.status_code == 200, resp.text
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(w) for w in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return concurrency * requests_per_worker / elapsed
+
+
+def _check_scaling(path: str):
+    install_stand_ins()
+    serial = asyncio.run(measure_throughput(path, concurrency=1))
+    parallel = asyncio.run(measure_throughput(path, concurrency=8))
+    # A blocking handler would keep throughput flat; allow generous slack for CI noise
+    assert parallel > serial * 4, f"{path}: 1 client {serial:.1f} req/s, 8 clients {parallel:.1f} req/s"
+
+
+def test_mem0_throughput_scales_with_concurrency():
+    _check_scaling("/mem0/query")
+
+
+def test_zep_throughput_scales_with_concurrency():
+    _check_scaling("/zep/query")
+
+
+if __name__ == "__main__":
+    test_mem0_throughput_scales_with_concurrency()
+    test_zep_throughput_scales_with_concurrency()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""Context packing tests: dedupe, relevance ordering and the token budget"""
+
+import context_packing
+from context_packing import ContextPacker, count_tokens
+
+
+def test_duplicates_are_dropped_and_the_rest_kept_in_one_message():
+    packer = ContextPacker(token_budget=0)
+    packed = packer.pack("Where does Alice live?", [
+        "Alice lives in Seattle",
+        "alice lives in   Seattle",
+        "Alice lives in Seattle.",
+        "Alice has a dog called Porter",
+    ])
+    assert packed.memories == ["Alice lives in Seattle", "Alice has a dog called Porter"]
+    assert packed.duplicates_dropped == 2
+    assert packed.text.splitlines() == [packer.header, "- Alice lives in Seattle", "- Alice has a dog called Porter"]
+    assert packed.packed_tokens == count_tokens(packed.text)
+
+
+def test_a_top_hit_sharing_no_words_with_the_query_is_kept():
+    # The backend ranked it first by meaning; lexically it scores zero
+    memories = ["Prefers window seats on long-haul flights", "Flies with Alaska Airlines", "Owns a golden retriever"]
+    packer = ContextPacker(token_budget=0)
+    packed = packer.pack("Which airline do I like?", memories)
+    assert set(packed.memories) == set(memories)
+    assert packed.irrelevant_dropped == 0
+    assert packed.memories.index("Prefers window seats on long-haul flights") < packed.memories.index(
+        "Owns a golden retriever")
+
+    # Pruning is opt-in, and still judges hits by the blended score
+    pruned = ContextPacker(token_budget=0, relative_cutoff=0.9).pack("Which airline do I like?", memories)
+    assert "Prefers window seats on long-haul flights" in pruned.memories and pruned.irrelevant_dropped >= 1
+
+
+def test_the_budget_drops_the_least_useful_hits_but_keeps_the_top_one():
+    memories = [f"Memory number {i} about the trip to Lisbon in May" for i in range(10)]
+    per_hit = count_tokens(f"- {memories[0]}")
+    packer = ContextPacker(token_budget=count_tokens(ContextPacker().header) + 3 * per_hit, dedupe_threshold=1.01)
+    packed = packer.pack("Lisbon trip", memories)
+    assert len(packed.memories) == 3 and packed.budget_dropped == 7
+    assert packed.packed_tokens <= packer.token_budget + 2
+    assert packed.tokens_saved > 0
+
+    # A budget smaller than any hit still sends the best one
+    tiny = ContextPacker(token_budget=1).pack("Lisbon trip", memories)
+    assert tiny.memories == [memories[0]]
+
+
+def test_token_counts_are_estimated_until_the_encoding_is_loaded():
+    saved = context_packing._encoding
+    context_packing._encoding = None
+    try:
+        # No encoding loaded: counting never loads (or downloads) one itself
+        assert count_tokens("twelve chars") == 3
+        assert context_packing._encoding is None
+    finally:
+        context_packing._encoding = saved
+
+
+if __name__ == "__main__":
+    test_duplicates_are_dropped_and_the_rest_kept_in_one_message()
+    test_a_top_hit_sharing_no_words_with_the_query_is_kept()
+    test_the_budget_drops_the_least_useful_hits_but_keeps_the_top_one()
+    test_token_counts_are_estimated_until_the_encoding_is_loaded()
+    print("context packing tests passed")
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Connection pool tests: both client kinds are instrumented and pool waits are measured, not guessed"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from http_pool import HTTPPool, PoolConfig
+
+
+class SlowHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        time.sleep(0.05)
+        self.send_response(200)
+        self.send_header("Content-Length", "2")
+        self.end_headers()
+        self.wfile.write(b"ok")
+
+    def log_message(self, *args):
+        pass
+
+
+def _serve():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), SlowHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/"
+
+
+def _pool() -> HTTPPool:
+    return HTTPPool(PoolConfig(max_connections=1, max_keepalive_connections=1, http2=False, prewarm_connections=0))
+
+
+def test_async_requests_queued_behind_a_busy_connection_count_as_waits():
+    server, url = _serve()
+    pool = _pool()
+
+    async def run():
+        client = pool.async_client("zep")
+        # A lone request does not wait (and this one also pays the first-use imports)
+        await client.get(url)
+        assert pool.stats()["clients"]["zep"]["waits"] == 0
+        responses = await asyncio.gather(*(client.get(url) for _ in range(3)))
+        assert [response.status_code for response in responses] == [200] * 3
+        assert pool.stats()["clients"]["zep"]["connections"] == 1
+        await pool.aclose()
+
+    try:
+        asyncio.run(run())
+    finally:
+        server.shutdown()
+    stats = pool.stats()["clients"]["zep"]
+    assert stats["requests"] == 4 and stats["peak_in_flight"] == 3 and stats["in_flight"] == 0
+    # One connection: of the three sent together, the second waits one response and the third two
+    # (the first can cross the threshold too on a busy event loop)
+    assert stats["waits"] >= 2
+    assert 70 <= stats["wait_ms_max"] and stats["wait_ms_total"] >= 120
+    assert stats["errors"] == 0
+
+
+def test_sync_client_is_instrumented_too():
+    server, url = _serve()
+    pool = _pool()
+    client = pool.sync_client("mem0")
+    try:
+        client.get(url)
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            assert [r.status_code for r in executor.map(lambda _: client.get(url), range(2))] == [200, 200]
+    finally:
+        server.shutdown()
+        asyncio.run(pool.aclose())
+    stats = pool.stats()["clients"]["mem0"]
+    assert stats["requests"] == 3 and stats["peak_in_flight"] == 2
+    assert stats["waits"] == 1 and stats["wait_ms_max"] >= 30
+
+
+if __name__ == "__main__":
+    test_async_requests_queued_behind_a_busy_connection_count_as_waits()
+    test_sync_client_is_instrumented_too()
+    print("http pool tests passed")
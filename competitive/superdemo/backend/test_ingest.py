@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""Bulk ingestion tests: chunking, default sessions, checkpoints and resuming a failed import"""
+
+import asyncio
+import json
+import tempfile
+from pathlib import Path
+from types import SimpleNamespace
+
+from ingest import Checkpoint, Ingester, RateLimiter, ZepSink, chunk_record, iterate, split_text
+
+
+def test_split_text_keeps_paragraphs_within_the_limit():
+    text = "First paragraph.\n\nSecond one here.\n\n\n" + "x" * 25 + "\n\nLast."
+    chunks = split_text(text, max_chars=20)
+    assert chunks == ["First paragraph.", "Second one here.", "x" * 20, "x" * 5 + "\n\nLast."]
+    assert all(len(chunk) <= 20 for chunk in chunks)
+    # Short paragraphs share a chunk
+    assert split_text("a\n\nb\n\nc", max_chars=100) == ["a\n\nb\n\nc"]
+    assert split_text("   ", max_chars=10) == []
+
+
+def test_default_session_covers_the_user_and_every_message():
+    def transcript(user_id, *contents):
+        return {"user_id": user_id, "messages": [{"role": "user", "content": c} for c in contents]}
+
+    session = chunk_record(transcript("alice", "Hi!", "I live in Seattle"))[0].session_id
+    # Stable across runs, so a resumed import reuses the thread
+    assert chunk_record(transcript("alice", "Hi!", "I live in Seattle"))[0].session_id == session
+    # Conversations that only open alike, or belong to someone else, get their own
+    assert chunk_record(transcript("alice", "Hi!", "I live in Lisbon"))[0].session_id != session
+    assert chunk_record(transcript("bob", "Hi!", "I live in Seattle"))[0].session_id != session
+    assert chunk_record({**transcript("alice", "Hi!"), "session_id": "trip"})[0].session_id == "trip"
+
+
+def test_checkpoint_round_trips_and_refuses_another_import():
+    path = Path(tempfile.mkdtemp()) / "import.ckpt.json"
+    checkpoint = Checkpoint(path, "zep", "users.jsonl")
+    for index in (0, 1, 3):
+        checkpoint.mark_done(index)
+    checkpoint.mark_chunk(2, 4)
+    checkpoint.save(force=True)
+    assert (checkpoint.watermark, checkpoint.done) == (2, {3})
+
+    resumed = Checkpoint(path, "zep", "users.jsonl")
+    assert [resumed.is_done(i) for i in range(5)] == [True, True, False, True, False]
+    assert resumed.chunks_done(2) == 4 and resumed.chunks_done(4) == 0
+    resumed.mark_done(2)
+    assert resumed.watermark == 4 and not resumed.done
+
+    try:
+        Checkpoint(path, "mem0", "users.jsonl")
+    except ValueError:
+        pass
+    else:
+        raise AssertionError("a checkpoint from another backend must not be resumed")
+    assert not path.with_suffix(".json.tmp").exists()
+
+
+class RecordingSink:
+    name = "mem0"
+
+    def __init__(self, fail_on=None):
+        self.limiter = RateLimiter(0)
+        self.fail_on = fail_on
+        self.pushed = []
+
+    async def push(self, chunk):
+        content = chunk.messages[0]["content"]
+        if content == self.fail_on:
+            raise ConnectionError("upstream unavailable")
+        self.pushed.append(content)
+
+
+def test_a_rerun_resumes_at_the_chunk_that_failed():
+    path = Path(tempfile.mkdtemp()) / "import.ckpt.json"
+    records = [
+        {"user_id": "alice", "messages": [{"role": "user", "content": "a0"}]},
+        {"user_id": "bob", "messages": [{"role": "user", "content": f"b{i}"} for i in range(3)]},
+        {"user_id": "carol", "messages": [{"role": "user", "content": "c0"}]},
+        {"user_id": "dave"},
+    ]
+
+    def run(sink):
+        ingester = Ingester(sink, Checkpoint(path, "mem0", "users.jsonl"), concurrency=2, max_messages=1,
+                            max_attempts=1)
+        return asyncio.run(ingester.run(iterate(records)))
+
+    failing = RecordingSink(fail_on="b1")
+    report = run(failing)
+    assert sorted(failing.pushed) == ["a0", "b0", "c0"]
+    assert report["failed"] == 1 and report["invalid"] == 1 and report["records"] == 2
+    state = json.loads(path.read_text())
+    assert state["watermark"] == 1 and state["done"] == [2, 3] and state["partial"] == {"1": 1}
+
+    # Only bob's unwritten chunks go out, in order; finished and invalid records are skipped
+    healthy = RecordingSink()
+    report = run(healthy)
+    assert healthy.pushed == ["b1", "b2"]
+    assert report["skipped_from_checkpoint"] == 3 and report["failed"] == 0
+    assert report["checkpoint"]["watermark"] == 4
+
+
+class ZepError(Exception):
+    def __init__(self, status_code: int, body: str):
+        super().__init__(f"status_code: {status_code}, body: {body}")
+        self.status_code = status_code
+
+
+def test_only_a_409_means_the_zep_user_exists():
+    async def add_existing(**kwargs):
+        raise ZepError(409, "user already exists")
+
+    async def add_failing(**kwargs):
+        # The status is what counts, not a 409 that happens to be in the text
+        raise ZepError(500, "upload of 409 bytes failed")
+
+    async def run(add):
+        sink = ZepSink(SimpleNamespace(user=SimpleNamespace(add=add)), RateLimiter(0))
+        await sink._ensure_user("alice")
+        return sink
+
+    assert "alice" in asyncio.run(run(add_existing))._known_users
+    try:
+        asyncio.run(run(add_failing))
+    except ZepError:
+        pass
+    else:
+        raise AssertionError("a failed user add must not be taken for an existing user")
+
+
+if __name__ == "__main__":
+    test_split_text_keeps_paragraphs_within_the_limit()
+    test_default_session_covers_the_user_and_every_message()
+    test_checkpoint_round_trips_and_refuses_another_import()
+    test_a_rerun_resumes_at_the_chunk_that_failed()
+    test_only_a_409_means_the_zep_user_exists()
+    print("ingest tests passed")
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""LLM response cache tests: prompt keying, TTL expiry and bypass when the cache is off"""
+
+import asyncio
+import os
+import tempfile
+import time
+import uuid
+
+import httpx
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+# Keep the write-behind spool out of the source tree
+os.environ.setdefault("WRITE_BEHIND_SPOOL", os.path.join(tempfile.mkdtemp(), "spool.jsonl"))
+
+import main
+import standins
+from caches import ResponseCache, SQLiteCache
+
+
+def test_key_covers_model_context_and_query():
+    prompt = [SystemMessage(content="You are helpful"), SystemMessage(content="- Alice lives in Seattle"),
+              HumanMessage(content="Where do I live?")]
+    key = ResponseCache.key("gpt-4o-mini", prompt)
+    assert key == ResponseCache.key("gpt-4o-mini", list(prompt))
+    assert key != ResponseCache.key("gpt-4o", prompt)
+    # A new memory in the context, or another question, is another key
+    assert key != ResponseCache.key("gpt-4o-mini", [prompt[0], SystemMessage(content="- Alice lives in Lisbon"),
+                                                    prompt[2]])
+    assert key != ResponseCache.key("gpt-4o-mini", prompt[:2] + [HumanMessage(content="Where do I work?")])
+    # The message role is part of the prompt too
+    assert key != ResponseCache.key("gpt-4o-mini", prompt[:2] + [AIMessage(content="Where do I live?")])
+
+
+def test_entries_expire_in_both_tiers():
+    disk = SQLiteCache(os.path.join(tempfile.mkdtemp(), "llm.sqlite"), ttl=0.05)
+    cache = ResponseCache(ttl=0.05, disk=disk)
+    cache.set("prompt", "Seattle")
+    disk.set("prompt", "Seattle")
+    assert cache.get("prompt") == "Seattle" and disk.get("prompt") == "Seattle"
+    time.sleep(0.08)
+    assert cache.get("prompt") is None and disk.get("prompt") is None
+    disk.close()
+
+
+def _ask_twice(query: str) -> list:
+    user_id = f"lc_{uuid.uuid4().hex[:6]}"
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return [
+                (await client.post("/local/query", json={"user_id": user_id, "query": query})).json()
+                for _ in range(2)
+            ]
+
+    return asyncio.run(run())
+
+
+def test_repeated_prompt_is_answered_from_the_cache_only_when_enabled():
+    standins.install(main)
+    saved = main.LLM_CACHE_ENABLED, main.llm_cache
+    main.llm_cache = ResponseCache(maxsize=16, ttl=60)
+    try:
+        # Off: no key is built and the cache is never read or written
+        main.LLM_CACHE_ENABLED = False
+        responses = _ask_twice("Hello!")
+        assert all("llm_cache_hit" not in response["performance_metrics"] for response in responses)
+        assert main.llm_cache.stats()["memory"]["size"] == 0 and main.llm_cache.stats()["memory"]["misses"] == 0
+
+        # On: small talk is not written, so the second prompt is identical and hits
+        main.LLM_CACHE_ENABLED = True
+        first, second = _ask_twice("Hello!")
+        assert first["performance_metrics"]["llm_cache_hit"] == 0.0
+        assert second["performance_metrics"]["llm_cache_hit"] == 1.0
+        assert second["response"] == first["response"]
+
+        # A stored turn becomes context for the next one, so its prompt and key change
+        first, second = _ask_twice("My dog is called Porter")
+        assert second["performance_metrics"]["llm_cache_hit"] == 0.0
+    finally:
+        main.LLM_CACHE_ENABLED, main.llm_cache = saved
+
+
+if __name__ == "__main__":
+    test_key_covers_model_context_and_query()
+    test_entries_expire_in_both_tiers()
+    test_repeated_prompt_is_answered_from_the_cache_only_when_enabled()
+    print("llm cache tests passed")
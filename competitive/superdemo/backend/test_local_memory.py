@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+"""Embedded local memory tests: add, dedupe and top-k search with the hashing embedder"""
+
+import numpy as np
+
+from local_memory import HashingEmbedder, LocalMemory
+
+
+def _turn(text: str) -> list:
+    return [{"role": "user", "content": text}, {"role": "assistant", "content": "Noted."}]
+
+
+def test_hashing_embeddings_are_deterministic_unit_vectors():
+    embedder = HashingEmbedder(dim=64)
+    vectors = embedder.embed(["Alice lives in Seattle", "Alice lives in Seattle", ""])
+    assert vectors.shape == (3, 64)
+    assert np.array_equal(vectors[0], vectors[1])
+    assert np.isclose(np.linalg.norm(vectors[0]), 1.0)
+    # Nothing to hash: a zero vector rather than NaNs
+    assert not vectors[2].any()
+
+
+def test_add_stores_user_turns_and_skips_repeats():
+    memory = LocalMemory()
+    added = memory.add(_turn("Alice lives in Seattle"), user_id="alice")
+    assert [result["memory"] for result in added["results"]] == ["Alice lives in Seattle"]
+    assert added["results"][0]["event"] == "ADD"
+
+    # A repeat of a stored memory, or within one turn, is stored once; assistant text never is
+    assert memory.add(_turn("Alice lives in Seattle"), user_id="alice") == {"results": []}
+    messages = [{"role": "user", "content": "Porter is 4"}, {"role": "user", "content": " Porter is 4 "}]
+    assert len(memory.add(messages, user_id="alice")["results"]) == 1
+    # Dedupe is per user
+    assert len(memory.add(_turn("Alice lives in Seattle"), user_id="bob")["results"]) == 1
+
+    store = memory._stores["alice"]
+    assert store.texts == ["Alice lives in Seattle", "Porter is 4"] and store.known == set(store.texts)
+    assert memory.stats()["memories"] == 3 and memory.stats()["users"] == 2
+
+
+def test_search_ranks_the_closest_memory_first():
+    memory = LocalMemory()
+    facts = ["Alice lives in Seattle", "Porter is a golden retriever", "Tom walks Porter on weekdays",
+             "Flies with Alaska Airlines"]
+    for fact in facts:
+        memory.add(_turn(fact), user_id="alice")
+    # Grows past the initial 16-row matrix
+    for i in range(20):
+        memory.add(_turn(f"Filler note number {i}"), user_id="alice")
+
+    hits = memory.search("Who walks Porter on weekdays?", user_id="alice", limit=3)
+    assert hits[0]["memory"] == "Tom walks Porter on weekdays"
+    assert len(hits) <= 3 and all(hit["user_id"] == "alice" for hit in hits)
+    assert [hit["score"] for hit in hits] == sorted((hit["score"] for hit in hits), reverse=True)
+    assert memory.search("Who walks Porter?", user_id="nobody") == []
+
+
+if __name__ == "__main__":
+    test_hashing_embeddings_are_deterministic_unit_vectors()
+    test_add_stores_user_turns_and_skips_repeats()
+    test_search_ranks_the_closest_memory_first()
+    print("local memory tests passed")
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""Retrieval cache tests: hits, misses, invalidation on a persisted write, and the off switch"""
+
+import asyncio
+import os
+import tempfile
+import uuid
+
+import httpx
+
+# Keep the write-behind spool out of the source tree
+os.environ.setdefault("WRITE_BEHIND_SPOOL", os.path.join(tempfile.mkdtemp(), "spool.jsonl"))
+
+import main
+import standins
+
+
+async def _ask(client, user_id: str, query: str) -> dict:
+    response = await client.post("/mem0/query", json={"user_id": user_id, "query": query})
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_hits_until_a_write_for_the_user_persists():
+    _, mem0_client, _ = standins.install(main)
+    user_id = f"rc_{uuid.uuid4().hex[:6]}"
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            # The first turn is itself persisted, which invalidates its own result
+            await _ask(client, user_id, "Where do I live?")
+            await main.write_queue.drain()
+            miss = await _ask(client, user_id, "Where do I live?")
+            hit = await _ask(client, user_id, "where do i live")
+            searches = mem0_client.calls["search"]
+
+            await _ask(client, user_id, "I live in Seattle")
+            await main.write_queue.drain()
+            fresh = await _ask(client, user_id, "Where do I live?")
+            return miss, hit, searches, fresh
+
+    miss, hit, searches, fresh = asyncio.run(run())
+    assert miss["performance_metrics"]["retrieval_cache_hit"] == 0.0
+    assert hit["performance_metrics"]["retrieval_cache_hit"] == 1.0
+    assert hit["retrieved_memory"] == miss["retrieved_memory"]
+    assert hit["performance_metrics"]["retrieval_cache_hits"] > miss["performance_metrics"]["retrieval_cache_hits"]
+    assert searches == 2
+    # The persisted write orphaned the cached result, so the new memory is found
+    assert fresh["performance_metrics"]["retrieval_cache_hit"] == 0.0
+    assert "I live in Seattle" in fresh["retrieved_memory"]
+    assert mem0_client.calls["search"] == 4
+
+
+def test_disabled_cache_is_never_consulted():
+    _, mem0_client, _ = standins.install(main)
+    user_id = f"rc_{uuid.uuid4().hex[:6]}"
+    before = main.retrieval_cache.stats()
+    main.RETRIEVAL_CACHE_ENABLED = False
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return [await _ask(client, user_id, "What is my dog called?") for _ in range(2)]
+
+    try:
+        responses = asyncio.run(run())
+    finally:
+        main.RETRIEVAL_CACHE_ENABLED = True
+    assert mem0_client.calls["search"] == 2
+    assert all(response["performance_metrics"]["retrieval_cache_hit"] == 0.0 for response in responses)
+    assert "retrieval_cache_misses" not in responses[0]["performance_metrics"]
+    after = main.retrieval_cache.stats()
+    assert (after["hits"], after["misses"], after["size"]) == (before["hits"], before["misses"], before["size"])
+
+
+if __name__ == "__main__":
+    test_hits_until_a_write_for_the_user_persists()
+    test_disabled_cache_is_never_consulted()
+    print("retrieval cache tests passed")
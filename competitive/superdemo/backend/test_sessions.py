@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""WebSocket chat session tests: per-connection setup and per-backend responses"""
+
+import os
+import tempfile
+
+from fastapi import WebSocketDisconnect
+from fastapi.testclient import TestClient
+
+# Keep the write-behind spool out of the source tree
+os.environ.setdefault("WRITE_BEHIND_SPOOL", os.path.join(tempfile.mkdtemp(), "spool.jsonl"))
+
+import main
+import standins
+
+
+def receive_turn(ws) -> list:
+    """Every message answering one turn, ending with its "turn" summary"""
+    messages = []
+    while not messages or messages[-1]["type"] != "turn":
+        messages.append(ws.receive_json())
+    return messages
+
+
+def test_chat_socket_sets_up_zep_once_and_answers_each_backend():
+    _, mem0_client, zep_client = standins.install(main)
+    client = TestClient(main.app)
+    with client.websocket_connect("/ws/chat?user_id=ws_user&session_id=tab") as ws:
+        session = ws.receive_json()
+        assert session["type"] == "session" and session["session_id"] == "tab"
+
+        for query in ("I like green tea", "What do I like?"):
+            ws.send_json({"query": query, "backends": ["mem0", "zep"], "turn_id": query})
+            messages = receive_turn(ws)
+            responses = {m["backend"]: m for m in messages if m["type"] == "response"}
+            assert set(responses) == {"mem0", "zep"}
+            assert all(m["turn_id"] == query for m in messages)
+            assert responses["zep"]["session_id"] == "tab"
+            assert messages[-1]["errors"] == 0
+
+        # Unknown backends and malformed messages are answered, not fatal
+        ws.send_json({"query": "hi", "backends": ["nope"]})
+        messages = receive_turn(ws)
+        assert messages[0]["type"] == "error" and messages[0]["status"] == 404
+        ws.send_json({"backends": ["mem0"]})
+        assert ws.receive_json()["status"] == 422
+
+        ws.send_json({"type": "history"})
+        assert [turn["query"] for turn in ws.receive_json()["turns"]] == ["I like green tea", "What do I like?", "hi"]
+
+    # User and thread were set up once for the connection, not per turn
+    assert zep_client.calls["user.get"] == 1
+    assert zep_client.calls["thread.create"] == 1
+    assert mem0_client.calls["search"] == 2
+    assert main.chat_sessions.metrics()["active"] == 0
+
+
+def test_chat_socket_rejects_foreign_origins():
+    client = TestClient(main.app)
+    try:
+        with client.websocket_connect("/ws/chat?user_id=x", headers={"origin": "http://evil.example"}) as ws:
+            ws.receive_json()
+    except WebSocketDisconnect as e:
+        assert e.code == 1008
+    else:
+        raise AssertionError("a foreign origin must not get a session")
+
+
+if __name__ == "__main__":
+    test_chat_socket_sets_up_zep_once_and_answers_each_backend()
+    test_chat_socket_rejects_foreign_origins()
+    print("session tests passed")
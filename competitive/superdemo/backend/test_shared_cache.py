@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+"""Multi-worker tests: the shared SQLite cache tier and per-worker write-behind spools"""
+
+import asyncio
+import json
+import os
+import tempfile
+from pathlib import Path
+
+# Keep the write-behind spool out of the source tree
+os.environ.setdefault("WRITE_BEHIND_SPOOL", os.path.join(tempfile.mkdtemp(), "spool.jsonl"))
+
+import main
+from caches import RetrievalCache, SQLiteCache
+from write_behind import WriteBehindQueue
+
+
+def test_invalidation_reaches_other_workers():
+    path = os.path.join(tempfile.mkdtemp(), "shared.sqlite")
+    # Two connections to one file stand in for two worker processes
+    worker_a, worker_b = SQLiteCache(path), SQLiteCache(path)
+    cache_a, cache_b = RetrievalCache(), RetrievalCache()
+
+    # Worker A caches a result; worker B finds it under the same key
+    key, _ = cache_a.lookup("mem0", "alice", "What do I like?")
+    worker_a.set(RetrievalCache.shared_key(key), json.dumps(["likes tea"]))
+    key_b, _ = cache_b.lookup("mem0", "alice", "what do i like")
+    assert json.loads(worker_b.get(RetrievalCache.shared_key(key_b))) == ["likes tea"]
+
+    # A write through worker A moves the user's version on both workers
+    version = worker_a.bump_version(RetrievalCache.version_scope("mem0", "alice"))
+    cache_a.apply_versions([("mem0|alice", version)])
+    versions, seq = worker_b.versions_since(0)
+    cache_b.apply_versions(versions)
+    stale_key, cached = cache_b.lookup("mem0", "alice", "what do i like")
+    assert cached is None
+    assert worker_b.get(RetrievalCache.shared_key(stale_key)) is None
+    assert worker_b.versions_since(seq) == ([], seq)
+
+    # Bumps from any connection are ordered, and versions increase across scopes
+    worker_b.bump_version("zep|alice")
+    versions, _ = worker_a.versions_since(seq)
+    assert versions == [("zep|alice", version + 1)]
+
+
+def test_versions_are_bounded_without_reviving_stale_results():
+    cache = RetrievalCache(max_versions=2)
+    cache.invalidate("mem0", "alice")
+    stale_key, _ = cache.lookup("mem0", "alice", "where do I live")
+    cache.store(stale_key, ["lives in Portland"])
+    cache.invalidate("mem0", "alice")
+    fresh_key, _ = cache.lookup("mem0", "alice", "where do I live")
+    cache.store(fresh_key, ["lives in Seattle"])
+
+    # Two more users push alice's version out
+    cache.invalidate("mem0", "bob")
+    cache.invalidate("zep", "carol")
+    assert cache.stats()["versions"] == 2 and cache.stats()["versions_dropped"] == 1
+    key, cached = cache.lookup("mem0", "alice", "where do I live")
+    assert cached is None and key[2] > fresh_key[2]
+    # Dropped-version keys stay out of the shared tier; kept ones and never-bumped users share
+    assert not cache.shareable(key)
+    assert cache.shareable(cache.lookup("mem0", "bob", "hi")[0])
+    assert RetrievalCache().shareable(RetrievalCache().lookup("mem0", "dave", "hi")[0])
+
+    # Another worker's write for a user without a kept version is adopted even below the floor
+    cache.apply_versions([("mem0|alice", key[2] - 1)])
+    assert cache.lookup("mem0", "alice", "where do I live") == (fresh_key[:2] + (key[2] - 1,) + fresh_key[3:], None)
+
+
+def test_shared_tier_checks_its_row_limit_every_n_writes():
+    cache = SQLiteCache(os.path.join(tempfile.mkdtemp(), "shared.sqlite"), maxsize=5, evict_every=4)
+    for i in range(7):
+        cache.set(f"key-{i}", "value")
+    # Only checked on the 4th write, which was still under the limit
+    assert cache.stats()["size"] == 7 and cache.evictions == 0
+    cache.set("key-7", "value")
+    assert cache.stats()["size"] == 5 and cache.evictions == 3
+    assert cache.get("key-0") is None and cache.get("key-7") == "value"
+
+
+def test_only_invalidations_count_as_published():
+    saved = main.shared_cache, dict(main.shared_cache_stats)
+    main.shared_cache = SQLiteCache(os.path.join(tempfile.mkdtemp(), "shared.sqlite"))
+    published = main.shared_cache_stats["invalidations_published"]
+
+    async def run():
+        main.start_trace("mem0")
+        main.record_short_term(main.QueryRequest(user_id="alice", query="I like tea", session_id="s1"), "Noted")
+        assert main.shared_cache_stats["invalidations_published"] == published
+        await main.invalidate_retrieval("mem0", "alice")
+        await main.invalidate_retrieval("zep", "alice")
+        return main.shared_cache.versions_since(0)[0]
+
+    try:
+        versions = asyncio.run(run())
+        assert main.shared_cache_stats["invalidations_published"] == published + 2
+        assert sorted(versions) == [("mem0|alice", 1), ("zep|alice", 2)]
+    finally:
+        main.shared_cache = saved[0]
+        main.shared_cache_stats.update(saved[1])
+
+
+def test_each_worker_claims_its_own_spool():
+    spool = Path(tempfile.mkdtemp()) / "spool.jsonl"
+
+    async def run():
+        async def writer(key, messages):
+            pass
+
+        first, second = WriteBehindQueue(spool), WriteBehindQueue(spool)
+        for queue in (first, second):
+            queue.register("mem0", writer)
+            queue.start()
+        assert first.spool_path == spool
+        assert second.spool_path == spool.with_name("spool.1.jsonl")
+        for queue in (first, second):
+            await queue.drain()
+
+    asyncio.run(run())
+
+
+def test_spool_of_a_departed_worker_is_adopted():
+    spool = Path(tempfile.mkdtemp()) / "spool.jsonl"
+    orphan = spool.with_name("spool.3.jsonl")
+    entry = {"op": "put", "id": "turn-1", "backend": "mem0", "key": "bob",
+             "messages": [{"role": "user", "content": "hi"}], "ts": 0}
+    orphan.write_text(json.dumps(entry) + "\n")
+
+    async def run():
+        persisted = []
+
+        async def writer(key, messages):
+            persisted.append((key, messages))
+
+        queue = WriteBehindQueue(spool)
+        queue.register("mem0", writer)
+        queue.start()
+        assert queue.stats["replayed"] == 1
+        assert not orphan.exists()
+        assert await queue.drain()
+        assert persisted == [("bob", entry["messages"])]
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    test_invalidation_reaches_other_workers()
+    test_versions_are_bounded_without_reviving_stale_results()
+    test_shared_tier_checks_its_row_limit_every_n_writes()
+    test_only_invalidations_count_as_published()
+    test_each_worker_claims_its_own_spool()
+    test_spool_of_a_departed_worker_is_adopted()
+    print("shared cache tests passed")
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Short-term memory tests: recent turns reach the prompt and spare the remote search"""
+
+import asyncio
+import os
+import tempfile
+import uuid
+
+import httpx
+
+# Keep the write-behind spool out of the source tree
+os.environ.setdefault("WRITE_BEHIND_SPOOL", os.path.join(tempfile.mkdtemp(), "spool.jsonl"))
+
+import main
+import standins
+from short_term import ShortTermMemory
+
+
+def test_search_is_skipped_only_when_recent_turns_cover_the_query():
+    memory = ShortTermMemory(max_turns=2)
+    key = ("mem0", "alice", "tab")
+    assert memory.needs_search(key, "My dog Porter loves the beach") == (True, "no_history")
+
+    memory.record(key, "My dog Porter loves the beach", "Porter sounds like a happy dog!")
+    memory.record(key, "My neighbor Tom walks him on weekdays", "Good to have Tom around.")
+    assert memory.needs_search(key, "Who walks Porter?") == (False, "covered")
+    # No content terms to judge coverage by: search rather than guess
+    assert memory.needs_search(key, "Why?") == (True, "no_terms")
+    assert memory.needs_search(key, "What do I like?") == (True, "no_terms")
+    assert memory.needs_search(key, "Who am I?") == (True, "no_terms")
+    assert memory.needs_search(key, "Do you remember where I live?") == (True, "recall")
+    assert memory.needs_search(key, "What should I pack for Maui?") == (True, "new_terms")
+
+    # The buffer is bounded: the first turn has been dropped
+    memory.record(key, "I am flying to Maui in June", "Enjoy the trip!")
+    assert [turn.query for turn in memory.turns(key)] == ["My neighbor Tom walks him on weekdays",
+                                                          "I am flying to Maui in June"]
+    assert memory.metrics()["searches_avoided"] == 1
+
+
+def test_follow_up_in_a_session_is_answered_without_a_remote_search():
+    llm, mem0_client, _ = standins.install(main)
+    user_id = f"st_{uuid.uuid4().hex[:8]}"
+    prompts = []
+    answer = llm._answer
+
+    def recording_answer(messages):
+        prompts.append(messages)
+        return answer(messages)
+
+    llm._answer = recording_answer
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            turns = ["I'm planning a trip to Lisbon in May", "Which neighborhoods in Lisbon for May?",
+                     "Which neighborhoods in Lisbon for May?"]
+            responses = []
+            for query in turns:
+                response = await client.post("/mem0/query", json={
+                    "user_id": user_id, "session_id": "tab", "query": query
+                })
+                assert response.status_code == 200
+                responses.append(response.json()["performance_metrics"])
+            # No session, no short-term memory: always searched
+            await client.post("/mem0/query", json={"user_id": user_id, "query": turns[1]})
+            return responses
+
+    first, second, third = asyncio.run(run())
+    assert first["remote_search_skipped"] == 0.0
+    assert second["remote_search_skipped"] == 1.0 and second["short_term_turns"] == 1.0
+    # The earlier turn was part of the prompt
+    assert any(message.content == "I'm planning a trip to Lisbon in May" for message in prompts[1])
+    # Repeating a question adds a turn, so the prompt - and the LLM cache key - differ
+    assert third["short_term_turns"] == 2.0
+    assert mem0_client.calls["search"] == 2
+    llm._answer = answer
+
+
+if __name__ == "__main__":
+    test_search_is_skipped_only_when_recent_turns_cover_the_query()
+    test_follow_up_in_a_session_is_answered_without_a_remote_search()
+    print("short-term memory tests passed")
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""Single-flight tests: N concurrent identical calls must reach the upstream exactly once"""
+
+import asyncio
+import os
+import tempfile
+import uuid
+
+import httpx
+
+# Keep the write-behind spool out of the source tree
+os.environ.setdefault("WRITE_BEHIND_SPOOL", os.path.join(tempfile.mkdtemp(), "spool.jsonl"))
+
+import main
+import standins
+from singleflight import SingleFlight
+
+CONCURRENCY = 10
+
+
+def test_concurrent_callers_share_one_call():
+    async def run():
+        group = SingleFlight()
+        calls = 0
+
+        async def upstream():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.05)
+            return "result"
+
+        results = await asyncio.gather(*(group.do(("op", "key"), upstream) for _ in range(CONCURRENCY)))
+        assert calls == 1
+        assert [value for value, _ in results] == ["result"] * CONCURRENCY
+        assert sum(1 for _, shared in results if shared) == CONCURRENCY - 1
+        assert group.stats["op"] == {"calls": CONCURRENCY, "upstream": 1, "coalesced": CONCURRENCY - 1}
+
+        # Nothing is cached once the flight lands
+        await group.do(("op", "key"), upstream)
+        assert calls == 2
+
+    asyncio.run(run())
+
+
+def test_errors_are_shared_and_not_cached():
+    async def run():
+        group = SingleFlight()
+        calls = 0
+
+        async def failing():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            raise RuntimeError("upstream down")
+
+        results = await asyncio.gather(*(group.do(("op",), failing) for _ in range(CONCURRENCY)),
+                                       return_exceptions=True)
+        assert calls == 1
+        assert all(isinstance(result, RuntimeError) for result in results)
+        assert group.in_flight() == 0
+
+    asyncio.run(run())
+
+
+def test_cancelled_caller_does_not_cancel_the_flight():
+    async def run():
+        group = SingleFlight()
+
+        async def slow():
+            await asyncio.sleep(0.05)
+            return "done"
+
+        first = asyncio.ensure_future(group.do(("op",), slow))
+        second = asyncio.ensure_future(group.do(("op",), slow))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        assert await second == ("done", True)
+
+    asyncio.run(run())
+
+
+async def _post_concurrently(path: str, payload: dict) -> list:
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await asyncio.gather(*(client.post(path, json=payload) for _ in range(CONCURRENCY)))
+
+
+def test_concurrent_mem0_queries_make_one_search():
+    _, mem0_client, _ = standins.install(main, search_latency="fixed:50")
+    payload = {"user_id": f"sf_{uuid.uuid4().hex[:8]}", "query": "Which hotel chain do I prefer?"}
+    responses = asyncio.run(_post_concurrently("/mem0/query", payload))
+    assert all(response.status_code == 200 for response in responses)
+    assert mem0_client.calls["search"] == 1
+
+
+def test_concurrent_zep_queries_make_one_search_and_setup():
+    _, _, zep_client = standins.install(main, search_latency="fixed:50", setup_latency="fixed:20")
+    payload = {"user_id": f"sf_{uuid.uuid4().hex[:8]}", "query": "Who walks Porter?", "session_id": "tab"}
+    responses = asyncio.run(_post_concurrently("/zep/query", payload))
+    assert all(response.status_code == 200 for response in responses)
+    assert zep_client.calls["graph.search"] == 1
+    assert zep_client.calls["user.get"] == 1
+    assert zep_client.calls["thread.create"] == 1
+
+
+def test_session_less_zep_queries_share_the_users_default_thread():
+    _, _, zep_client = standins.install(main, setup_latency="fixed:20")
+    user_id = f"sf_{uuid.uuid4().hex[:8]}"
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            bodies = []
+            for query in ["Who walks Porter?", "Where does Tom live?"]:
+                response = await client.post("/zep/query", json={"user_id": user_id, "query": query})
+                bodies.append(response.json())
+            return bodies
+
+    bodies = asyncio.run(run())
+    assert [body["session_id"] for body in bodies] == [main.ZEP_DEFAULT_SESSION] * 2
+    assert zep_client.calls["thread.create"] == 1
+
+
+def test_zep_setup_is_cancelled_when_the_request_fails():
+    standins.install(main, setup_latency="fixed:500")
+    pack_context = main.pack_context
+
+    def failing_pack_context(*args):
+        raise RuntimeError("packing failed")
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            response = await client.post("/zep/query", json={"user_id": f"sf_{uuid.uuid4().hex[:8]}", "query": "hi"})
+        await asyncio.sleep(0)
+        setups = [task for task in asyncio.all_tasks() if "setup_zep_session" in repr(task.get_coro())]
+        return response.status_code, setups
+
+    main.pack_context = failing_pack_context
+    try:
+        status, setups = asyncio.run(run())
+    finally:
+        main.pack_context = pack_context
+    assert status == 500
+    assert setups == []
+
+
+if __name__ == "__main__":
+    test_concurrent_callers_share_one_call()
+    test_errors_are_shared_and_not_cached()
+    test_cancelled_caller_does_not_cancel_the_flight()
+    test_concurrent_mem0_queries_make_one_search()
+    test_concurrent_zep_queries_make_one_search_and_setup()
+    test_session_less_zep_queries_share_the_users_default_thread()
+    test_zep_setup_is_cancelled_when_the_request_fails()
+    print("single-flight tests passed")
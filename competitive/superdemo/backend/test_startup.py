@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""Startup tests: import time covers the whole module, and the tokenizer holds back readiness and queries"""
+
+import asyncio
+import os
+import tempfile
+import uuid
+
+import httpx
+
+# Keep the write-behind spool out of the source tree
+os.environ.setdefault("WRITE_BEHIND_SPOOL", os.path.join(tempfile.mkdtemp(), "spool.jsonl"))
+
+import main
+import standins
+from startup import Warmup
+
+
+def test_import_time_is_measured_from_the_top_of_the_module():
+    source = open(main.__file__).read()
+    assert source.index("IMPORT_START =") < source.index("from fastapi import")
+    assert main.warmup.import_ms and main.warmup.import_ms > 0
+
+
+def test_ready_and_queries_wait_for_the_tokenizer():
+    standins.install(main)
+    saved = main.warmup
+
+    async def run():
+        main.warmup = Warmup()
+        main.warmup.declare("tokenizer")
+        loaded = asyncio.Event()
+
+        async def warm_up():
+            with main.warmup.step("tokenizer"):
+                await loaded.wait()
+
+        main.warmup.start(warm_up())
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            assert (await client.get("/ready")).status_code == 503
+            query = asyncio.ensure_future(client.post("/local/query", json={
+                "user_id": f"st_{uuid.uuid4().hex[:6]}", "query": "Hello!"
+            }))
+            await asyncio.sleep(0.05)
+            # The query is not packed with estimated token counts meanwhile
+            assert not query.done()
+            loaded.set()
+            assert (await query).status_code == 200
+            ready = await client.get("/ready")
+            assert ready.status_code == 200
+            assert ready.json()["components"]["tokenizer"]["state"] == "ready"
+
+    try:
+        asyncio.run(run())
+    finally:
+        main.warmup = saved
+
+
+if __name__ == "__main__":
+    test_import_time_is_measured_from_the_top_of_the_module()
+    test_ready_and_queries_wait_for_the_tokenizer()
+    print("startup tests passed")
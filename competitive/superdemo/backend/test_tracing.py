@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""Tracing tests: spans outside a trace, Prometheus label escaping and route labels"""
+
+import asyncio
+import os
+import tempfile
+import uuid
+
+import httpx
+
+# Keep the write-behind spool out of the source tree
+os.environ.setdefault("WRITE_BEHIND_SPOOL", os.path.join(tempfile.mkdtemp(), "spool.jsonl"))
+
+import main
+import standins
+import tracing
+from tracing import MetricsRegistry, current_trace, start_trace, trace_mark, trace_span
+
+
+def test_spans_outside_a_trace_are_timed_but_not_recorded():
+    def outside():
+        assert current_trace() is None
+        with trace_span("search") as span:
+            pass
+        trace_mark("time_to_first_token", 1.0)
+        # Nothing was started behind the caller's back
+        assert current_trace() is None
+        return span
+
+    span = asyncio.run(asyncio.to_thread(outside))
+    assert span.end is not None and span.duration_ms >= 0
+
+    def inside():
+        trace = start_trace("mem0")
+        with trace_span("search"):
+            with trace_span("rerank"):
+                pass
+        trace_mark("time_to_first_token", 2.0)
+        return trace
+
+    trace = asyncio.run(asyncio.to_thread(inside))
+    assert [span.name for span in trace.spans] == ["rerank", "search"]
+    assert trace.spans[0].parent is trace.spans[1]
+    assert "search_time_ms" in trace.performance_metrics() and trace.marks == {"time_to_first_token": 2.0}
+
+
+def test_label_values_are_escaped():
+    registry = MetricsRegistry()
+    registry.observe("latency_seconds", {"path": 'a"b\\c\nd'}, 0.01)
+    text = registry.render()
+    assert 'latency_seconds_count{path="a\\"b\\\\c\\nd"} 1' in text
+    # Every sample stays on one line
+    assert all(line.startswith(("#", "latency_seconds_")) for line in text.strip().splitlines())
+
+
+def test_unmatched_paths_share_one_route_label():
+    standins.install(main)
+    probes = [f"/wp-admin/{uuid.uuid4().hex}", f"/.env.{uuid.uuid4().hex}"]
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            for path in probes:
+                assert (await client.get(path)).status_code == 404
+            await client.get("/health")
+            return (await client.get("/metrics")).text
+
+    text = asyncio.run(run())
+    assert 'path="unmatched",status="404"' in text
+    assert 'path="/health",status="200"' in text
+    assert not any(path in text for path in probes)
+    assert tracing.current_trace() is None
+
+
+if __name__ == "__main__":
+    test_spans_outside_a_trace_are_timed_but_not_recorded()
+    test_label_values_are_escaped()
+    test_unmatched_paths_share_one_route_label()
+    print("tracing tests passed")
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""Write-behind queue tests: coalescing, retry and requeue with backoff, and replay after a crash"""
+
+import asyncio
+import json
+import tempfile
+from pathlib import Path
+
+from write_behind import WriteBehindQueue
+
+
+def _turn(text: str) -> list:
+    return [{"role": "user", "content": text}, {"role": "assistant", "content": "ok"}]
+
+
+def _spooled_ids(path: Path) -> list:
+    return [json.loads(line)["id"] for line in path.read_text().splitlines() if line.strip()]
+
+
+def test_turns_for_one_key_coalesce_into_one_write():
+    spool = Path(tempfile.mkdtemp()) / "spool.jsonl"
+
+    async def run():
+        writes = []
+
+        async def writer(key, messages):
+            writes.append((key, [message["content"] for message in messages if message["role"] == "user"]))
+
+        queue = WriteBehindQueue(spool, flush_interval=0.02, max_batch_turns=3)
+        queue.register("mem0", writer)
+        for i in range(4):
+            queue.enqueue("mem0", "alice", _turn(f"alice {i}"))
+        queue.enqueue("mem0", "bob", _turn("bob 0"))
+        assert await queue.drain()
+        return queue, writes
+
+    queue, writes = asyncio.run(run())
+    # Batches are capped at max_batch_turns and keep each key's order
+    assert sorted(writes) == [("alice", ["alice 0", "alice 1", "alice 2"]), ("alice", ["alice 3"]),
+                              ("bob", ["bob 0"])]
+    assert queue.stats["persisted"] == 5 and queue.stats["batches"] == 3 and queue.stats["coalesced_turns"] == 2
+    # Compacted after the flushes: nothing outstanding is left in the spool
+    assert _spooled_ids(spool) == []
+
+
+def test_failed_batch_is_requeued_with_backoff_until_it_persists():
+    spool = Path(tempfile.mkdtemp()) / "spool.jsonl"
+
+    async def run():
+        attempts = []
+
+        async def flaky_writer(key, messages):
+            attempts.append(len(messages))
+            if len(attempts) <= 4:
+                raise ConnectionError("upstream unavailable")
+
+        queue = WriteBehindQueue(spool, flush_interval=0.01, max_attempts=2, base_backoff=0.01, max_backoff=0.05)
+        queue.register("mem0", flaky_writer)
+        entry_id = queue.enqueue("mem0", "alice", _turn("I live in Seattle"))
+        # Both attempts of the first round fail, so the batch goes back on the queue and stays spooled
+        while queue.stats["requeued"] == 0:
+            await asyncio.sleep(0.005)
+        await queue.sync_spool()
+        assert queue.depth() == 1 and _spooled_ids(spool) == [entry_id]
+        assert await queue.drain(timeout=5)
+        return queue, attempts
+
+    queue, attempts = asyncio.run(run())
+    # Two rounds of two failed attempts, then the fifth attempt lands
+    assert len(attempts) == 5
+    assert queue.stats["requeued"] == 2 and queue.stats["failed"] == 2 and queue.stats["persisted"] == 1
+    assert queue.metrics()["backing_off_keys"] == 0
+    assert _spooled_ids(spool) == []
+
+
+def test_worker_stops_when_cancelled_while_a_key_backs_off():
+    spool = Path(tempfile.mkdtemp()) / "spool.jsonl"
+
+    async def run():
+        async def failing_writer(key, messages):
+            raise ConnectionError("upstream unavailable")
+
+        queue = WriteBehindQueue(spool, flush_interval=0.01, max_attempts=1, base_backoff=30, max_backoff=30)
+        queue.register("mem0", failing_writer)
+        entry_id = queue.enqueue("mem0", "alice", _turn("I live in Seattle"))
+        while not queue._retry_at:
+            await asyncio.sleep(0.005)
+        # Let the worker settle into its backoff wait, then stop it
+        await asyncio.sleep(0.02)
+        queue._task.cancel()
+        try:
+            await asyncio.wait_for(queue._task, 1)
+        except asyncio.CancelledError:
+            pass
+        assert queue._task.cancelled()
+        await queue.sync_spool()
+        return entry_id
+
+    entry_id = asyncio.run(run())
+    # The turn is still spooled for the next start
+    assert _spooled_ids(spool) == [entry_id]
+
+
+def test_turns_spooled_before_a_crash_are_replayed():
+    spool = Path(tempfile.mkdtemp()) / "spool.jsonl"
+
+    async def crash():
+        async def hanging_writer(key, messages):
+            await asyncio.Event().wait()
+
+        queue = WriteBehindQueue(spool, flush_interval=0.01)
+        queue.register("zep", hanging_writer)
+        ids = [queue.enqueue("zep", "thread-1", _turn(f"turn {i}")) for i in range(3)]
+        await queue.sync_spool()
+        # The process dies here: no drain, and its spool lock goes with it
+        if queue._spool_lock:
+            queue._spool_lock.close()
+        return ids
+
+    ids = asyncio.run(crash())
+    assert _spooled_ids(spool) == ids
+
+    async def restart():
+        persisted = []
+
+        async def writer(key, messages):
+            persisted.append((key, [message["content"] for message in messages if message["role"] == "user"]))
+
+        queue = WriteBehindQueue(spool, flush_interval=0.01)
+        queue.register("zep", writer)
+        queue.start()
+        assert queue.stats["replayed"] == 3
+        assert await queue.drain()
+        return persisted
+
+    assert asyncio.run(restart()) == [("thread-1", ["turn 0", "turn 1", "turn 2"])]
+    assert _spooled_ids(spool) == []
+
+
+if __name__ == "__main__":
+    test_turns_for_one_key_coalesce_into_one_write()
+    test_failed_batch_is_requeued_with_backoff_until_it_persists()
+    test_worker_stops_when_cancelled_while_a_key_backs_off()
+    test_turns_spooled_before_a_crash_are_replayed()
+    print("write-behind tests passed")
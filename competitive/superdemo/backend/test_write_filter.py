@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""Write filtering tests: repeats, retries and small talk are answered but never persisted"""
+
+import asyncio
+import os
+import tempfile
+import uuid
+from pathlib import Path
+
+import httpx
+
+# Keep the write-behind spool out of the source tree
+os.environ.setdefault("WRITE_BEHIND_SPOOL", os.path.join(tempfile.mkdtemp(), "spool.jsonl"))
+
+import main
+import standins
+from write_behind import WriteBehindQueue
+from write_filter import WriteFilter
+
+
+def test_filter_drops_small_talk_and_repeats():
+    write_filter = WriteFilter()
+    decisions = [
+        write_filter.should_write("mem0", "alice", query, "s1")
+        for query in ["Hi there!", "I live in Seattle", "i live in seattle.", "Thanks, sounds good", "I'm 34"]
+    ]
+    assert [reason for _, reason in decisions] == ["low_value", "new", "duplicate", "low_value", "new"]
+    assert [turn is not None for turn, _ in decisions] == [False, True, False, False, True]
+    # Fingerprints are per user and session: another user, or the same question in a new conversation, is written
+    assert write_filter.should_write("mem0", "bob", "I live in Seattle", "s1")[1] == "new"
+    assert write_filter.should_write("mem0", "alice", "I live in Seattle", "s2")[1] == "new"
+    for turn, _ in decisions:
+        write_filter.persisted("mem0", turn)
+
+    write_filter.record_write("mem0", 300.0, 2)
+    stats = write_filter.metrics()["backends"]["mem0"]
+    # Only the two writes that landed count as written
+    assert stats["written"] == 2 and stats["skipped"] == 3
+    assert stats["write_latency_saved_ms"] == 450.0
+
+    disabled = WriteFilter(enabled=False)
+    assert disabled.should_write("mem0", "alice", "hi")[0] and disabled.should_write("mem0", "alice", "hi")[0]
+
+
+def test_short_statements_of_fact_are_kept():
+    write_filter = WriteFilter()
+    for statement in ["I'm Bo", "I am Bo", "Call me Al", "My cat is Mo", "I'm 34"]:
+        assert not write_filter.is_low_value(statement), statement
+    for small_talk in ["hi!", "Thanks so much", "ok cool", "I'm good, thanks", "Good morning"]:
+        assert write_filter.is_low_value(small_talk), small_talk
+
+
+def test_a_turn_counts_as_written_only_once_its_write_lands():
+    spool = Path(tempfile.mkdtemp()) / "spool.jsonl"
+    write_filter = WriteFilter()
+
+    async def run():
+        failures = []
+
+        async def flaky_writer(key, messages):
+            if len(failures) < 2:
+                failures.append(key)
+                raise ConnectionError("upstream unavailable")
+
+        queue = WriteBehindQueue(spool, flush_interval=0.01, max_attempts=1, base_backoff=0.01, max_backoff=0.02)
+        queue.register("mem0", flaky_writer)
+        queue.on_persisted = lambda entries: [
+            write_filter.persisted(entry["backend"], entry.get("fingerprint")) for entry in entries
+        ]
+        turn, _ = write_filter.should_write("mem0", "alice", "I live in Seattle", "s1")
+        queue.enqueue("mem0", "alice", [{"role": "user", "content": "I live in Seattle"}], fingerprint=turn)
+        while queue.stats["requeued"] == 0:
+            await asyncio.sleep(0.005)
+        # Failed so far: not written, but still queued for another try, so a retry is not queued twice
+        assert write_filter.metrics()["fingerprints"] == 0
+        assert write_filter.metrics()["backends"]["mem0"]["written"] == 0
+        assert write_filter.should_write("mem0", "alice", "I live in Seattle", "s1") == (None, "duplicate")
+        assert await queue.drain(timeout=5)
+
+    asyncio.run(run())
+    assert write_filter.metrics()["fingerprints"] == 1 and write_filter.metrics()["queued_fingerprints"] == 0
+    assert write_filter.metrics()["backends"]["mem0"]["written"] == 1
+
+    # A write that failed for good releases its fingerprint, so the client's retry is stored, and is not written
+    turn, _ = write_filter.should_write("local", "alice", "My dog is Porter", "s1")
+    write_filter.abandoned(turn)
+    assert write_filter.metrics()["backends"]["local"]["written"] == 0
+    turn, reason = write_filter.should_write("local", "alice", "My dog is Porter", "s1")
+    assert reason == "new"
+    write_filter.persisted("local", turn)
+    assert write_filter.metrics()["backends"]["local"]["written"] == 1
+
+
+def test_mem0_turns_are_filtered_before_the_queue():
+    _, mem0_client, _ = standins.install(main, add_latency="fixed:20")
+    user_id = f"wf_{uuid.uuid4().hex[:6]}"
+    queries = ["Hello!", "My dog is called Porter", "My dog is called Porter", "Thanks!", "Where do I live?"]
+    enqueued = main.write_queue.stats["enqueued"]
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            statuses = []
+            for query in queries:
+                response = await client.post("/mem0/query", json={"user_id": user_id, "query": query, "session_id": "s1"})
+                statuses.append(response.json()["memory_status"])
+            await main.write_queue.drain()
+            return statuses, (await client.get("/write-behind/metrics")).json()["filter"]
+
+    statuses, metrics = asyncio.run(run())
+    assert statuses == ["skipped", "queued", "skipped", "skipped", "queued"]
+    assert main.write_queue.stats["enqueued"] - enqueued == 2
+    assert metrics["backends"]["mem0"]["write_ms_per_turn"] > 0
+    assert metrics["write_latency_saved_ms"] > 0
+    # Skipped turns still reach short-term memory
+    assert len(main.short_term.turns(("mem0", user_id, "s1"))) == len(queries)
+
+
+if __name__ == "__main__":
+    test_filter_drops_small_talk_and_repeats()
+    test_short_statements_of_fact_are_kept()
+    test_a_turn_counts_as_written_only_once_its_write_lands()
+    test_mem0_turns_are_filtered_before_the_queue()
+    print("write filter tests passed")
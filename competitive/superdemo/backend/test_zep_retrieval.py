@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""Multi-scope Zep retrieval tests: concurrent scopes, per-scope timeouts and merged ranking"""
+
+import asyncio
+import os
+import tempfile
+import time
+import uuid
+from types import SimpleNamespace
+
+import httpx
+
+# Keep the write-behind spool out of the source tree
+os.environ.setdefault("WRITE_BEHIND_SPOOL", os.path.join(tempfile.mkdtemp(), "spool.jsonl"))
+
+import main
+import standins
+from zep_retrieval import ZepRetrievalStrategy, ZepScope, extract_texts
+
+
+def test_merge_ranks_agreed_facts_first_and_dedupes():
+    strategy = ZepRetrievalStrategy([ZepScope("edges"), ZepScope("episodes"), ZepScope("user_context")], limit=3)
+    merged, contributed = strategy.merge({
+        "edges": ["Tom walks Porter", "Porter is 4", "Alice lives in Seattle"],
+        "episodes": ["Alice lives in Seattle.", "Alice flew to Maui"],
+        "user_context": [],
+    })
+    # Found by two scopes, so it outranks each scope's own top hit
+    assert merged[0] == "Alice lives in Seattle"
+    # Equal scores keep scope order, so edges' second hit beats episodes' second
+    assert merged[1:] == ["Tom walks Porter", "Porter is 4"]
+    assert contributed == {"edges": 3, "episodes": 1, "user_context": 0}
+    assert strategy.stats["edges"]["unique"] == 2 and strategy.stats["episodes"]["unique"] == 0
+
+    context = SimpleNamespace(context="<FACTS>\n  - Porter is a golden retriever\n  - Tom walks Porter\n</FACTS>")
+    assert extract_texts("user_context", context) == ["Porter is a golden retriever", "Tom walks Porter"]
+
+
+def test_scopes_run_concurrently_and_a_slow_scope_times_out_alone():
+    _, _, zep_client = standins.install(main, search_latency="fixed:40")
+    user_id = f"zr_{uuid.uuid4().hex[:6]}"
+    zep_client.facts[user_id] = ["Porter is a golden retriever", "Tom walks Porter on weekdays"]
+    search = zep_client.graph.search
+
+    async def slow_nodes(**kwargs):
+        if kwargs.get("scope") == "nodes":
+            await asyncio.sleep(1.0)
+        return await search(**kwargs)
+
+    zep_client.graph.search = slow_nodes
+    saved = main.zep_retrieval
+    main.zep_retrieval = ZepRetrievalStrategy([
+        ZepScope("edges"), ZepScope("episodes"), ZepScope("nodes", timeout_ms=100), ZepScope("user_context")
+    ])
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            start = time.perf_counter()
+            response = await client.post("/zep/query", json={"user_id": user_id, "query": "Who walks Porter?"})
+            return response.json(), (time.perf_counter() - start) * 1000, (await client.get("/zep/retrieval/metrics")).json()
+
+    try:
+        body, elapsed_ms, metrics = asyncio.run(run())
+    finally:
+        main.zep_retrieval = saved
+
+    perf = body["performance_metrics"]
+    # Edges and episodes agree, so each fact appears once
+    assert body["retrieved_memory"] == ["Porter is a golden retriever", "Tom walks Porter on weekdays"]
+    assert perf["zep_nodes_timeout"] == 1.0 and perf["zep_edges_hits"] == 2.0
+    assert perf["zep_edges_contributed"] == 2.0 and perf["zep_episodes_contributed"] == 2.0
+    # Scopes overlap: well under the sum of their latencies, and nodes gave up at its own timeout
+    assert elapsed_ms < 500
+    scopes = metrics["scopes"]
+    assert scopes["nodes"]["timeouts"] == 1 and scopes["user_context"]["skipped"] == 1
+    assert scopes["edges"]["contribution"] == 1.0
+
+
+def test_session_less_queries_read_the_default_thread_context():
+    _, _, zep_client = standins.install(main)
+    user_id = f"zr_{uuid.uuid4().hex[:6]}"
+    zep_client.facts[user_id] = ["Porter is a golden retriever"]
+    saved = main.zep_retrieval
+    main.zep_retrieval = ZepRetrievalStrategy([ZepScope("edges"), ZepScope("user_context")])
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            # The first turn creates the standing default thread
+            first = await client.post("/zep/query", json={"user_id": user_id, "query": "Hi there"})
+            second = await client.post("/zep/query", json={"user_id": user_id, "query": "What breed is Porter?"})
+            return first.json(), second.json()
+
+    try:
+        first, second = asyncio.run(run())
+    finally:
+        main.zep_retrieval = saved
+    assert first["session_id"] == second["session_id"] == main.ZEP_DEFAULT_SESSION
+    # Skipped on the first turn only, then read from the default thread
+    assert second["performance_metrics"]["zep_user_context_hits"] == 1.0
+    assert zep_client.calls["thread.get_user_context"] == 1
+
+
+def test_thread_context_is_cached_per_session():
+    _, _, zep_client = standins.install(main)
+    user_id = f"zr_{uuid.uuid4().hex[:6]}"
+    zep_client.facts[user_id] = ["Porter is a golden retriever"]
+    for session in ("a", "b"):
+        main.zep_session_threads.set((user_id, session), f"{user_id}_thread_{session}")
+    saved = main.zep_retrieval
+    main.zep_retrieval = ZepRetrievalStrategy([ZepScope("edges"), ZepScope("user_context")])
+
+    async def ask(session):
+        perf_metrics = {}
+        request = main.QueryRequest(user_id=user_id, query="What breed is Porter?", session_id=session)
+        await main.retrieve_zep_context(request, perf_metrics)
+        return perf_metrics["retrieval_cache_hit"]
+
+    try:
+        hits = [asyncio.run(ask(session)) for session in ("a", "b", "a", "b")]
+    finally:
+        main.zep_retrieval = saved
+    # Another session of the same user reads its own thread rather than the first session's cached context
+    assert hits == [0.0, 0.0, 1.0, 1.0]
+    assert zep_client.calls["thread.get_user_context"] == 2
+
+
+if __name__ == "__main__":
+    test_merge_ranks_agreed_facts_first_and_dedupes()
+    test_scopes_run_concurrently_and_a_slow_scope_times_out_alone()
+    test_session_less_queries_read_the_default_thread_context()
+    test_thread_context_is_cached_per_session()
+    print("zep retrieval tests passed")
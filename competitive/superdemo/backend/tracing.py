@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+Monotonic span tracing and Prometheus metrics for the Memory Systems Demo API
+Each handler stage runs inside a span; spans feed both the per-response
+performance_metrics and the latency histograms served at /metrics
+"""
+
+import contextvars
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+# Latency histogram buckets in seconds, from sub-millisecond cache hits to slow LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("current_trace", default=None)
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """One timed stage; times are time.perf_counter() seconds"""
+
+    __slots__ = ("name", "parent", "start", "end")
+
+    def __init__(self, name: str, parent: Optional["Span"]):
+        self.name = name
+        self.parent = parent
+        self.start = time.perf_counter()
+        self.end: Optional[float] = None
+
+    @property
+    def duration_ms(self) -> float:
+        return ((self.end or time.perf_counter()) - self.start) * 1000
+
+
+class Trace:
+    """Spans for one backend pipeline within a request"""
+
+    def __init__(self, backend: str, request_start: Optional[float] = None):
+        self.backend = backend
+        self.start = time.perf_counter()
+        self.request_start = request_start if request_start is not None else self.start
+        self.spans: List[Span] = []
+        self.marks: Dict[str, float] = {}
+        self.children: List["Trace"] = []
+        self.response_start: Optional[float] = None
+        self.handler_end: Optional[float] = None
+
+    @contextmanager
+    def span(self, name: str):
+        """Time a stage; spans opened inside it (in the same task) record it as their parent"""
+        span = Span(name, _current_span.get())
+        token = _current_span.set(span)
+        try:
+            yield span
+        finally:
+            span.end = time.perf_counter()
+            try:
+                _current_span.reset(token)
+            except ValueError:
+                # Streaming generators can be closed from a different context
+                pass
+            self.spans.append(span)
+
+    def mark(self, name: str, value_ms: float):
+        """Record a point-in-time measurement, such as time to first token; the first value wins"""
+        self.marks.setdefault(name, value_ms)
+
+    def descendants(self) -> List["Trace"]:
+        traces = []
+        for child in self.children:
+            traces.append(child)
+            traces.extend(child.descendants())
+        return traces
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.start) * 1000
+
+    def queueing_ms(self) -> float:
+        """Time from the request reaching the app to this pipeline starting (body parsing, validation)"""
+        return (self.start - self.request_start) * 1000
+
+    def performance_metrics(self) -> Dict[str, float]:
+        """Per-stage `<stage>_time_ms`, queueing time and real elapsed `total_time_ms`"""
+        self.handler_end = time.perf_counter()
+        metrics = {}
+        for span in self.spans:
+            if span.parent is None:
+                key = f"{span.name}_time_ms"
+                metrics[key] = metrics.get(key, 0.0) + span.duration_ms
+        for name, value in self.marks.items():
+            metrics[f"{name}_ms"] = value
+        metrics['queueing_time_ms'] = self.queueing_ms()
+        metrics['total_time_ms'] = self.elapsed_ms()
+        return metrics
+
+
+def start_trace(backend: str) -> Trace:
+    """Begin a pipeline trace in the current context, nested under the request trace if there is one"""
+    outer = _current_trace.get()
+    trace = Trace(backend, request_start=outer.request_start if outer else None)
+    if outer is not None:
+        outer.children.append(trace)
+    _current_trace.set(trace)
+    return trace
+
+
+def current_trace() -> Optional[Trace]:
+    """The trace for the current context, or None outside any request or pipeline"""
+    return _current_trace.get()
+
+
+@contextmanager
+def trace_span(name: str):
+    """Span on the current trace; outside any trace the stage is still timed but not recorded"""
+    trace = _current_trace.get()
+    if trace is None:
+        span = Span(name, _current_span.get())
+        try:
+            yield span
+        finally:
+            span.end = time.perf_counter()
+        return
+    with trace.span(name) as span:
+        yield span
+
+
+def trace_mark(name: str, value_ms: float):
+    """Mark on the current trace, if there is one"""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.mark(name, value_ms)
+
+
+def escape_label(value: str) -> str:
+    """Escape a label value for the Prometheus text format"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram in Prometheus layout"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+
+class MetricsRegistry:
+    """Labeled histograms rendered in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self._histograms: Dict[str, Dict[Tuple, Histogram]] = {}
+        self._help: Dict[str, str] = {}
+
+    def describe(self, metric: str, help_text: str):
+        self._help[metric] = help_text
+
+    def observe(self, metric: str, labels: Dict[str, str], value: float):
+        key = tuple(sorted(labels.items()))
+        series = self._histograms.setdefault(metric, {})
+        histogram = series.get(key)
+        if histogram is None:
+            histogram = series[key] = Histogram()
+        histogram.observe(value)
+
+    def observe_trace(self, trace: Trace):
+        """Record every top-level stage and mark of a pipeline trace plus its queueing and total time"""
+        stage_seconds: Dict[str, float] = {}
+        for span in trace.spans:
+            if span.parent is None:
+                stage_seconds[span.name] = stage_seconds.get(span.name, 0.0) + span.duration_ms / 1000
+        for name, value in trace.marks.items():
+            stage_seconds[name] = value / 1000
+        stage_seconds["queueing"] = trace.queueing_ms() / 1000
+        end = trace.handler_end or time.perf_counter()
+        stage_seconds["total"] = end - trace.start
+        if trace.handler_end and trace.response_start and trace.response_start > trace.handler_end:
+            stage_seconds["serialization"] = trace.response_start - trace.handler_end
+        for stage, seconds in stage_seconds.items():
+            self.observe("memory_stage_duration_seconds", {"backend": trace.backend, "stage": stage}, seconds)
+
+    def render(self) -> str:
+        lines = []
+        for metric, series in sorted(self._histograms.items()):
+            lines.append(f"# HELP {metric} {self._help.get(metric, metric)}")
+            lines.append(f"# TYPE {metric} histogram")
+            for key, histogram in sorted(series.items()):
+                label_text = ",".join(f'{name}="{escape_label(value)}"' for name, value in key)
+                sep = "," if label_text else ""
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    lines.append(f'{metric}_bucket{{{label_text}{sep}le="{bound}"}} {count}')
+                lines.append(f'{metric}_bucket{{{label_text}{sep}le="+Inf"}} {histogram.count}')
+                lines.append(f"{metric}_sum{{{label_text}}} {histogram.sum}")
+                lines.append(f"{metric}_count{{{label_text}}} {histogram.count}")
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+registry.describe("memory_stage_duration_seconds", "Latency of each backend pipeline stage")
+registry.describe("http_request_duration_seconds", "End-to-end HTTP request latency")
+
+
+@contextmanager
+def observe_stage(backend: str, stage: str):
+    """Time work that runs outside any request trace, such as background persistence"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        registry.observe("memory_stage_duration_seconds", {"backend": backend, "stage": stage},
+                         time.perf_counter() - start)
+
+
+@contextmanager
+def request_trace(name: str):
+    """Request trace for work that does not arrive as an HTTP request, such as one WebSocket message"""
+    trace = Trace(name)
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+        for child in trace.descendants():
+            registry.observe_trace(child)
+
+
+class TracingMiddleware:
+    """ASGI middleware that opens a request trace and records its pipelines into the registry"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        trace = Trace("request")
+        token = _current_trace.set(trace)
+        status = {"code": 500}
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                now = time.perf_counter()
+                for child in trace.descendants():
+                    child.response_start = now
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _current_trace.reset(token)
+            for child in trace.descendants():
+                registry.observe_trace(child)
+            # Label by route template; unmatched paths (404s, scans) share one label to bound cardinality
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            registry.observe("http_request_duration_seconds",
+                             {"path": path, "status": str(status["code"])},
+                             time.perf_counter() - trace.start)
@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+"""
+Worker-scaling benchmark for the Memory Systems Demo API
+Starts the server with 1, 2, 4... worker processes (stand-in upstreams and a
+shared SQLite cache tier), drives each with benchmark.py load generators and
+reports throughput and latency per worker count, so the gain from adding
+workers is measured rather than assumed
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+import httpx
+
+from benchmark import git_commit
+from startup_benchmark import free_port
+
+BACKEND_DIR = Path(__file__).parent
+
+
+def start_server(workers: int, port: int, args) -> subprocess.Popen:
+    """`python main.py` with stand-in upstreams, fresh spool and shared cache"""
+    workdir = tempfile.mkdtemp()
+    env = {
+        **os.environ,
+        "WEB_CONCURRENCY": str(workers),
+        "PORT": str(port),
+        "HOST": "127.0.0.1",
+        "UPSTREAM_STAND_INS": "1",
+        "STAND_IN_LLM_LATENCY": args.llm_latency,
+        "STAND_IN_SEARCH_LATENCY": args.search_latency,
+        "STAND_IN_ADD_LATENCY": args.add_latency,
+        "STAND_IN_SETUP_LATENCY": args.setup_latency,
+        # Same cache path for every worker count, so one worker pays the same shared-tier cost
+        "SHARED_CACHE_ENABLED": "1",
+        "SHARED_CACHE_PATH": os.path.join(workdir, "shared_cache.sqlite"),
+        "WRITE_BEHIND_SPOOL": os.path.join(workdir, "spool.jsonl"),
+    }
+    return subprocess.Popen([sys.executable, "main.py"], cwd=BACKEND_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def wait_ready(base_url: str, workers: int, timeout: float) -> bool:
+    """Wait until /ready answers 200 several times in a row, so every worker has had time to warm up"""
+    deadline = time.perf_counter() + timeout
+    streak = 0
+    with httpx.Client(base_url=base_url, timeout=2.0) as client:
+        while time.perf_counter() < deadline:
+            try:
+                streak = streak + 1 if client.get("/ready").status_code == 200 else 0
+            except httpx.HTTPError:
+                streak = 0
+            if streak >= 4 * workers:
+                return True
+            time.sleep(0.05)
+    return False
+
+
+def run_load(base_url: str, args) -> List[dict]:
+    """Run --client-processes benchmark.py load generators in parallel and return their reports"""
+    outputs, processes = [], []
+    for index in range(args.client_processes):
+        output = os.path.join(tempfile.mkdtemp(), "report.json")
+        outputs.append(output)
+        processes.append(subprocess.Popen([
+            sys.executable, "benchmark.py",
+            "--target", base_url,
+            "--endpoints", args.endpoints,
+            "--conversations", str(max(1, args.conversations // args.client_processes)),
+            "--concurrency", str(max(1, args.concurrency // args.client_processes)),
+            "--seed", str(args.seed + index),
+            "--output", output,
+        ], cwd=BACKEND_DIR, stdout=subprocess.DEVNULL))
+    for process in processes:
+        process.wait()
+    reports = []
+    for output in outputs:
+        with open(output, "r", encoding="utf-8") as f:
+            reports.append(json.load(f))
+    return reports
+
+
+def combine(reports: List[dict]) -> dict:
+    """Throughput summed over load generators; latency percentiles are per-generator p50 mean and worst p95"""
+    duration = max(report["duration_s"] for report in reports)
+    endpoints = {}
+    for endpoint in reports[0]["endpoints"]:
+        parts = [report["endpoints"][endpoint] for report in reports]
+        requests = sum(part["requests"] for part in parts)
+        ok = sum(part["client_latency_ms"]["count"] for part in parts)
+        endpoints[endpoint] = {
+            "requests": requests,
+            "error_rate": (requests - ok) / requests if requests else 0.0,
+            "throughput_rps": ok / duration if duration else 0.0,
+            "client_latency_p50_ms": sum(part["client_latency_ms"]["p50"] for part in parts) / len(parts),
+            "client_latency_p95_ms": max(part["client_latency_ms"]["p95"] for part in parts),
+        }
+    ok_total = sum(endpoint["requests"] * (1 - endpoint["error_rate"]) for endpoint in endpoints.values())
+    return {"duration_s": duration, "throughput_rps": ok_total / duration if duration else 0.0, "endpoints": endpoints}
+
+
+def measure(workers: int, args) -> dict:
+    port = free_port()
+    base_url = f"http://127.0.0.1:{port}"
+    server = start_server(workers, port, args)
+    try:
+        if not wait_ready(base_url, workers, args.ready_timeout):
+            return {"workers": workers, "error": "server never became ready"}
+        result = {"workers": workers, **combine(run_load(base_url, args))}
+        result["shared_cache"] = httpx.get(f"{base_url}/cache/metrics", timeout=5.0).json()["shared"]
+        return result
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+
+def run_benchmark(args) -> dict:
+    results = []
+    for workers in [int(n) for n in args.workers.split(",")]:
+        result = measure(workers, args)
+        results.append(result)
+        if "error" in result:
+            print(f"{workers} worker(s): {result['error']}")
+        else:
+            print(f"{workers} worker(s): {result['throughput_rps']:.1f} req/s")
+
+    # Speedup and per-worker efficiency against the first worker count measured
+    baseline = next((r for r in results if "error" not in r), None)
+    for result in results:
+        if baseline and "error" not in result and baseline["throughput_rps"]:
+            result["speedup"] = result["throughput_rps"] / baseline["throughput_rps"]
+            result["efficiency"] = result["speedup"] * baseline["workers"] / result["workers"]
+
+    return {
+        "results": results,
+        "config": {
+            "workers": args.workers,
+            "endpoints": args.endpoints,
+            "conversations": args.conversations,
+            "concurrency": args.concurrency,
+            "client_processes": args.client_processes,
+            "llm_latency": args.llm_latency,
+            "search_latency": args.search_latency,
+            "add_latency": args.add_latency,
+            "setup_latency": args.setup_latency,
+            "cpu_count": os.cpu_count(),
+            "python": sys.version.split()[0],
+        },
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "git_commit": git_commit(),
+    }
+
+
+def print_report(report: dict):
+    print(f"\n  {'workers':>7} {'req/s':>9} {'speedup':>8} {'efficiency':>10} {'p50 ms':>9} {'p95 ms':>9} {'errors':>7}")
+    for result in report["results"]:
+        if "error" in result:
+            print(f"  {result['workers']:>7} {result['error']}")
+            continue
+        endpoints = result["endpoints"].values()
+        p50 = max(endpoint["client_latency_p50_ms"] for endpoint in endpoints)
+        p95 = max(endpoint["client_latency_p95_ms"] for endpoint in endpoints)
+        errors = max(endpoint["error_rate"] for endpoint in endpoints)
+        print(f"  {result['workers']:>7} {result['throughput_rps']:9.1f} {result.get('speedup', 0):8.2f} "
+              f"{result.get('efficiency', 0):10.2f} {p50:9.1f} {p95:9.1f} {errors:7.1%}")
+    print(f"\n{report['config']['cpu_count']} CPU(s); workers beyond that cannot add throughput")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Measure throughput of the demo API against its worker count")
+    parser.add_argument("--workers", default="1,2,4", help="Comma-separated worker counts to measure")
+    parser.add_argument("--endpoints", default="mem0,zep", help="Comma-separated endpoints, e.g. mem0,zep,local")
+    parser.add_argument("--conversations", type=int, default=300, help="Conversations per worker count")
+    parser.add_argument("--concurrency", type=int, default=64, help="Max concurrent conversations in total")
+    parser.add_argument("--client-processes", type=int, default=2,
+                        help="Load generator processes, so the client is not the bottleneck")
+    # Short upstream latencies keep the server CPU-bound, which is what extra workers relieve
+    parser.add_argument("--llm-latency", default="fixed:20", help="Stand-in LLM latency distribution")
+    parser.add_argument("--search-latency", default="fixed:5", help="Stand-in search latency distribution")
+    parser.add_argument("--add-latency", default="fixed:5", help="Stand-in add latency distribution")
+    parser.add_argument("--setup-latency", default="fixed:5", help="Stand-in Zep user/thread latency")
+    parser.add_argument("--ready-timeout", type=float, default=60.0, help="Seconds to wait for each server")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", default="worker_benchmark.json", help="Where to write the JSON report")
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    report = run_benchmark(args)
+    print_report(report)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
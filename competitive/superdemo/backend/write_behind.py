@@ -0,0 +1,414 @@
+#!/usr/bin/env python3
+"""
+Write-behind queue for memory persistence
+Moves Mem0/Zep writes off the response critical path with coalescing,
+retry with backoff and a local spool file that is replayed on restart.
+Spool appends are group-committed from a thread, so the event loop never
+blocks on the file and one fsync covers every turn queued meanwhile
+"""
+
+import asyncio
+import json
+import os
+import random
+import re
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Awaitable, Callable, Dict, List, Optional
+
+try:
+    import fcntl
+except ImportError:
+    # No flock on Windows: run one worker per spool path there
+    fcntl = None
+
+# writer(key, messages) persists a coalesced batch of turns for one key
+Writer = Callable[[str, List[dict]], Awaitable[object]]
+
+
+class WriteBehindQueue:
+    """Background queue that persists conversation turns after the response is sent"""
+
+    def __init__(
+        self,
+        spool_path: Path,
+        flush_interval: float = 0.05,
+        max_batch_turns: int = 8,
+        max_attempts: int = 5,
+        base_backoff: float = 0.5,
+        max_backoff: float = 30.0,
+        concurrency: int = 8,
+        attempt_timeout: Optional[float] = None,
+    ):
+        self.spool_path = Path(spool_path)
+        self.base_spool_path = self.spool_path
+        self.flush_interval = flush_interval
+        self.max_batch_turns = max_batch_turns
+        self.max_attempts = max_attempts
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.concurrency = concurrency
+        self.attempt_timeout = attempt_timeout
+
+        self.writers: Dict[str, Writer] = {}
+        # Called with each batch of entries once it has persisted
+        self.on_persisted: Optional[Callable[[List[dict]], None]] = None
+        self._pending: "OrderedDict[tuple, List[dict]]" = OrderedDict()
+        self._inflight: Dict[tuple, List[dict]] = {}
+        # Keys whose last batch ran out of attempts: monotonic time of the next
+        # try, and how many times in a row that has happened
+        self._retry_at: Dict[tuple, float] = {}
+        self._failures: Dict[tuple, int] = {}
+        self._tasks: set = set()
+        self._task: Optional[asyncio.Task] = None
+        self._loop = None
+        self._wake: Optional[asyncio.Event] = None
+        self._stopping = False
+        self._spool_loaded = False
+        self._spool_lock = None
+        # Spool records not yet written, the task writing them, and whether the
+        # next write should rewrite the spool with only outstanding turns
+        self._spool_buffer: List[dict] = []
+        self._spool_task: Optional[asyncio.Task] = None
+        self._compact_requested = False
+
+        self.stats = {
+            "enqueued": 0,
+            "persisted": 0,
+            "failed": 0,
+            "retries": 0,
+            "requeued": 0,
+            "batches": 0,
+            "spool_writes": 0,
+            "compactions": 0,
+            "coalesced_turns": 0,
+            "replayed": 0,
+            "last_persist_lag_ms": 0.0,
+            "max_persist_lag_ms": 0.0,
+        }
+
+    def register(self, backend: str, writer: Writer):
+        """Register the coroutine that persists batches for a backend"""
+        self.writers[backend] = writer
+
+    def start(self):
+        """Start the background worker on the running event loop, replaying the spool once"""
+        loop = asyncio.get_running_loop()
+        if self._task and not self._task.done() and self._loop is loop:
+            return
+        self._loop = loop
+        self._wake = asyncio.Event()
+        self._stopping = False
+        if not self._spool_loaded:
+            self._claim_spool()
+            self._load_spool()
+            self._spool_loaded = True
+        # Anything that was in flight on a previous loop goes back to pending
+        for group_key, entries in self._inflight.items():
+            self._pending.setdefault(group_key, [])[:0] = entries
+        self._inflight.clear()
+        self._spool_task = None
+        self._task = loop.create_task(self._run())
+        if self._pending:
+            self._wake.set()
+
+    def enqueue(self, backend: str, key: str, messages: List[dict], fingerprint: Optional[str] = None) -> str:
+        """Spool a turn and queue it for background persistence, returning its entry id"""
+        if backend not in self.writers:
+            raise ValueError(f"No writer registered for backend '{backend}'")
+        self.start()
+        entry = {
+            "op": "put",
+            "id": uuid.uuid4().hex,
+            "backend": backend,
+            "key": key,
+            "messages": messages,
+            "ts": time.time(),
+        }
+        if fingerprint:
+            # Kept through the spool, so a replayed turn still reports its fingerprint once written
+            entry["fingerprint"] = fingerprint
+        self._append_spool(entry)
+        self._pending.setdefault((backend, key), []).append(entry)
+        self.stats["enqueued"] += 1
+        self._wake.set()
+        return entry["id"]
+
+    async def drain(self, timeout: float = 10.0) -> bool:
+        """Flush everything that is queued, returning True if the queue emptied in time"""
+        if not self._task:
+            return not self._pending
+        self._stopping = True
+        self._wake.set()
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout)
+        except asyncio.TimeoutError:
+            print(f"WARNING: write-behind drain timed out with {self.depth()} turns still queued")
+            self._task.cancel()
+        # Whatever is left stays in the spool for replay on the next start
+        self._request_compaction()
+        await self.sync_spool()
+        return self.depth() == 0
+
+    async def sync_spool(self):
+        """Wait until every spool record appended so far is on disk"""
+        while self._spool_task and not self._spool_task.done():
+            await asyncio.shield(self._spool_task)
+
+    def depth(self) -> int:
+        """Number of turns queued or in flight"""
+        pending = sum(len(entries) for entries in self._pending.values())
+        inflight = sum(len(entries) for entries in self._inflight.values())
+        return pending + inflight
+
+    def metrics(self) -> dict:
+        """Queue depth, lag and throughput counters"""
+        oldest = None
+        for entries in list(self._pending.values()) + list(self._inflight.values()):
+            for entry in entries:
+                if oldest is None or entry["ts"] < oldest:
+                    oldest = entry["ts"]
+        return {
+            "depth": self.depth(),
+            "pending_keys": len(self._pending),
+            "inflight_keys": len(self._inflight),
+            "backing_off_keys": len(self._retry_at),
+            "oldest_lag_ms": (time.time() - oldest) * 1000 if oldest else 0.0,
+            "spool": str(self.spool_path),
+            **self.stats,
+        }
+
+    async def _run(self):
+        """Worker loop: dispatch one batch per key, never two batches for the same key at once"""
+        while True:
+            self._release_backoffs()
+            if self._ready_keys() and len(self._inflight) < self.concurrency:
+                # Give concurrent requests a moment to land so their turns coalesce
+                if not self._stopping:
+                    await asyncio.sleep(self.flush_interval)
+                for group_key in self._ready_keys():
+                    if len(self._inflight) >= self.concurrency:
+                        break
+                    entries = self._pending.pop(group_key)
+                    batch, rest = entries[:self.max_batch_turns], entries[self.max_batch_turns:]
+                    if rest:
+                        self._pending[group_key] = rest
+                    self._inflight[group_key] = batch
+                    task = asyncio.create_task(self._flush(group_key, batch))
+                    self._tasks.add(task)
+                    task.add_done_callback(self._on_flushed)
+                continue
+
+            if self._stopping and not self._pending and not self._inflight:
+                return
+            # Every state change (enqueue, batch done, drain) sets the event;
+            # a key backing off after failures wakes the loop when it is due
+            self._wake.clear()
+            if self._retry_at:
+                due_in = max(0.0, min(self._retry_at.values()) - time.monotonic())
+                # Not wait_for: on 3.11 it can swallow a cancellation that races the timeout
+                wake = asyncio.ensure_future(self._wake.wait())
+                try:
+                    await asyncio.wait({wake}, timeout=due_in)
+                finally:
+                    wake.cancel()
+            else:
+                await self._wake.wait()
+
+    def _ready_keys(self) -> list:
+        return [k for k in self._pending if k not in self._inflight and k not in self._retry_at]
+
+    def _release_backoffs(self):
+        now = time.monotonic()
+        for group_key in [k for k, due in self._retry_at.items() if due <= now]:
+            del self._retry_at[group_key]
+
+    def _on_flushed(self, task: asyncio.Task):
+        self._tasks.discard(task)
+        if self._wake:
+            self._wake.set()
+
+    async def _flush(self, group_key: tuple, batch: List[dict]):
+        """Persist one coalesced batch with jittered exponential backoff"""
+        backend, key = group_key
+        messages = [message for entry in batch for message in entry["messages"]]
+        try:
+            for attempt in range(1, self.max_attempts + 1):
+                try:
+                    await asyncio.wait_for(self.writers[backend](key, messages), self.attempt_timeout)
+                    break
+                except Exception as e:
+                    if attempt == self.max_attempts:
+                        self._requeue(group_key, batch, e)
+                        return
+                    self.stats["retries"] += 1
+                    await asyncio.sleep(self._backoff(attempt))
+
+            now = time.time()
+            self._failures.pop(group_key, None)
+            # The batch is no longer outstanding, so the rewrite drops it from the spool
+            self._request_compaction()
+            lag_ms = (now - batch[0]["ts"]) * 1000
+            self.stats["persisted"] += len(batch)
+            self.stats["batches"] += 1
+            self.stats["coalesced_turns"] += len(batch) - 1
+            self.stats["last_persist_lag_ms"] = lag_ms
+            self.stats["max_persist_lag_ms"] = max(self.stats["max_persist_lag_ms"], lag_ms)
+            if self.on_persisted:
+                self.on_persisted(batch)
+        finally:
+            self._inflight.pop(group_key, None)
+
+    def _backoff(self, attempt: int) -> float:
+        """Jittered exponential delay before retry number `attempt`"""
+        delay = min(self.max_backoff, self.base_backoff * (2 ** (attempt - 1)))
+        return delay * random.uniform(0.5, 1.0)
+
+    def _requeue(self, group_key: tuple, batch: List[dict], error: Exception):
+        """Put a batch that ran out of attempts back at the head of its key, to be tried again after a backoff"""
+        backend, key = group_key
+        failures = self._failures.get(group_key, 0) + 1
+        self._failures[group_key] = failures
+        self._pending[group_key] = batch + self._pending.get(group_key, [])
+        self._pending.move_to_end(group_key, last=False)
+        self._retry_at[group_key] = time.monotonic() + self._backoff(self.max_attempts + failures)
+        self.stats["failed"] += len(batch)
+        self.stats["requeued"] += 1
+        print(f"WARNING: write-behind requeued {backend}:{key} after {self.max_attempts} attempts: {error}")
+
+    def _append_spool(self, record: dict):
+        """Buffer a spool record; a background task writes buffered records in order"""
+        self._spool_buffer.append(record)
+        self._schedule_spool_write()
+
+    def _request_compaction(self):
+        self._compact_requested = True
+        self._schedule_spool_write()
+
+    def _schedule_spool_write(self):
+        if self._spool_task is None or self._spool_task.done():
+            self._spool_task = asyncio.get_running_loop().create_task(self._write_spool())
+
+    async def _write_spool(self):
+        """Write buffered records, or rewrite the spool when compaction was requested, off the event loop"""
+        while self._spool_buffer or self._compact_requested:
+            try:
+                if self._compact_requested:
+                    # Outstanding turns are all in memory, so the rewrite supersedes every buffered record
+                    self._compact_requested = False
+                    self._spool_buffer = []
+                    await asyncio.to_thread(self._rewrite_spool, self._outstanding())
+                    self.stats["compactions"] += 1
+                else:
+                    records, self._spool_buffer = self._spool_buffer, []
+                    await asyncio.to_thread(self._append_records, records)
+                    self.stats["spool_writes"] += 1
+            except OSError as e:
+                # The turns are still queued in memory; the next compaction writes them out again
+                print(f"WARNING: write-behind spool write to {self.spool_path} failed: {e}")
+
+    def _append_records(self, records: List[dict]):
+        self.spool_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.spool_path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(record) + "\n" for record in records))
+            f.flush()
+            os.fsync(f.fileno())
+
+    @staticmethod
+    def _try_lock(path: Path):
+        """Exclusive non-blocking lock on path's .lock file, or None if another process holds it"""
+        lock = open(path.with_name(path.name + ".lock"), "a")
+        try:
+            fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock.close()
+            return None
+        return lock
+
+    def _spool_slot(self, slot: int) -> Path:
+        base = self.base_spool_path
+        return base if slot == 0 else base.with_name(f"{base.stem}.{slot}{base.suffix}")
+
+    def _claim_spool(self, max_slots: int = 64):
+        """
+        Lock the configured spool, or the first numbered sibling no other
+        process holds, so each worker of a multi-process server appends to
+        and replays a spool of its own
+        """
+        if fcntl is None:
+            return
+        self.spool_path.parent.mkdir(parents=True, exist_ok=True)
+        for slot in range(max_slots):
+            lock = self._try_lock(self._spool_slot(slot))
+            if lock is not None:
+                self.spool_path = self._spool_slot(slot)
+                self._spool_lock = lock
+                return
+        print(f"WARNING: all {max_slots} write-behind spool slots are locked; sharing {self.spool_path}")
+
+    def _orphaned_spools(self) -> list:
+        """Numbered spools left by workers that no longer run, each returned with its lock held"""
+        if fcntl is None:
+            return []
+        base = self.base_spool_path
+        pattern = re.compile(re.escape(base.stem) + r"\.\d+" + re.escape(base.suffix) + "$")
+        orphans = []
+        for path in sorted(base.parent.glob(f"{base.stem}.*{base.suffix}")):
+            if path == self.spool_path or not pattern.match(path.name):
+                continue
+            lock = self._try_lock(path)
+            if lock is not None:
+                orphans.append((path, lock))
+        return orphans
+
+    @staticmethod
+    def _read_spool(path: Path) -> "OrderedDict[str, dict]":
+        """Turns in a spool file that were never acknowledged"""
+        puts: "OrderedDict[str, dict]" = OrderedDict()
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    # Torn final line from a crash mid-write
+                    continue
+                if record.get("op") == "put":
+                    puts[record["id"]] = record
+                elif record.get("op") == "ack":
+                    for entry_id in record.get("ids", []):
+                        puts.pop(entry_id, None)
+        return puts
+
+    def _load_spool(self):
+        """Re-queue every spooled turn that was never acknowledged, adopting spools of departed workers"""
+        orphans = self._orphaned_spools()
+        for path in [self.spool_path] + [path for path, _ in orphans]:
+            if not path.exists():
+                continue
+            puts = self._read_spool(path)
+            for entry in puts.values():
+                self._pending.setdefault((entry["backend"], entry["key"]), []).append(entry)
+            self.stats["replayed"] += len(puts)
+            if puts:
+                print(f"Replaying {len(puts)} unpersisted turns from {path}")
+        self._rewrite_spool(self._outstanding())
+        # Adopted turns are in our own spool now
+        for path, lock in orphans:
+            path.unlink(missing_ok=True)
+            lock.close()
+
+    def _outstanding(self) -> List[dict]:
+        return [e for entries in list(self._pending.values()) + list(self._inflight.values()) for e in entries]
+
+    def _rewrite_spool(self, outstanding: List[dict]):
+        """Replace the spool with only the given outstanding turns"""
+        self.spool_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.spool_path.with_suffix(self.spool_path.suffix + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for entry in outstanding:
+                f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.spool_path)
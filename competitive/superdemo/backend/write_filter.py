@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Pre-write filtering for the Memory Systems Demo API
+Decides, before a turn reaches the write-behind queue, whether it is worth
+persisting: repeats and client retries of a turn already queued or written are
+dropped by fingerprint, and small talk with nothing memorable ("hi", "thanks",
+"ok") is skipped by a cheap lexical check
+"""
+
+import hashlib
+import re
+from typing import Dict, Optional, Set, Tuple
+
+from caches import TTLCache, normalize_query
+from local_memory import TOKEN_PATTERN
+from short_term import STOPWORDS
+
+# Words that carry no memory on their own, beyond the stopwords
+SMALL_TALK_WORDS = frozenset("""
+hi hello hey hiya howdy bye goodbye later cheers thx cool great nice awesome perfect wonderful fine good
+morning afternoon evening night lol haha hmm nope alright right sounds fair appreciate welcome gotcha
+i'm i've i'll i'd it's that's you're we're there's let's
+""".split())
+
+# Numbers and dates often are the memory ("I'm 34", "born 1990")
+DIGIT_PATTERN = re.compile(r"\d")
+
+
+def fingerprint(backend: str, key: str, session_id: Optional[str], query: str) -> str:
+    """
+    Stable fingerprint of a user turn within its session: a client retry
+    matches, while the same question asked in another conversation does not
+    """
+    turn = f"{backend}\0{key}\0{session_id or ''}\0{normalize_query(query)}"
+    return hashlib.sha1(turn.encode("utf-8")).hexdigest()
+
+
+class WriteFilter:
+    """
+    should_write() returns (fingerprint, "new") for a turn worth persisting,
+    to be passed to persisted() once the write lands; otherwise (None,
+    "duplicate") for a turn still queued or written within `ttl` seconds, or
+    (None, "low_value") for one with no content. Turns only count as written,
+    and fingerprints only block repeats, after the write succeeds, so a retry
+    of a turn whose write never landed is stored.
+    """
+
+    def __init__(self, enabled: bool = True, low_value: bool = True, max_fingerprints: int = 100000,
+                 ttl: Optional[float] = 3600):
+        self.enabled = enabled
+        self.low_value = low_value
+        self._seen = TTLCache(maxsize=max_fingerprints, ttl=ttl)
+        # Fingerprints of turns in the write-behind queue, which keeps retrying them until they persist
+        self._queued: Set[str] = set()
+        self.stats: Dict[str, Dict[str, int]] = {}
+        # Per backend: persisted turns and the time their writes took, for the per-turn write cost
+        self.writes: Dict[str, Dict[str, float]] = {}
+
+    def _count(self, backend: str, outcome: str, n: int = 1):
+        stats = self.stats.setdefault(backend, {"written": 0, "duplicate": 0, "low_value": 0})
+        stats[outcome] += n
+
+    def is_low_value(self, query: str) -> bool:
+        """Only stopwords and small talk; any other word, however short ("I'm Bo"), may be a memory"""
+        if DIGIT_PATTERN.search(query):
+            return False
+        for token in TOKEN_PATTERN.findall(query.lower()):
+            word = token.strip("'")
+            if word and word not in STOPWORDS and word not in SMALL_TALK_WORDS:
+                return False
+        return True
+
+    def should_write(self, backend: str, key: str, query: str,
+                     session_id: Optional[str] = None) -> Tuple[Optional[str], str]:
+        turn = fingerprint(backend, key, session_id, query)
+        if not self.enabled:
+            return turn, "disabled"
+        if self.low_value and self.is_low_value(query):
+            self._count(backend, "low_value")
+            return None, "low_value"
+        if turn in self._queued or self._seen.get(turn) is not None:
+            self._count(backend, "duplicate")
+            return None, "duplicate"
+        self._queued.add(turn)
+        # Listed in the metrics from the first turn, though it counts as written only once persisted
+        self._count(backend, "written", 0)
+        return turn, "new"
+
+    def persisted(self, backend: str, turn: Optional[str]):
+        """The write for a fingerprinted turn landed: it counts as written, and repeats within the TTL are duplicates"""
+        if turn:
+            self._queued.discard(turn)
+            self._seen.set(turn, True)
+            self._count(backend, "written")
+
+    def abandoned(self, turn: Optional[str]):
+        """The write for a fingerprinted turn failed for good: a retry of the turn is written"""
+        if turn:
+            self._queued.discard(turn)
+
+    def record_write(self, backend: str, latency_ms: float, turns: int):
+        """A persisted batch of `turns` turns that took `latency_ms`"""
+        writes = self.writes.setdefault(backend, {"turns": 0, "latency_ms_total": 0.0})
+        writes["turns"] += turns
+        writes["latency_ms_total"] += latency_ms
+
+    def metrics(self) -> dict:
+        backends = {}
+        for backend, stats in self.stats.items():
+            writes = self.writes.get(backend, {"turns": 0, "latency_ms_total": 0.0})
+            per_turn_ms = writes["latency_ms_total"] / writes["turns"] if writes["turns"] else 0.0
+            skipped = stats["duplicate"] + stats["low_value"]
+            total = skipped + stats["written"]
+            backends[backend] = {
+                **stats,
+                "skipped": skipped,
+                "skipped_rate": skipped / total if total else 0.0,
+                "write_ms_per_turn": per_turn_ms,
+                # Upstream write time the skipped turns would have cost at the observed per-turn rate
+                "write_latency_saved_ms": skipped * per_turn_ms,
+            }
+        return {
+            "enabled": self.enabled,
+            "low_value_filter": self.low_value,
+            "fingerprints": len(self._seen),
+            "queued_fingerprints": len(self._queued),
+            "backends": backends,
+            "write_latency_saved_ms": sum(stats["write_latency_saved_ms"] for stats in backends.values()),
+        }
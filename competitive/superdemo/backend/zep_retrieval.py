@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Multi-scope Zep retrieval for the Memory Systems Demo API
+A strategy names which of graph edges, nodes, episodes and the thread's user
+context to query for a turn; main.py runs them concurrently, each under its
+own timeout, and this module merges, dedupes and ranks what comes back while
+keeping per-scope latency and hit contribution
+"""
+
+import os
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+SCOPES = ("edges", "nodes", "episodes", "user_context")
+# Reciprocal rank fusion constant: higher flattens the advantage of the top ranks
+RRF_K = 60
+# Lines of a user-context block that are markup rather than facts
+CONTEXT_MARKUP_PATTERN = re.compile(r"^\s*(<[^>]+>|#+\s|[A-Z _]+:?\s*$)")
+
+
+@dataclass
+class ZepScope:
+    name: str
+    limit: int = 5
+    timeout_ms: Optional[float] = None  # None: bounded only by the retrieval budget
+
+
+def normalize_text(text: str) -> str:
+    """Case, whitespace and trailing punctuation folded, so the same fact from two scopes matches"""
+    return " ".join(text.lower().split()).rstrip(".!?;, ")
+
+
+def extract_texts(scope: str, result: Any) -> List[str]:
+    """Ranked memory texts from one scope's response, best first"""
+    if result is None:
+        return []
+    if scope == "user_context":
+        context = getattr(result, "context", None) or ""
+        texts = []
+        for line in context.splitlines():
+            line = line.strip().lstrip("-*• ").strip()
+            if line and not CONTEXT_MARKUP_PATTERN.match(line):
+                texts.append(line)
+        return texts
+    items = getattr(result, scope, None) or []
+    texts = []
+    for item in items:
+        if scope == "edges":
+            text = getattr(item, "fact", None) or str(item)
+        elif scope == "nodes":
+            name, summary = getattr(item, "name", None), getattr(item, "summary", None)
+            text = f"{name}: {summary}" if name and summary else (summary or name or str(item))
+        else:
+            text = getattr(item, "content", None) or str(item)
+        texts.append(text)
+    return texts
+
+
+class ZepRetrievalStrategy:
+    """
+    Scopes queried per turn and how their results combine: reciprocal rank
+    fusion, so a fact several scopes agree on outranks one found by a single
+    scope, then the top `limit` distinct texts
+    """
+
+    def __init__(self, scopes: List[ZepScope], limit: int = 10):
+        unknown = [scope.name for scope in scopes if scope.name not in SCOPES]
+        if unknown or not scopes:
+            raise ValueError(f"Zep retrieval scopes must be some of {', '.join(SCOPES)}, got {unknown or 'none'}")
+        self.scopes = scopes
+        self.limit = limit
+        self.stats: Dict[str, Dict[str, float]] = {
+            scope.name: {"calls": 0, "timeouts": 0, "errors": 0, "skipped": 0, "latency_ms_total": 0.0,
+                         "hits": 0, "contributed": 0, "unique": 0}
+            for scope in scopes
+        }
+        self.merges = 0
+
+    @classmethod
+    def from_env(cls) -> "ZepRetrievalStrategy":
+        """ZEP_RETRIEVAL_SCOPES (comma-separated), ZEP_SCOPE_LIMIT, ZEP_SCOPE_TIMEOUT_MS and ZEP_<SCOPE>_TIMEOUT_MS"""
+        limit = int(os.environ.get("ZEP_SCOPE_LIMIT", "5"))
+        default_timeout_ms = os.environ.get("ZEP_SCOPE_TIMEOUT_MS", "0")
+        scopes = [
+            ZepScope(
+                name,
+                limit=limit,
+                timeout_ms=float(os.environ.get(f"ZEP_{name.upper()}_TIMEOUT_MS", default_timeout_ms)) or None
+            )
+            for name in (part.strip() for part in os.environ.get("ZEP_RETRIEVAL_SCOPES", "edges").split(","))
+            if name
+        ]
+        return cls(scopes, limit=int(os.environ.get("ZEP_RETRIEVAL_LIMIT", "10")))
+
+    def record_call(self, scope: str, latency_ms: float, outcome: str = "ok"):
+        """outcome is "ok", "timeout", "error" or "skipped" (user context before the thread exists)"""
+        stats = self.stats[scope]
+        if outcome == "skipped":
+            stats["skipped"] += 1
+            return
+        stats["calls"] += 1
+        stats["latency_ms_total"] += latency_ms
+        if outcome == "timeout":
+            stats["timeouts"] += 1
+        elif outcome == "error":
+            stats["errors"] += 1
+
+    def merge(self, ranked: Dict[str, List[str]]) -> Tuple[List[str], Dict[str, int]]:
+        """(merged texts, count each scope contributed) from each scope's ranked texts"""
+        scores: Dict[str, float] = {}
+        first_text: Dict[str, str] = {}
+        sources: Dict[str, List[str]] = {}
+        for scope, texts in ranked.items():
+            seen = set()
+            for rank, text in enumerate(texts):
+                key = normalize_text(text)
+                if not key or key in seen:
+                    continue
+                seen.add(key)
+                scores[key] = scores.get(key, 0.0) + 1.0 / (RRF_K + rank + 1)
+                first_text.setdefault(key, text)
+                sources.setdefault(key, []).append(scope)
+            self.stats[scope]["hits"] += len(seen)
+
+        top = sorted(scores, key=lambda key: -scores[key])[:self.limit]
+        contributed = {scope: 0 for scope in ranked}
+        for key in top:
+            for scope in sources[key]:
+                contributed[scope] += 1
+                self.stats[scope]["contributed"] += 1
+            if len(sources[key]) == 1:
+                self.stats[sources[key][0]]["unique"] += 1
+        self.merges += 1
+        return [first_text[key] for key in top], contributed
+
+    def metrics(self) -> dict:
+        scopes = {}
+        for scope in self.scopes:
+            stats = self.stats[scope.name]
+            calls = stats["calls"]
+            scopes[scope.name] = {
+                "limit": scope.limit,
+                "timeout_ms": scope.timeout_ms,
+                **stats,
+                "mean_latency_ms": stats["latency_ms_total"] / calls if calls else 0.0,
+                # Share of this scope's hits that made it into the merged context
+                "contribution": stats["contributed"] / stats["hits"] if stats["hits"] else 0.0,
+            }
+        return {"scopes": scopes, "merges": self.merges, "limit": self.limit}
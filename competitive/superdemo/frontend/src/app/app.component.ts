@@ -1,14 +1,15 @@
-import { Component } from '@angular/core';
+import { Component, OnDestroy } from '@angular/core';
 import { CommonModule } from '@angular/common';
 import { FormsModule } from '@angular/forms';
 import { HttpClientModule } from '@angular/common/http';
-import { MemoryService, QueryRequest, QueryResponse, PerformanceMetrics } from './memory.service';
+import { ChatMessage, ChatSocket, MemoryService, MemoryStatus, PerformanceMetrics } from './memory.service';
 
 export interface ConversationItem {
   query: string;
   response: string;
   retrievedMemory: string[] | null;
   timestamp: Date;
+  memoryStatus?: MemoryStatus | null;
   performanceMetrics?: PerformanceMetrics;
 }
 
@@ -81,12 +82,15 @@ export interface ConversationItem {
             <div *ngIf="!item.retrievedMemory || item.retrievedMemory.length === 0" class="memory">
               <strong>Retrieved Memory:</strong> <em>No previous memory found</em>
             </div>
+            <div *ngIf="item.memoryStatus" class="memory-status" [class.skipped]="item.memoryStatus === 'skipped'">
+              {{ memoryStatusLabel(item.memoryStatus) }}
+            </div>
             <div *ngIf="item.performanceMetrics" class="performance-metrics">
               <strong>Performance:</strong>
               <ul class="metrics-list">
-                <li>Search: {{ item.performanceMetrics.search_time_ms.toFixed(1) }}ms</li>
+                <li *ngIf="item.performanceMetrics.search_time_ms !== undefined">Search: {{ item.performanceMetrics.search_time_ms.toFixed(1) }}ms</li>
                 <li>LLM: {{ item.performanceMetrics.chain_invoke_time_ms.toFixed(1) }}ms</li>
-                <li>Save: {{ item.performanceMetrics.add_time_ms.toFixed(1) }}ms</li>
+                <li *ngIf="item.performanceMetrics.add_time_ms !== undefined">Save: {{ item.performanceMetrics.add_time_ms.toFixed(1) }}ms</li>
                 <li class="total">Total: {{ item.performanceMetrics.total_time_ms.toFixed(1) }}ms</li>
               </ul>
             </div>
@@ -119,14 +123,17 @@ export interface ConversationItem {
             <div *ngIf="!item.retrievedMemory || item.retrievedMemory.length === 0" class="memory">
               <strong>Retrieved Memory:</strong> <em>No previous memory found</em>
             </div>
+            <div *ngIf="item.memoryStatus" class="memory-status" [class.skipped]="item.memoryStatus === 'skipped'">
+              {{ memoryStatusLabel(item.memoryStatus) }}
+            </div>
             <div *ngIf="item.performanceMetrics" class="performance-metrics">
               <strong>Performance:</strong>
               <ul class="metrics-list">
                 <li *ngIf="item.performanceMetrics.user_setup_time_ms !== undefined">User Setup: {{ item.performanceMetrics.user_setup_time_ms.toFixed(1) }}ms</li>
                 <li *ngIf="item.performanceMetrics.thread_create_time_ms !== undefined">Thread Creation: {{ item.performanceMetrics.thread_create_time_ms.toFixed(1) }}ms</li>
-                <li>Search: {{ item.performanceMetrics.search_time_ms.toFixed(1) }}ms</li>
+                <li *ngIf="item.performanceMetrics.search_time_ms !== undefined">Search: {{ item.performanceMetrics.search_time_ms.toFixed(1) }}ms</li>
                 <li>LLM: {{ item.performanceMetrics.chain_invoke_time_ms.toFixed(1) }}ms</li>
-                <li>Save: {{ item.performanceMetrics.add_time_ms.toFixed(1) }}ms</li>
+                <li *ngIf="item.performanceMetrics.add_time_ms !== undefined">Save: {{ item.performanceMetrics.add_time_ms.toFixed(1) }}ms</li>
                 <li class="total">Total: {{ item.performanceMetrics.total_time_ms.toFixed(1) }}ms</li>
               </ul>
             </div>
@@ -140,8 +147,10 @@ export interface ConversationItem {
   `,
   styles: []
 })
-export class AppComponent {
+export class AppComponent implements OnDestroy {
   userId: string = 'demo_user_123';
+  // One session per page load so the backend keeps reusing the same Zep thread
+  sessionId: string = Math.random().toString(16).slice(2, 10);
   query: string = '';
   isLoading: boolean = false;
   error: string = '';
@@ -155,6 +164,11 @@ export class AppComponent {
 
   constructor(private memoryService: MemoryService) {}
 
+  // Chat socket for the current user; reopened if the user id changes
+  private chat?: ChatSocket;
+  private chatUserId = '';
+  private pendingQueries: { [turnId: string]: string } = {};
+
   submitQuery() {
     if (!this.userId || !this.query || this.isLoading) {
       return;
@@ -165,69 +179,94 @@ export class AppComponent {
     this.isLoadingMem0 = true;
     this.error = '';
     
-    const request: QueryRequest = {
-      user_id: this.userId,
-      query: this.query
-    };
-
     const currentQuery = this.query;
     
     // Clear query field immediately after capturing it
     this.query = '';
     
-    // Make Zep API call independently
-    this.memoryService.queryZep(request).subscribe({
-      next: (response) => {
-        // Add Zep response to conversation
-        this.zepConversation.unshift({
-          query: currentQuery,
-          response: response.response,
-          retrievedMemory: response.retrieved_memory,
-          timestamp: new Date(),
-          performanceMetrics: response.performance_metrics
-        });
-        
-        this.isLoadingZep = false;
-        this.checkAllLoaded();
-      },
-      error: (error) => {
-        console.error('Zep Error:', error);
-        this.error = `Zep Error: ${error.error?.detail || error.message || 'Unknown error'}`;
-        this.isLoadingZep = false;
-        this.checkAllLoaded();
-      }
+    // One message per turn - the backend runs both pipelines concurrently and
+    // pushes each answer as soon as it is ready
+    const turnId = this.chatFor(this.userId).send(currentQuery, ['mem0', 'zep']);
+    this.pendingQueries[turnId] = currentQuery;
+  }
+
+  private chatFor(userId: string): ChatSocket {
+    if (this.chat && this.chat.open && this.chatUserId === userId) {
+      return this.chat;
+    }
+    this.chat?.close();
+    const chat = this.memoryService.openChat(userId, this.sessionId);
+    chat.messages.subscribe({
+      next: (message) => this.onChatMessage(message),
+      error: (error) => this.onChatClosed(chat, error.message),
+      complete: () => this.onChatClosed(chat, 'Chat connection closed')
     });
-    
-    // Make Mem0 API call independently
-    this.memoryService.queryMem0(request).subscribe({
-      next: (response) => {
-        // Add Mem0 response to conversation
-        this.mem0Conversation.unshift({
-          query: currentQuery,
-          response: response.response,
-          retrievedMemory: response.retrieved_memory,
-          timestamp: new Date(),
-          performanceMetrics: response.performance_metrics
-        });
-        
-        this.isLoadingMem0 = false;
-        this.checkAllLoaded();
-      },
-      error: (error) => {
-        console.error('Mem0 Error:', error);
-        this.error = `Mem0 Error: ${error.error?.detail || error.message || 'Unknown error'}`;
+    this.chat = chat;
+    this.chatUserId = userId;
+    return chat;
+  }
+
+  private onChatMessage(message: ChatMessage) {
+    if (message.type === 'response') {
+      const item: ConversationItem = {
+        query: this.pendingQueries[message.turn_id] ?? '',
+        response: message.response,
+        retrievedMemory: message.retrieved_memory,
+        timestamp: new Date(),
+        memoryStatus: message.memory_status,
+        performanceMetrics: message.performance_metrics
+      };
+      if (message.backend === 'zep') {
+        this.zepConversation.unshift(item);
+        this.isLoadingZep = false;
+      } else {
+        this.mem0Conversation.unshift(item);
         this.isLoadingMem0 = false;
-        this.checkAllLoaded();
       }
-    });
+    } else if (message.type === 'error') {
+      const label = message.backend === 'zep' ? 'Zep Error' : message.backend === 'mem0' ? 'Mem0 Error' : 'Error';
+      this.error = `${label}: ${message.detail}`;
+    } else if (message.type === 'turn') {
+      delete this.pendingQueries[message.turn_id];
+      this.isLoadingZep = false;
+      this.isLoadingMem0 = false;
+      this.checkAllLoaded();
+    }
+  }
+
+  private onChatClosed(chat: ChatSocket, reason: string) {
+    if (chat !== this.chat) {
+      return;
+    }
+    // A turn still in flight is lost with the socket; the next query reconnects
+    this.chat = undefined;
+    if (this.isLoading) {
+      this.error = `Error: ${reason}`;
+      this.isLoadingZep = false;
+      this.isLoadingMem0 = false;
+      this.checkAllLoaded();
+    }
+    this.pendingQueries = {};
   }
   
+  ngOnDestroy() {
+    this.chat?.close();
+  }
+
   private checkAllLoaded() {
     if (!this.isLoadingZep && !this.isLoadingMem0) {
       this.isLoading = false;
     }
   }
 
+  memoryStatusLabel(status: MemoryStatus): string {
+    switch (status) {
+      case 'queued': return 'Saving...';
+      case 'persisted': return 'Saved';
+      case 'skipped': return 'Not saved (nothing to remember)';
+    }
+  }
+
   trackByTimestamp(_index: number, item: ConversationItem): number {
     return item.timestamp.getTime();
   }
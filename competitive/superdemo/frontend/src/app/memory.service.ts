@@ -1,29 +1,85 @@
 import { Injectable } from '@angular/core';
 import { HttpClient } from '@angular/common/http';
-import { Observable } from 'rxjs';
+import { Observable, Subject } from 'rxjs';
 
 export interface QueryRequest {
   user_id: string;
   query: string;
+  session_id?: string;
 }
 
 export interface PerformanceMetrics {
   user_setup_time_ms?: number;  // Optional, only for Zep
   thread_create_time_ms?: number;  // Optional, only for Zep
-  search_time_ms: number;
+  search_time_ms?: number;  // Absent when retrieval was skipped
   chain_invoke_time_ms: number;
-  add_time_ms: number;
+  time_to_first_token_ms?: number;  // Only for streaming responses
+  add_time_ms?: number;  // Absent when the turn was not saved
   total_time_ms: number;
+  write_queue_depth?: number;
 }
 
+// "skipped": the turn was filtered as not worth remembering
+export type MemoryStatus = 'queued' | 'persisted' | 'skipped';
+
 export interface QueryResponse {
   response: string;
   memory_saved: boolean;
+  memory_status?: MemoryStatus | null;
   context_found: boolean;
   retrieved_memory: string[] | null;
+  session_id?: string | null;
+  degraded?: string[] | null;
+  circuit?: { [upstream: string]: 'closed' | 'open' | 'half_open' } | null;
   performance_metrics?: PerformanceMetrics;
 }
 
+// Messages pushed by the /ws/chat session socket
+export type ChatMessage =
+  | { type: 'session'; user_id: string; session_id: string; turns: number }
+  | ({ type: 'response'; turn_id: string; backend: string } & QueryResponse)
+  | { type: 'error'; turn_id?: string; backend?: string; status: number; detail: string }
+  | { type: 'turn'; turn_id: string; backends: string[]; errors: number; turn_time_ms: number };
+
+// One chat session: the server keeps identity and the Zep thread for the
+// life of the socket, so each turn costs only retrieval and generation
+export class ChatSocket {
+  readonly messages = new Subject<ChatMessage>();
+  private socket: WebSocket;
+  private queued: string[] = [];
+
+  constructor(url: string) {
+    this.socket = new WebSocket(url);
+    this.socket.onopen = () => {
+      this.queued.forEach((message) => this.socket.send(message));
+      this.queued = [];
+    };
+    this.socket.onmessage = (event) => this.messages.next(JSON.parse(event.data));
+    this.socket.onerror = () => this.messages.error(new Error('Chat connection failed'));
+    this.socket.onclose = () => this.messages.complete();
+  }
+
+  get open(): boolean {
+    return this.socket.readyState === WebSocket.OPEN || this.socket.readyState === WebSocket.CONNECTING;
+  }
+
+  // Returns the turn id echoed on every message that answers this query
+  send(query: string, backends: string[]): string {
+    const turnId = Math.random().toString(16).slice(2, 10);
+    const message = JSON.stringify({ turn_id: turnId, query, backends });
+    if (this.socket.readyState === WebSocket.OPEN) {
+      this.socket.send(message);
+    } else {
+      this.queued.push(message);
+    }
+    return turnId;
+  }
+
+  close() {
+    this.socket.close();
+  }
+}
+
 @Injectable({
   providedIn: 'root'
 })
@@ -39,4 +95,9 @@ export class MemoryService {
   queryZep(request: QueryRequest): Observable<QueryResponse> {
     return this.http.post<QueryResponse>(`${this.baseUrl}/zep/query`, request);
   }
+
+  openChat(userId: string, sessionId: string): ChatSocket {
+    const params = `user_id=${encodeURIComponent(userId)}&session_id=${encodeURIComponent(sessionId)}`;
+    return new ChatSocket(`${this.baseUrl.replace(/^http/, 'ws')}/ws/chat?${params}`);
+  }
 }
\ No newline at end of file